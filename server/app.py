@@ -1,15 +1,23 @@
+import hmac
 import os
+import time
 
 from config import config
 from dotenv import load_dotenv
-from flask import Flask, jsonify, g
+from flask import Flask, jsonify, g, request
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
+from flask_jwt_extended import JWTManager, get_jwt_identity, verify_jwt_in_request
 from utils.logger_config import setup_logging
 
 # Import MongoDB db from config
 from config import Config as AppConfig  # To access db
 from utils.database_seeder import DatabaseSeeder
+from services.auth_service import AuthService
+from services.vector_service import VectorService
+from services.vector_sync import vector_sync
+from utils.db_indexes import ensure_indexes
+from utils.json_provider import ORJSONProvider
+from utils.metrics import metrics
 
 load_dotenv()
 
@@ -19,8 +27,11 @@ def create_app(config_name=None):
     if config_name is None:
         config_name = os.environ.get("FLASK_ENV", "development")
 
+    startup_started = time.perf_counter()
+
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.json = ORJSONProvider(app)
 
     jwt.init_app(app)
 
@@ -31,6 +42,27 @@ def create_app(config_name=None):
 
     register_routes(app)
 
+    if app.config["ENSURE_INDEXES_ON_STARTUP"]:
+        try:
+            ensure_indexes(AppConfig.db)
+        except Exception as e:
+            app.logger.error(f"Failed to ensure database indexes: {str(e)}")
+
+    app.logger.info(
+        f"App setup completed in {(time.perf_counter() - startup_started) * 1000:.1f}ms"
+    )
+
+    if app.config["EMBEDDING_WARMUP"]:
+        # Runs in the gunicorn master when preload_app is set, before workers fork
+        try:
+            VectorService.warm_up(app.config["EMBEDDING_MODEL"])
+        except Exception as e:
+            app.logger.error(f"Embedding model warm-up failed: {str(e)}")
+
+    app.logger.info(
+        f"Startup completed in {(time.perf_counter() - startup_started) * 1000:.1f}ms"
+    )
+
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({"success": False, "message": "Resource not found"}), 404
@@ -68,6 +100,59 @@ def create_app(config_name=None):
             }
         ), 200
 
+    @app.route("/api/ready", methods=["GET"])
+    def readiness_check():
+        if not VectorService.is_ready():
+            return jsonify(
+                {
+                    "success": False,
+                    "status": "warming_up",
+                    "message": "Embedding model is not warmed up yet",
+                }
+            ), 503
+
+        return jsonify(
+            {
+                "success": True,
+                "status": "ready",
+                "startup_timings": VectorService.get_warmup_timings(),
+            }
+        ), 200
+
+    @app.route("/api/metrics", methods=["GET"])
+    def get_metrics():
+        token = app.config["METRICS_TOKEN"]
+        if token:
+            allowed = hmac.compare_digest(
+                request.headers.get("Authorization", ""), f"Bearer {token}"
+            )
+        else:
+            allowed = request.remote_addr in ("127.0.0.1", "::1")
+        if not allowed:
+            return jsonify({"success": False, "message": "Access denied"}), 403
+        return jsonify({"success": True, "metrics": metrics.snapshot()}), 200
+
+    @app.before_request
+    def reject_deactivated_writers():
+        """Refuse writes from deactivated accounts, whichever worker cached them"""
+        if request.method not in ("POST", "PUT", "PATCH", "DELETE"):
+            return None
+        try:
+            verify_jwt_in_request(optional=True)
+            user_id = get_jwt_identity()
+        except Exception:
+            # Invalid tokens are rejected by the route's own jwt_required
+            return None
+        if user_id and not AuthService.is_user_active(user_id):
+            return jsonify({"success": False, "message": "Account is deactivated"}), 403
+        return None
+
+    @app.before_request
+    def start_vector_sync_worker():
+        # Started lazily so each forked gunicorn worker runs its own drain thread
+        if app.config["VECTOR_SYNC_WORKER"]:
+            vector_sync.ensure_worker(app)
+
     @app.before_request
     def initialize_database():
         """Initialize database and seed with sample data if empty"""
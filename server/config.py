@@ -12,6 +12,10 @@ class Config:
     MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/ecommerce_db")
     client = pymongo.MongoClient(MONGO_URI)
     db = client.get_database()  # Automatically uses DB name from URI (e.g., ecommerce_db)
+    # Create the indexes from utils.db_indexes at startup (idempotent)
+    ENSURE_INDEXES_ON_STARTUP = (
+        os.environ.get("ENSURE_INDEXES_ON_STARTUP", "true").lower() == "true"
+    )
 
     JWT_SECRET_KEY = (
         os.environ.get("JWT_SECRET_KEY") or "jwt-secret-key-change-in-production"
@@ -26,11 +30,69 @@ class Config:
     PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
     PINECONE_ENVIRONMENT = os.environ.get("PINECONE_ENVIRONMENT")
     PINECONE_INDEX_NAME = os.environ.get("PINECONE_INDEX_NAME", "ecommerce-products")
+    # Upper bound for adaptive over-fetch when filtered vector search is short of results
+    VECTOR_SEARCH_MAX_TOP_K = int(os.environ.get("VECTOR_SEARCH_MAX_TOP_K", 200))
+    # Candidates taken from the in-process BM25 index for rank fusion
+    LEXICAL_SEARCH_TOP_K = int(os.environ.get("LEXICAL_SEARCH_TOP_K", 100))
+    # Background vector index sync (outbox drained by a worker thread per process)
+    VECTOR_SYNC_WORKER = os.environ.get("VECTOR_SYNC_WORKER", "true").lower() == "true"
+    VECTOR_SYNC_BATCH_SIZE = int(os.environ.get("VECTOR_SYNC_BATCH_SIZE", 100))
+    VECTOR_SYNC_POLL_INTERVAL = float(os.environ.get("VECTOR_SYNC_POLL_INTERVAL", 2))
+    VECTOR_SYNC_LEASE_SECONDS = int(os.environ.get("VECTOR_SYNC_LEASE_SECONDS", 60))
+    VECTOR_SYNC_BACKOFF_BASE_SECONDS = float(os.environ.get("VECTOR_SYNC_BACKOFF_BASE_SECONDS", 2))
+    VECTOR_SYNC_BACKOFF_MAX_SECONDS = float(os.environ.get("VECTOR_SYNC_BACKOFF_MAX_SECONDS", 300))
+    # Failed attempts before an outbox entry moves to vector_outbox_failed
+    VECTOR_SYNC_MAX_ATTEMPTS = int(os.environ.get("VECTOR_SYNC_MAX_ATTEMPTS", 10))
+    # Bearer token for /api/metrics; when unset only loopback requests are served
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    # Serve filtered product listings from an in-memory columnar catalog snapshot
+    CATALOG_SNAPSHOT_ENABLED = os.environ.get("CATALOG_SNAPSHOT_ENABLED", "true").lower() == "true"
+    # Cache-Control max-age for catalog-derived responses (categories, brands)
+    CATALOG_CACHE_MAX_AGE = int(os.environ.get("CATALOG_CACHE_MAX_AGE", 300))
+    # How often in-process catalog caches check the catalog version in MongoDB (seconds)
+    CATALOG_VERSION_CHECK_INTERVAL = float(os.environ.get("CATALOG_VERSION_CHECK_INTERVAL", 1))
+    # Rows validated, written and embedded together by the bulk product import
+    PRODUCT_IMPORT_CHUNK_SIZE = int(os.environ.get("PRODUCT_IMPORT_CHUNK_SIZE", 500))
+    # Neighbours kept per product in the precomputed similar-products table
+    SIMILAR_PRODUCTS_TOP_N = int(os.environ.get("SIMILAR_PRODUCTS_TOP_N", 20))
+    # Products per similarity matrix block when the table is rebuilt
+    SIMILAR_PRODUCTS_BLOCK_SIZE = int(os.environ.get("SIMILAR_PRODUCTS_BLOCK_SIZE", 512))
+    # Share of a user's taste vector from stated preferences; the rest comes from likes and cart
+    TASTE_PREFERENCE_WEIGHT = float(os.environ.get("TASTE_PREFERENCE_WEIGHT", 0.3))
+    TASTE_LIKE_WEIGHT = float(os.environ.get("TASTE_LIKE_WEIGHT", 1.0))
+    TASTE_CART_WEIGHT = float(os.environ.get("TASTE_CART_WEIGHT", 1.5))
+    # In-process taste vector cache (entries, seconds)
+    TASTE_CACHE_SIZE = int(os.environ.get("TASTE_CACHE_SIZE", 10000))
+    TASTE_CACHE_TTL = float(os.environ.get("TASTE_CACHE_TTL", 300))
+    # In-process cache of user documents, without password hashes (entries, seconds)
+    USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 30))
+    # Session interest: per-event decay of the running average (an event moves it by 1 - decay)
+    SESSION_INTEREST_DECAY = float(os.environ.get("SESSION_INTEREST_DECAY", 0.8))
+    # Max relative boost a result gets for matching the session interest
+    SESSION_INTEREST_WEIGHT = float(os.environ.get("SESSION_INTEREST_WEIGHT", 0.5))
+    # Candidates considered per returned result when re-ranking by session interest
+    SESSION_RERANK_POOL = int(os.environ.get("SESSION_RERANK_POOL", 2))
+    # Seconds an anonymous browse session lives after its last event
+    BROWSE_SESSION_TTL = int(os.environ.get("BROWSE_SESSION_TTL", 7 * 24 * 3600))
 
     FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://localhost:5173")
 
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"
     EMBEDDING_DIMENSION = 384
+    # Load and warm up the embedding model in create_app (before gunicorn forks)
+    EMBEDDING_WARMUP = os.environ.get("EMBEDDING_WARMUP", "true").lower() == "true"
+    # Micro-batch concurrent single-text encodes; only pays off when a worker
+    # serves several requests at once, so it is on by default for threaded or
+    # async gunicorn workers and off for the single-request sync worker
+    GUNICORN_WORKER_CLASS = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+    GUNICORN_THREADS = int(os.environ.get("GUNICORN_THREADS", 1))
+    EMBEDDING_BATCHING = os.environ.get(
+        "EMBEDDING_BATCHING",
+        "false" if GUNICORN_WORKER_CLASS == "sync" and GUNICORN_THREADS == 1 else "true",
+    ).lower() == "true"
+    EMBEDDING_BATCH_MAX_SIZE = int(os.environ.get("EMBEDDING_BATCH_MAX_SIZE", 32))
+    EMBEDDING_BATCH_MAX_WAIT_MS = float(os.environ.get("EMBEDDING_BATCH_MAX_WAIT_MS", 2))
 
 
 class DevelopmentConfig(Config):
@@ -1,4 +1,5 @@
 # Gunicorn configuration for Render deployment
+import gc
 import os
 
 # Server socket
@@ -7,7 +8,8 @@ backlog = 2048
 
 # Worker processes
 workers = 1  # Keep low due to memory constraints
-worker_class = "sync"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -15,7 +17,7 @@ keepalive = 2
 # Memory management
 max_requests = 1000
 max_requests_jitter = 50
-preload_app = True
+preload_app = True  # Loads and warms the embedding model once, in the master
 
 # Logging
 accesslog = "-"
@@ -32,3 +34,11 @@ pidfile = None
 user = None
 group = None
 tmp_upload_dir = None
+
+
+# Server hooks
+def when_ready(server):
+    # Freeze everything allocated while preloading the app (including the
+    # embedding model) so the GC of forked workers doesn't touch those pages
+    # and they stay shared copy-on-write.
+    gc.freeze()
@@ -4,6 +4,72 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import uuid
 
+# Fields that get a lowercase "<field>_norm" copy for index-backed matching
+NORMALIZED_FIELDS = ("category", "subcategory", "brand")
+MATCH_MODES = ("exact", "prefix", "contains")
+# Fields a Product is built from; skips _id and the normalised copies on reads
+PRODUCT_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "name": 1,
+    "description": 1,
+    "price": 1,
+    "original_price": 1,
+    "category": 1,
+    "subcategory": 1,
+    "brand": 1,
+    "rating": 1,
+    "review_count": 1,
+    "image_url": 1,
+    "stock": 1,
+    "features": 1,
+    "is_on_sale": 1,
+    "sale_percentage": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "is_active": 1,
+    "embedding_id": 1,
+}
+# Product fields plus the stored float32 copy of the product's vector
+PRODUCT_EMBEDDING_PROJECTION = {**PRODUCT_PROJECTION, "embedding": 1}
+
+
+def normalize_filter_value(value: str) -> str:
+    """Normalise a category/subcategory/brand value (case and whitespace)"""
+    return " ".join(value.split()).casefold()
+
+
+def product_document_to_dict(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a product document (or a Product's fields) straight to its API dict"""
+    price = doc["price"]
+    original_price = doc.get("original_price")
+    discount = 0
+    if original_price and original_price > price:
+        discount = round(((original_price - price) / original_price) * 100)
+    stock = doc.get("stock", 0)
+    return {
+        "id": doc["id"],
+        "name": doc["name"],
+        "description": doc["description"],
+        "price": price,
+        "originalPrice": original_price,
+        "category": doc["category"],
+        "subcategory": doc["subcategory"],
+        "brand": doc["brand"],
+        "rating": doc.get("rating", 0.0),
+        "reviewCount": doc.get("review_count", 0),
+        "imageUrl": doc.get("image_url"),
+        "stock": stock,
+        "features": doc.get("features", []),
+        "isOnSale": doc.get("is_on_sale", False),
+        "salePercentage": doc.get("sale_percentage") or discount,
+        "createdAt": doc["created_at"].isoformat(),
+        "updatedAt": doc["updated_at"].isoformat(),
+        "isActive": doc.get("is_active", True),
+        "inStock": stock > 0,
+    }
+
+
 class Product(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -39,6 +105,17 @@ class Product(BaseModel):
         features_text = " ".join(self.get_features())
         return f"{self.name} {self.description} {self.brand} {self.category} {self.subcategory} {features_text}"
 
+    def get_normalized_fields(self) -> Dict[str, str]:
+        """Get the lowercase copies of the filterable fields"""
+        return {
+            f"{field}_norm": normalize_filter_value(getattr(self, field))
+            for field in NORMALIZED_FIELDS
+        }
+
+    def to_document(self) -> Dict[str, Any]:
+        """Convert product to a MongoDB document, including normalised fields"""
+        return {**self.dict(), **self.get_normalized_fields()}
+
     def calculate_discount(self) -> int:
         """Calculate discount percentage"""
         if self.original_price and self.original_price > self.price:
@@ -51,27 +128,7 @@ class Product(BaseModel):
 
     def to_dict(self, include_embedding: bool = False) -> Dict[str, Any]:
         """Convert product to dictionary"""
-        data = {
-            "id": self.id,
-            "name": self.name,
-            "description": self.description,
-            "price": self.price,
-            "originalPrice": self.original_price,
-            "category": self.category,
-            "subcategory": self.subcategory,
-            "brand": self.brand,
-            "rating": self.rating,
-            "reviewCount": self.review_count,
-            "imageUrl": self.image_url,
-            "stock": self.stock,
-            "features": self.get_features(),
-            "isOnSale": self.is_on_sale,
-            "salePercentage": self.sale_percentage or self.calculate_discount(),
-            "createdAt": self.created_at.isoformat(),
-            "updatedAt": self.updated_at.isoformat(),
-            "isActive": self.is_active,
-            "inStock": self.is_in_stock(),
-        }
+        data = product_document_to_dict(self.__dict__)
 
         if include_embedding:
             data["embeddingId"] = self.embedding_id
@@ -4,11 +4,15 @@ from pydantic import BaseModel
 from typing import Optional, List
 from werkzeug.security import check_password_hash, generate_password_hash
 
+# Everything but the password hash, for lookups that never check passwords
+USER_PUBLIC_PROJECTION = {"_id": 0, "password_hash": 0}
+
+
 class User(BaseModel):
     id: str
     email: str
     name: str
-    password_hash: str
+    password_hash: Optional[str] = None  # Left out of cached lookups
     preferences: str = '{"favoriteCategories": [], "priceRange": [0, 2000], "favoriteBrands": []}'  # JSON string
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
@@ -24,7 +28,7 @@ class User(BaseModel):
 
     def check_password(self, password):
         """Check if provided password matches hash"""
-        return check_password_hash(self.password_hash, password)
+        return bool(self.password_hash) and check_password_hash(self.password_hash, password)
 
     def get_preferences(self):
         """Get user preferences as dict"""
@@ -6,7 +6,9 @@ class UserLike(BaseModel):
     id: str
     user_id: str
     product_id: str
+    liked: bool = True  # Toggled in place; unliked pairs keep their document
     created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
     class Config:
         arbitrary_types_allowed = True
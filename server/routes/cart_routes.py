@@ -1,6 +1,6 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from services.cart_service import CartService
+from services.cart_service import CartService, validate_bulk_lines
 
 cart_bp = Blueprint("cart", __name__)
 cart_service = CartService()
@@ -22,6 +22,28 @@ def get_cart(user_id):
         return jsonify({"error": str(e)}), 500
 
 
+@cart_bp.route("/cart/<user_id>/summary", methods=["GET"])
+@jwt_required()
+def get_cart_summary(user_id):
+    try:
+        current_user = get_jwt_identity()
+
+        # Users can only access their own cart
+        if current_user != user_id:
+            return jsonify({"error": "Unauthorized"}), 403
+
+        summary = cart_service.get_cart_summary(user_id)
+        return jsonify(
+            {
+                "success": True,
+                **summary,
+                "formatted_total": f"${summary['total']:.2f}",
+            }
+        ), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @cart_bp.route("/cart/add", methods=["POST"])
 @jwt_required()
 def add_to_cart():
@@ -39,15 +61,55 @@ def add_to_cart():
         if not user_id or not product_id:
             return jsonify({"error": "user_id and product_id are required"}), 400
 
-        cart_item = cart_service.add_to_cart(user_id, product_id, quantity)
-        return jsonify(
-            {
-                **cart_item.to_dict(),
-                "product": cart_item.product.to_dict()
-                if hasattr(cart_item, "product") and cart_item.product
-                else None,
-            }
-        ), 200
+        if not isinstance(product_id, str):
+            return jsonify({"error": "product_id must be a string"}), 400
+
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            return jsonify({"error": "quantity must be a positive integer"}), 400
+
+        result = cart_service.add_to_cart(
+            user_id, product_id, quantity, session_id=request.headers.get("X-Session-Id")
+        )
+        if not result["success"]:
+            status = 404 if result.get("missing") else 500
+            return jsonify({"success": False, "message": result["message"]}), status
+        return jsonify(result["cart_item"]), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@cart_bp.route("/cart/bulk", methods=["POST"])
+@jwt_required()
+def bulk_update_cart():
+    try:
+        current_user = get_jwt_identity()
+        data = request.get_json()
+        user_id = data.get("user_id")
+        items = data.get("items")
+
+        # Users can only change their own cart
+        if current_user != user_id:
+            return jsonify({"error": "Unauthorized"}), 403
+
+        if not user_id:
+            return jsonify({"error": "user_id is required"}), 400
+
+        error = validate_bulk_lines(items)
+        if error:
+            return jsonify({"error": error}), 400
+
+        result = cart_service.bulk_update(
+            user_id, items, session_id=request.headers.get("X-Session-Id")
+        )
+        if not result["success"]:
+            if result.get("missing"):
+                return jsonify(result), 404
+            return jsonify({"success": False, "message": result["message"]}), 500
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -68,9 +130,9 @@ def remove_from_cart():
         if not user_id or not item_id:
             return jsonify({"error": "user_id and item_id are required"}), 400
 
-        success = cart_service.remove_from_cart(user_id, item_id)
+        result = cart_service.remove_from_cart(user_id, item_id)
 
-        if success:
+        if result["success"]:
             return jsonify({"success": True, "message": "Item removed from cart"}), 200
         else:
             return jsonify({"success": False, "message": "Item not found"}), 404
@@ -97,19 +159,19 @@ def update_cart_quantity():
 
         if quantity <= 0:
             # Remove item if quantity is 0 or negative
-            success = cart_service.remove_from_cart(user_id, item_id)
-            if success:
+            result = cart_service.remove_from_cart(user_id, item_id)
+            if result["success"]:
                 return jsonify({"success": True, "message": "Item removed from cart"}), 200
             else:
                 return jsonify({"success": False, "message": "Item not found"}), 404
         else:
-            cart_item = cart_service.update_cart_quantity(user_id, item_id, quantity)
-            if cart_item:
+            result = cart_service.update_cart_quantity(user_id, item_id, quantity)
+            if result["success"]:
                 return jsonify(
                     {
                         "success": True,
                         "message": "Cart updated",
-                        "item": cart_item.to_dict(),
+                        "item": result["cart_item"],
                     }
                 ), 200
             else:
@@ -133,9 +195,9 @@ def clear_cart():
         if not user_id:
             return jsonify({"error": "user_id is required"}), 400
 
-        success = cart_service.clear_cart(user_id)
+        result = cart_service.clear_cart(user_id)
 
-        if success:
+        if result["success"]:
             return jsonify({"success": True, "message": "Cart cleared"}), 200
         else:
             return jsonify({"success": False, "message": "Failed to clear cart"}), 500
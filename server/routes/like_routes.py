@@ -1,6 +1,6 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import get_jwt_identity, jwt_required
-from services.like_service import LikeService
+from flask_jwt_extended import get_jwt_identity, jwt_required, verify_jwt_in_request
+from services.like_service import MAX_BATCH_PRODUCT_IDS, LikeService
 
 like_bp = Blueprint("likes", __name__)
 like_service = LikeService()
@@ -18,6 +18,8 @@ def toggle_like():
             return jsonify({"error": "product_id is required"}), 400
         
         is_liked, message = like_service.toggle_like(current_user, product_id)
+        if is_liked is None:
+            return jsonify({"success": False, "message": message}), 404
         
         return jsonify({
             "success": True,
@@ -87,6 +89,46 @@ def check_like_status():
         return jsonify({"error": str(e)}), 500
 
 
+@like_bp.route("/likes/batch", methods=["POST"])
+def get_batch_likes():
+    """Like counts for a grid of products, plus which of them the caller likes"""
+    try:
+        data = request.get_json() or {}
+        product_ids = data.get("product_ids")
+
+        if not isinstance(product_ids, list) or not all(
+            isinstance(product_id, str) for product_id in product_ids
+        ):
+            return jsonify({"error": "product_ids must be a list of strings"}), 400
+        if len(product_ids) > MAX_BATCH_PRODUCT_IDS:
+            return jsonify(
+                {"error": f"at most {MAX_BATCH_PRODUCT_IDS} product_ids per request"}
+            ), 400
+
+        product_ids = list(dict.fromkeys(product_ids))
+        likes_counts = like_service.get_likes_counts(product_ids)
+
+        current_user = None
+        try:
+            verify_jwt_in_request(optional=True)
+            current_user = get_jwt_identity()
+        except:
+            pass
+
+        liked = []
+        if current_user:
+            liked = like_service.get_liked_ids(current_user, product_ids)
+
+        return jsonify({
+            "success": True,
+            "likes_counts": likes_counts,
+            "liked": liked
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @like_bp.route("/likes/popular", methods=["GET"])
 def get_popular_products():
     try:
@@ -3,12 +3,46 @@ from flask_jwt_extended import jwt_required, get_jwt_identity, jwt_required, ver
 import logging
 
 # Removed: from models.product import Product (use from service)
+from models.product import (
+    MATCH_MODES,
+    PRODUCT_EMBEDDING_PROJECTION,
+    PRODUCT_PROJECTION,
+    product_document_to_dict,
+)
+from services.product_import import IMPORT_FORMATS, IMPORT_MODES, ProductImportService
 from services.product_service import ProductService
 from services.auth_service import AuthService
+from services.session_interest import session_interest
+from services.taste_service import taste_service
+from utils.http_cache import catalog_cached_response
+from utils.pagination import SORT_OPTIONS
 
 logger = logging.getLogger(__name__)
 product_bp = Blueprint("products", __name__)
 product_service = ProductService()
+product_import_service = ProductImportService()
+
+
+def _session_id():
+    """Chat/browse session id sent by the client, for session-interest personalisation"""
+    return request.headers.get("X-Session-Id") or request.args.get("session_id")
+
+
+def _current_user_id():
+    """Identity of an optional JWT, used to check chat session ownership"""
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def _session_vector(session_id=None):
+    """Interest vector of the request's session, if the caller may use it"""
+    session_id = session_id or _session_id()
+    if not session_id:
+        return None
+    return session_interest.get_vector(session_id, _current_user_id())
 
 
 @product_bp.route("/", methods=["GET"])
@@ -24,20 +58,67 @@ def get_products():
         in_stock_only = request.args.get("in_stock_only", "false").lower() == "true"
         search_query = request.args.get("search")
         limit = request.args.get("limit", 50, type=int)
+        include_facets = request.args.get("facets", "false").lower() == "true"
+        match = request.args.get("match", "exact").lower()
+        sort = request.args.get("sort", "rating")
+        cursor = request.args.get("cursor")
+
+        if match not in MATCH_MODES:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "message": f"match must be one of: {', '.join(MATCH_MODES)}",
+                    }
+                ),
+                400,
+            )
 
-        if not search_query:
-            products = product_service.search_by_filters(
-                category=category,
-                subcategory=subcategory,
-                brand=brand,
-                min_price=min_price,
-                max_price=max_price,
-                min_rating=min_rating,
-                in_stock_only=in_stock_only,
-                limit=limit,
+        if sort not in SORT_OPTIONS:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "message": f"sort must be one of: {', '.join(SORT_OPTIONS)}",
+                    }
+                ),
+                400,
             )
+
+        page = None
+        if not search_query:
+            try:
+                page = product_service.list_products(
+                    sort=sort,
+                    cursor=cursor,
+                    limit=limit,
+                    include_facets=include_facets,
+                    category=category,
+                    subcategory=subcategory,
+                    brand=brand,
+                    min_price=min_price,
+                    max_price=max_price,
+                    min_rating=min_rating,
+                    in_stock_only=in_stock_only,
+                    match=match,
+                )
+            except ValueError as e:
+                return jsonify({"success": False, "message": str(e)}), 400
+            product_dicts = page["products"]
         else:
-            filters = {}
+            # Search results are a single page ordered by relevance
+            if cursor or "sort" in request.args:
+                return (
+                    jsonify(
+                        {
+                            "success": False,
+                            "message": "cursor and sort are not supported with search; results are a single relevance-ordered page",
+                        }
+                    ),
+                    400,
+                )
+
+            filters = {"match": match}
             if category:
                 filters["category"] = category
             if subcategory:
@@ -53,15 +134,30 @@ def get_products():
             if in_stock_only:
                 filters["in_stock_only"] = in_stock_only
 
-            products = product_service.search_products(search_query, filters, limit)
+            try:
+                products = product_service.search_products(
+                    search_query,
+                    filters,
+                    limit,
+                    session_vector=_session_vector(),
+                )
+            except ValueError as e:
+                return jsonify({"success": False, "message": str(e)}), 400
+            product_dicts = [product.to_dict() for product in products]
+
+        response = {
+            "success": True,
+            "products": product_dicts,
+            "count": len(product_dicts),
+        }
+        if page is not None:
+            response["nextCursor"] = page["next_cursor"]
+            response["total"] = page["total"]
+            response["totalIsEstimate"] = page["total_is_estimate"]
+            if "facets" in page:
+                response["facets"] = page["facets"]
 
-        return jsonify(
-            {
-                "success": True,
-                "products": [product.to_dict() for product in products],
-                "count": len(products),
-            }
-        ), 200
+        return jsonify(response), 200
 
     except Exception as e:
         logger.error(f"Error in get_products endpoint: {str(e)}")
@@ -72,12 +168,16 @@ def get_products():
 def get_product(product_id):
     """Get a specific product by ID"""
     try:
-        doc = product_service.collection.find_one({"id": product_id})  # Direct access for simplicity
+        session_id = _session_id()
+        projection = PRODUCT_EMBEDDING_PROJECTION if session_id else PRODUCT_PROJECTION
+        doc = product_service.collection.find_one({"id": product_id}, projection)  # Direct access for simplicity
         if not doc:
             return jsonify({"success": False, "message": "Product not found"}), 404
 
-        product = Product(**doc)
-        return jsonify({"success": True, "product": product.to_dict()}), 200
+        if session_id:
+            session_interest.record(session_id, [doc], "view", _current_user_id())
+
+        return jsonify({"success": True, "product": product_document_to_dict(doc)}), 200
 
     except Exception as e:
         logger.error(f"Error in get_product endpoint: {str(e)}")
@@ -99,7 +199,12 @@ def search_products():
         filters = data.get("filters", {})
         limit = data.get("limit", 20)
 
-        products = product_service.search_products(query, filters, limit)
+        try:
+            products = product_service.search_products(
+                query, filters, limit, session_vector=_session_vector(data.get("session_id"))
+            )
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
 
         return jsonify(
             {
@@ -115,6 +220,18 @@ def search_products():
         return jsonify({"success": False, "message": "Search failed"}), 500
 
 
+@product_bp.route("/sessions", methods=["POST"])
+def create_browse_session():
+    """Issue an anonymous browse session id for session-interest personalisation"""
+    try:
+        session_id = session_interest.issue_browse_session()
+        return jsonify({"success": True, "session_id": session_id}), 201
+
+    except Exception as e:
+        logger.error(f"Error in create_browse_session endpoint: {str(e)}")
+        return jsonify({"success": False, "message": "Failed to create session"}), 500
+
+
 @product_bp.route("/recommendations", methods=["GET"])
 def get_recommendations():
     """Get product recommendations"""
@@ -123,18 +240,25 @@ def get_recommendations():
         limit = request.args.get("limit", 6, type=int)
 
         user_preferences = None
+        taste_vector = None
         try:
             verify_jwt_in_request(optional=True)
             current_user_id = get_jwt_identity()
-            if current_user_id:
-                user = AuthService.get_user_by_id(current_user_id)
-                if user:
-                    user_preferences = user.get_preferences()
+            if current_user_id and not product_id:
+                taste_vector = taste_service.get_taste_vector(current_user_id)
+                if taste_vector is None:
+                    user = AuthService.get_user_by_id(current_user_id)
+                    if user:
+                        user_preferences = user.get_preferences()
         except:
             pass
 
         recommendations = product_service.get_recommendations(
-            product_id=product_id, user_preferences=user_preferences, limit=limit
+            product_id=product_id,
+            user_preferences=user_preferences,
+            limit=limit,
+            taste_vector=taste_vector,
+            session_vector=_session_vector(),
         )
 
         return jsonify(
@@ -156,16 +280,10 @@ def get_recommendations():
 def get_categories():
     """Get all product categories and subcategories"""
     try:
-        # MongoDB aggregate for distinct category + subcategories
-        pipeline = [
-            {"$match": {"is_active": True}},
-            {"$group": {"_id": "$category", "subcategories": {"$addToSet": "$subcategory"}}}
-        ]
-        categories = list(product_service.collection.aggregate(pipeline))
-
-        result = [{"category": cat["_id"], "subcategories": cat["subcategories"]} for cat in categories]
-
-        return jsonify({"success": True, "categories": result}), 200
+        return catalog_cached_response(
+            "categories",
+            lambda: {"success": True, "categories": product_service.get_categories()},
+        )
 
     except Exception as e:
         logger.error(f"Error in get_categories endpoint: {str(e)}")
@@ -176,11 +294,10 @@ def get_categories():
 def get_brands():
     """Get all product brands"""
     try:
-        # MongoDB distinct
-        brands = product_service.collection.distinct("brand", {"is_active": True})
-        brands.sort()
-
-        return jsonify({"success": True, "brands": brands}), 200
+        return catalog_cached_response(
+            "brands",
+            lambda: {"success": True, "brands": product_service.get_brands()},
+        )
 
     except Exception as e:
         logger.error(f"Error in get_brands endpoint: {str(e)}")
@@ -191,33 +308,7 @@ def get_brands():
 def get_product_stats():
     """Get product statistics"""
     try:
-        # MongoDB aggregates
-        total_products = product_service.collection.count_documents({"is_active": True})
-
-        total_categories = len(product_service.collection.distinct("category", {"is_active": True}))
-
-        total_brands = len(product_service.collection.distinct("brand", {"is_active": True}))
-
-        price_min = product_service.collection.aggregate([{"$match": {"is_active": True}}, {"$group": {"_id": None, "min": {"$min": "$price"}}}]).next()["min"] if total_products > 0 else 0
-
-        price_max = product_service.collection.aggregate([{"$match": {"is_active": True}}, {"$group": {"_id": None, "max": {"$max": "$price"}}}]).next()["max"] if total_products > 0 else 0
-
-        avg_rating = product_service.collection.aggregate([{"$match": {"is_active": True}}, {"$group": {"_id": None, "avg": {"$avg": "$rating"}}}]).next()["avg"] if total_products > 0 else 0
-        avg_rating = round(avg_rating, 2)
-
-        in_stock_count = product_service.collection.count_documents({"stock": {"$gt": 0}, "is_active": True})
-
-        stats = {
-            "total_products": total_products,
-            "total_categories": total_categories,
-            "total_brands": total_brands,
-            "price_range": {
-                "min": price_min,
-                "max": price_max,
-            },
-            "average_rating": avg_rating,
-            "in_stock_count": in_stock_count,
-        }
+        stats = product_service.get_product_stats()
 
         return jsonify({"success": True, "stats": stats}), 200
 
@@ -263,6 +354,58 @@ def create_product():
         return jsonify({"success": False, "message": "Failed to create product"}), 500
 
 
+@product_bp.route("/import", methods=["POST"])
+@jwt_required()
+def import_products():
+    """Bulk import products from a streamed NDJSON or CSV body (admin only)"""
+    try:
+        fmt = request.args.get("format")
+        if not fmt:
+            fmt = "csv" if request.mimetype == "text/csv" else "ndjson"
+        mode = request.args.get("mode", "insert")
+        embed = request.args.get("embed", "true").lower() == "true"
+
+        if fmt not in IMPORT_FORMATS:
+            return jsonify(
+                {"success": False, "message": f"format must be one of: {', '.join(IMPORT_FORMATS)}"}
+            ), 400
+        if mode not in IMPORT_MODES:
+            return jsonify(
+                {"success": False, "message": f"mode must be one of: {', '.join(IMPORT_MODES)}"}
+            ), 400
+
+        summary = product_import_service.import_stream(
+            request.stream, fmt=fmt, mode=mode, embed=embed
+        )
+
+        return jsonify({"success": True, "summary": summary}), 200
+
+    except Exception as e:
+        logger.error(f"Error in import_products endpoint: {str(e)}")
+        return jsonify({"success": False, "message": "Failed to import products"}), 500
+
+
+@product_bp.route("/bulk", methods=["PATCH"])
+@jwt_required()
+def bulk_update_products():
+    """Bulk update price and stock (admin only)"""
+    try:
+        data = request.get_json()
+
+        if not data or not isinstance(data.get("updates"), list):
+            return jsonify(
+                {"success": False, "message": "updates list is required"}
+            ), 400
+
+        result = product_service.bulk_update_price_stock(data["updates"])
+
+        return jsonify({"success": True, **result}), 200
+
+    except Exception as e:
+        logger.error(f"Error in bulk_update_products endpoint: {str(e)}")
+        return jsonify({"success": False, "message": "Failed to update products"}), 500
+
+
 @product_bp.route("/<product_id>", methods=["PUT"])
 @jwt_required()
 def update_product(product_id):
@@ -288,6 +431,8 @@ def update_product(product_id):
             }
         ), 200
 
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"Invalid update: {str(e)}"}), 400
     except Exception as e:
         logger.error(f"Error in update_product endpoint: {str(e)}")
         return jsonify({"success": False, "message": "Failed to update product"}), 500
@@ -0,0 +1,123 @@
+import argparse
+
+from pymongo import ASCENDING, UpdateOne
+
+from app import create_app
+from config import Config as AppConfig
+from models.product import NORMALIZED_FIELDS, normalize_filter_value
+from services.catalog_version import catalog_version
+from services.vector_sync import vector_sync
+
+
+def backfill(batch_size, recompute_all=False):
+    collection = AppConfig.db["products"]
+    query = {}
+    if not recompute_all:
+        query = {
+            "$or": [
+                {f"{field}_norm": {"$exists": False}} for field in NORMALIZED_FIELDS
+            ]
+        }
+    projection = {"_id": 1, "id": 1, **{field: 1 for field in NORMALIZED_FIELDS}}
+
+    updated = 0
+    last_id = None
+    while True:
+        # Page by _id so each batch is an index range scan, not a growing skip
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        docs = list(
+            collection.find(batch_query, projection)
+            .sort("_id", ASCENDING)
+            .limit(batch_size)
+        )
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+
+        collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": doc["_id"]},
+                    {
+                        "$set": {
+                            f"{field}_norm": normalize_filter_value(doc.get(field) or "")
+                            for field in NORMALIZED_FIELDS
+                        }
+                    },
+                )
+                for doc in docs
+            ],
+            ordered=False,
+        )
+        updated += len(docs)
+        print(f"Back-filled {updated} products...")
+
+    if updated:
+        catalog_version.bump()
+    return updated
+
+
+def resync_vector_metadata(batch_size):
+    """Rewrite every product's vector metadata, then record that push-down is safe"""
+    if vector_sync.normalized_metadata_ready():
+        print("Vector metadata already has the normalised fields.")
+        return True
+
+    collection = AppConfig.db["products"]
+    entry_ids = []
+    last_id = None
+    while True:
+        batch_query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        docs = list(
+            collection.find(batch_query, {"_id": 1, "id": 1})
+            .sort("_id", ASCENDING)
+            .limit(batch_size)
+        )
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        # Metadata-only entries rewrite vector metadata without re-embedding
+        entry_ids += vector_sync.enqueue([doc["id"] for doc in docs], kind="metadata")
+    print(f"Queued vector metadata refresh for {len(entry_ids)} products...")
+
+    while vector_sync.drain_once():
+        pass
+
+    remaining = AppConfig.db["vector_outbox"].count_documents({"_id": {"$in": entry_ids}})
+    if remaining:
+        print(f"{remaining} vector metadata refreshes did not complete; run again to retry.")
+        return False
+    vector_sync.mark_normalized_metadata()
+    print("Vector metadata refreshed; exact filters are now pushed down to the vector index.")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Back-fill the normalised category/subcategory/brand fields"
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="recompute every product, not only those missing normalised fields",
+    )
+    parser.add_argument(
+        "--skip-vectors",
+        action="store_true",
+        help="only back-fill MongoDB; exact filters stay off the vector index until a full run",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        updated = backfill(args.batch_size, args.all)
+        print(f"Done: {updated} products back-filled.")
+        if not args.skip_vectors:
+            resync_vector_metadata(args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
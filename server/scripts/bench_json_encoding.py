@@ -0,0 +1,78 @@
+import argparse
+import time
+import uuid
+from datetime import datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from models.product import product_document_to_dict
+from scripts.bench_product_serialization import make_documents
+from utils.json_provider import ORJSONProvider
+
+
+def products_response(count):
+    """Body of GET /api/products with count products"""
+    products = [product_document_to_dict(doc) for doc in make_documents(count)]
+    return {
+        "success": True,
+        "products": products,
+        "count": len(products),
+        "nextCursor": "eyJzIjoicmF0aW5nIiwiayI6NC41LCJpZCI6IngifQ",
+        "total": 1200,
+        "totalIsEstimate": False,
+    }
+
+
+def chat_response(count):
+    """Body of POST /api/chat/message with a bot reply recommending count products"""
+    return {
+        "success": True,
+        "session_id": str(uuid.uuid4()),
+        "response": {
+            "id": str(uuid.uuid4()),
+            "content": "Here are a few options you might like — all highly rated:\n" * 3,
+            "isBot": True,
+            "timestamp": datetime.utcnow().isoformat(),
+            "products": [product_document_to_dict(doc) for doc in make_documents(count)],
+            "type": "product",
+        },
+    }
+
+
+def bench(provider, body, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        provider.response(body)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON response encoding")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app()
+    stdlib = DefaultJSONProvider(app)
+    fast = ORJSONProvider(app)
+
+    cases = [
+        ("/api/products (50 products)", products_response(50)),
+        ("/api/products (100 products)", products_response(100)),
+        ("/api/chat/message (4 products)", chat_response(4)),
+    ]
+    with app.app_context():
+        for label, body in cases:
+            assert stdlib.response(body).get_data() == fast.response(body).get_data()
+            stdlib_time = bench(stdlib, body, args.repeat)
+            fast_time = bench(fast, body, args.repeat)
+            print(
+                f"{label:32} stdlib {stdlib_time * 1000:7.3f} ms  "
+                f"orjson {fast_time * 1000:7.3f} ms  ({stdlib_time / fast_time:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from app import create_app
+from models.product import Product, product_document_to_dict
+from services.catalog_snapshot import CatalogSnapshot
+
+
+def make_documents(count):
+    """Synthetic product documents shaped like the ones stored in MongoDB"""
+    rng = random.Random(42)
+    now = datetime.now()
+    docs = []
+    for i in range(count):
+        price = round(rng.uniform(5, 3000), 2)
+        created_at = now - timedelta(minutes=rng.randint(0, 500000))
+        docs.append(
+            {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "name": f"Product {i}",
+                "description": "A reasonably long product description. " * 4,
+                "price": price,
+                "original_price": round(price * 1.2, 2) if i % 3 == 0 else None,
+                "category": rng.choice(["Electronics", "Home", "Sports", "Books"]),
+                "subcategory": rng.choice(["Audio", "Laptops", "Kitchen", "Outdoor"]),
+                "brand": f"Brand {i % 40}",
+                "rating": round(rng.uniform(1, 5), 1),
+                "review_count": rng.randint(0, 5000),
+                "image_url": f"https://example.com/images/{i}.jpg",
+                "stock": rng.randint(0, 100),
+                "features": [f"Feature {j}" for j in range(6)],
+                "is_on_sale": i % 3 == 0,
+                "sale_percentage": None,
+                "created_at": created_at,
+                "updated_at": created_at,
+                "is_active": True,
+                "embedding_id": None,
+            }
+        )
+    return docs
+
+
+def bench(label, count, func, repeat):
+    best = min(_timed(func) for _ in range(repeat))
+    print(f"  {label:38} {best * 1000:9.2f} ms  {best / count * 1e6:7.2f} us/product")
+
+
+def _timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark product read-path serialisation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    create_app()
+    for count in args.sizes:
+        docs = make_documents(count)
+        products = [Product(**doc) for doc in docs]
+        snapshot = CatalogSnapshot(products, version=0)
+        indices = range(count)
+
+        print(f"{count} products (best of {args.repeat}):")
+        bench(
+            "Product(**doc).to_dict() (validated)",
+            count,
+            lambda: [Product(**doc).to_dict() for doc in docs],
+            args.repeat,
+        )
+        bench(
+            "product_document_to_dict(doc)",
+            count,
+            lambda: [product_document_to_dict(doc) for doc in docs],
+            args.repeat,
+        )
+        bench(
+            "snapshot rows (precomputed)",
+            count,
+            lambda: [snapshot.rows[i] for i in indices],
+            args.repeat,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import argparse
+import time
+
+from app import create_app
+from config import Config as AppConfig
+from services.similarity_service import similarity_service
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild the precomputed similar-products table from the vector index"
+    )
+    parser.add_argument("--top-n", type=int, default=AppConfig.SIMILAR_PRODUCTS_TOP_N)
+    parser.add_argument(
+        "--block-size", type=int, default=AppConfig.SIMILAR_PRODUCTS_BLOCK_SIZE
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        count = similarity_service.rebuild(args.top_n, args.block_size)
+        print(
+            f"Done: neighbour lists for {count} products "
+            f"in {time.perf_counter() - started:.1f}s."
+        )
+
+
+if __name__ == "__main__":
+    main()
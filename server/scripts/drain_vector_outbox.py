@@ -0,0 +1,34 @@
+import argparse
+
+from app import create_app
+from services.vector_sync import vector_sync
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drain the vector sync outbox")
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="re-queue entries that ran out of attempts before draining",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.retry_failed:
+            print(f"Re-queued {vector_sync.retry_failed()} failed outbox entries.")
+        print(f"Pending before drain: {vector_sync.get_lag()}")
+
+        synced = 0
+        while True:
+            processed = vector_sync.drain_once()
+            if not processed:
+                break
+            synced += processed
+
+        print(f"Synced {synced} outbox entries.")
+        print(f"Pending after drain: {vector_sync.get_lag()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+import json
+import os
+
+from app import create_app
+from services.product_import import IMPORT_FORMATS, IMPORT_MODES, ProductImportService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import products from NDJSON or CSV")
+    parser.add_argument("path", help="NDJSON (.ndjson/.jsonl) or CSV (.csv) file")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="defaults to the file extension")
+    parser.add_argument("--mode", choices=IMPORT_MODES, default="insert")
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument(
+        "--no-embed",
+        action="store_true",
+        help="leave embedding to the vector sync worker",
+    )
+    args = parser.parse_args()
+
+    fmt = args.format
+    if not fmt:
+        fmt = "csv" if os.path.splitext(args.path)[1].lower() == ".csv" else "ndjson"
+
+    app = create_app()
+    with app.app_context():
+        with open(args.path, "rb") as stream:
+            summary = ProductImportService().import_stream(
+                stream,
+                fmt=fmt,
+                mode=args.mode,
+                chunk_size=args.chunk_size,
+                embed=not args.no_embed,
+            )
+        print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
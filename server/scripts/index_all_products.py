@@ -1,37 +1,14 @@
 from app import create_app
-from models import db, Product
-from services.vector_service import VectorService
+from services.product_service import ProductService
 
 
 def main():
     app = create_app()
     with app.app_context():
-        vector_service = VectorService()
-        vector_service.initialize()
-
-        products = Product.query.filter_by(is_active=True).all()
-        print(f"Found {len(products)} products to index...")
-
-        product_dicts = []
-        for product in products:
-            product_dicts.append(
-                {
-                    "id": product.id,
-                    "text": product.get_search_text(),
-                    "metadata": {
-                        "category": product.category,
-                        "subcategory": product.subcategory,
-                        "brand": product.brand,
-                        "price": product.price,
-                        "rating": product.rating,
-                        "in_stock": product.is_in_stock(),
-                    },
-                }
-            )
-
-        if product_dicts:
-            vector_service.batch_upsert_products(product_dicts)
-            print("All products indexed to Pinecone.")
+        # Embeds every active product and stores the vector on its document too
+        count = ProductService().bulk_generate_embeddings()
+        if count:
+            print(f"Indexed {count} products to Pinecone.")
         else:
             print("No products found to index.")
 
@@ -0,0 +1,53 @@
+import argparse
+import sys
+
+from app import create_app
+from config import Config as AppConfig
+from utils.db_indexes import audit_queries, ensure_indexes
+
+
+def apply_indexes():
+    created = ensure_indexes(AppConfig.db)
+    for collection_name, names in created.items():
+        print(f"{collection_name}: {', '.join(names) if names else '(none)'}")
+    return 0
+
+
+def audit():
+    report = audit_queries(AppConfig.db)
+    problems = 0
+    for entry in report:
+        if entry["error"]:
+            status = "ERROR"
+        elif entry["collection_scan"]:
+            status = "COLLSCAN"
+        elif entry["in_memory_sort"]:
+            status = "SORT"
+        else:
+            status = "ok"
+        if status != "ok":
+            problems += 1
+
+        print(f"[{status:8}] {entry['collection']:15} {entry['source']}")
+        print(f"           plan: {' <- '.join(entry['stages']) or entry['error']}")
+
+    print(f"\n{problems} of {len(report)} queries need attention.")
+    return 1 if problems else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage MongoDB indexes")
+    parser.add_argument(
+        "command",
+        choices=["apply", "audit"],
+        help="apply: create registered indexes; audit: explain service queries",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        sys.exit(apply_indexes() if args.command == "apply" else audit())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+from app import create_app
+from services.like_service import LikeService
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        corrected = LikeService().recount_like_counts()
+        print(f"Done: {corrected} product like counts corrected.")
+
+
+if __name__ == "__main__":
+    main()
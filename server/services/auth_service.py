@@ -1,40 +1,59 @@
 import logging
 from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
-    get_jwt_identity,
 )
-from werkzeug.security import check_password_hash
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from werkzeug.security import generate_password_hash
+import json
 import uuid
 
-from models.user import User
+from config import Config as AppConfig
+from models.user import USER_PUBLIC_PROJECTION, User
+from services.taste_service import taste_service
+from utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# User documents without password hashes, keyed by id and shared by the process
+_users = TTLCache("users", AppConfig.USER_CACHE_SIZE, AppConfig.USER_CACHE_TTL)
+
 
 class AuthService:
-    """Service for authentication and user management"""
+    """Service for authentication and user management.
+
+    Id lookups, made on nearly every personalised request, are served from
+    an in-process cache of user documents read without their password hash;
+    entries are dropped when the user's preferences or status change. Other
+    workers only see such changes when their entry expires, so account status
+    checks that gate tokens and writes use ``is_user_active`` instead.
+    """
 
     @staticmethod
     def register_user(name: str, email: str, password: str) -> Dict[str, Any]:
         """Register a new user"""
         try:
-            existing_user = User.query.filter_by(email=email).first()
-            if existing_user:
+            users = AppConfig.db["users"]
+            if users.count_documents({"email": email}, limit=1):
                 return {
                     "success": False,
                     "message": "User with this email already exists",
                 }
 
+            now = datetime.now()
             user_id = str(uuid.uuid4())
-            user = User(id=user_id, email=email, name=name, password=password)
-
-            from models import db
-
-            db.session.add(user)
-            db.session.commit()
+            user = User(
+                id=user_id,
+                email=email,
+                name=name,
+                password_hash=generate_password_hash(password),
+                created_at=now,
+                updated_at=now,
+            )
+            users.insert_one(user.dict())
 
             access_token = create_access_token(identity=user_id)
             refresh_token = create_refresh_token(identity=user_id)
@@ -49,18 +68,18 @@ class AuthService:
                 "refresh_token": refresh_token,
             }
 
+        except DuplicateKeyError:
+            return {"success": False, "message": "User with this email already exists"}
         except Exception as e:
             logger.error(f"Error registering user: {str(e)}")
-            from models import db
-
-            db.session.rollback()
             return {"success": False, "message": "Registration failed"}
 
     @staticmethod
     def login_user(email: str, password: str) -> Dict[str, Any]:
         """Authenticate user and return tokens"""
         try:
-            user = User.query.filter_by(email=email).first()
+            doc = AppConfig.db["users"].find_one({"email": email}, {"_id": 0})
+            user = User(**doc) if doc else None
 
             if not user or not user.check_password(password):
                 return {"success": False, "message": "Invalid email or password"}
@@ -71,10 +90,11 @@ class AuthService:
             access_token = create_access_token(identity=user.id)
             refresh_token = create_refresh_token(identity=user.id)
 
-            user.updated_at = datetime.utcnow()
-            from models import db
-
-            db.session.commit()
+            user.updated_at = datetime.now()
+            AppConfig.db["users"].update_one(
+                {"id": user.id}, {"$set": {"updated_at": user.updated_at}}
+            )
+            _users.invalidate(user.id)
 
             logger.info(f"User logged in successfully: {email}")
 
@@ -92,9 +112,16 @@ class AuthService:
 
     @staticmethod
     def get_user_by_id(user_id: str) -> Optional[User]:
-        """Get user by ID"""
+        """Get user by ID, without the password hash"""
         try:
-            return User.query.get(user_id)
+            doc = _users.get(user_id)
+            if doc is None:
+                doc = AppConfig.db["users"].find_one({"id": user_id}, USER_PUBLIC_PROJECTION)
+                if not doc:
+                    return None
+                _users.set(user_id, doc)
+            # A fresh model per call, so callers cannot mutate the cached document
+            return User(**doc)
         except Exception as e:
             logger.error(f"Error getting user by ID: {str(e)}")
             return None
@@ -105,14 +132,18 @@ class AuthService:
     ) -> Dict[str, Any]:
         """Update user preferences"""
         try:
-            user = User.query.get(user_id)
-            if not user:
+            doc = AppConfig.db["users"].find_one_and_update(
+                {"id": user_id},
+                {"$set": {"preferences": json.dumps(preferences), "updated_at": datetime.now()}},
+                projection=USER_PUBLIC_PROJECTION,
+                return_document=ReturnDocument.AFTER,
+            )
+            _users.invalidate(user_id)
+            if not doc:
                 return {"success": False, "message": "User not found"}
 
-            user.set_preferences(preferences)
-            from models import db
-
-            db.session.commit()
+            user = User(**doc)
+            taste_service.record_preferences(user_id, preferences)
 
             logger.info(f"Updated preferences for user: {user.email}")
 
@@ -124,17 +155,20 @@ class AuthService:
 
         except Exception as e:
             logger.error(f"Error updating user preferences: {str(e)}")
-            from models import db
-
-            db.session.rollback()
             return {"success": False, "message": "Failed to update preferences"}
 
+    @staticmethod
+    def is_user_active(user_id: str) -> bool:
+        """Whether the account exists and is active, read uncached from MongoDB"""
+        # Uncached: a deactivation on another worker must take effect at once
+        user = AppConfig.db["users"].find_one({"id": user_id}, {"_id": 0, "is_active": 1})
+        return bool(user) and user.get("is_active", True)
+
     @staticmethod
     def refresh_token(current_user_id: str) -> Dict[str, Any]:
         """Generate new access token"""
         try:
-            user = User.query.get(current_user_id)
-            if not user or not user.is_active:
+            if not AuthService.is_user_active(current_user_id):
                 return {"success": False, "message": "Invalid user"}
 
             access_token = create_access_token(identity=current_user_id)
@@ -149,24 +183,19 @@ class AuthService:
     def deactivate_user(user_id: str) -> Dict[str, Any]:
         """Deactivate user account"""
         try:
-            user = User.query.get(user_id)
-            if not user:
+            doc = AppConfig.db["users"].find_one_and_update(
+                {"id": user_id},
+                {"$set": {"is_active": False, "updated_at": datetime.now()}},
+                projection={"_id": 0, "email": 1},
+            )
+            _users.invalidate(user_id)
+            if not doc:
                 return {"success": False, "message": "User not found"}
 
-            user.is_active = False
-            user.updated_at = datetime.utcnow()
-
-            from models import db
-
-            db.session.commit()
-
-            logger.info(f"User deactivated: {user.email}")
+            logger.info(f"User deactivated: {doc['email']}")
 
             return {"success": True, "message": "User account deactivated"}
 
         except Exception as e:
             logger.error(f"Error deactivating user: {str(e)}")
-            from models import db
-
-            db.session.rollback()
             return {"success": False, "message": "Failed to deactivate user"}
@@ -1,126 +1,354 @@
-import uuid
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from models import Cart, Product
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config import Config as AppConfig
+from models.product import (
+    PRODUCT_EMBEDDING_PROJECTION,
+    PRODUCT_PROJECTION,
+    product_document_to_dict,
+)
+
+from .session_interest import session_interest
+from .taste_service import taste_service
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_FIELDS = [field for field in PRODUCT_PROJECTION if field != "_id"]
+
+# Most lines accepted by one bulk cart update
+MAX_BULK_CART_LINES = 50
+BULK_MODES = ("add", "set")
+
+
+def _item_path(product_id: str) -> str:
+    """Field path of a cart line; product ids are keys of the items map"""
+    if not product_id or "." in product_id or product_id.startswith("$"):
+        raise ValueError(f"Unsupported product id: {product_id}")
+    return f"items.{product_id}"
+
+
+def _cart_item(user_id: str, product_id: str, line: Dict[str, Any]) -> Dict[str, Any]:
+    """API dict of one cart line; the line id is its product id"""
+    return {
+        "id": product_id,
+        "user_id": user_id,
+        "product_id": product_id,
+        "quantity": line["quantity"],
+        "created_at": line["created_at"].isoformat() if line.get("created_at") else None,
+        "updated_at": line["updated_at"].isoformat() if line.get("updated_at") else None,
+    }
+
+
+def validate_bulk_line(line: Any) -> Optional[str]:
+    """Error message for a malformed bulk cart line, or None"""
+    if not isinstance(line, dict) or not isinstance(line.get("product_id"), str) or not line["product_id"]:
+        return "Each item needs a product_id string"
+    mode = line.get("mode", "add")
+    if mode not in BULK_MODES:
+        return f"mode must be one of: {', '.join(BULK_MODES)}"
+    quantity = line.get("quantity")
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < (1 if mode == "add" else 0):
+        return "quantity must be a positive integer (or 0 to remove with mode set)"
+    return None
+
+
+def validate_bulk_lines(lines: Any) -> Optional[str]:
+    """Error message for a malformed bulk cart request, or None"""
+    if not isinstance(lines, list) or not lines:
+        return "items must be a non-empty list"
+    if len(lines) > MAX_BULK_CART_LINES:
+        return f"At most {MAX_BULK_CART_LINES} items per request"
+    for line in lines:
+        error = validate_bulk_line(line)
+        if error:
+            return error
+    return None
+
+
+def merge_bulk_lines(lines: List[Dict[str, Any]]) -> Dict[str, Tuple[str, int]]:
+    """Fold bulk lines, in order, into one (mode, quantity) change per product.
+
+    Adds to the same product accumulate; a "set" replaces whatever came
+    before it, and later adds build on the set quantity.
+    """
+    changes: Dict[str, Tuple[str, int]] = {}
+    for line in lines:
+        product_id = line["product_id"]
+        mode = line.get("mode", "add")
+        quantity = line["quantity"]
+        previous = changes.get(product_id)
+        if mode == "add" and previous:
+            changes[product_id] = (previous[0], previous[1] + quantity)
+        else:
+            changes[product_id] = (mode, quantity)
+    return changes
 
 
 class CartService:
-    def add_to_cart(self, user_id: str, product_id: str, quantity: int = 1):
-        """Add a product to the user's cart"""
-        from models import db
-        
+    """Shopping carts, one MongoDB document per user.
+
+    Lines live in an ``items`` map keyed by product id, so adding an item is
+    a single ``$inc`` upsert and reading the cart with its product cards and
+    totals is one aggregation, whatever the number of lines.
+    """
+
+    def __init__(self):
+        self.carts = AppConfig.db["carts"]
+        self.products = AppConfig.db["products"]
+
+    def add_to_cart(self, user_id: str, product_id: str, quantity: int = 1, session_id: str = None):
+        """Add a product to the user's cart; raises ValueError for unsupported product ids"""
         try:
-            # Check if product exists
-            product = Product.query.get(product_id)
+            path = _item_path(product_id)
+            product = self.products.find_one({"id": product_id}, PRODUCT_EMBEDDING_PROJECTION)
             if not product:
-                return {"success": False, "message": "Product not found"}
-            
-            # Check if item already exists in cart
-            cart_item = Cart.query.filter_by(user_id=user_id, product_id=product_id).first()
-            
-            if cart_item:
-                # Update existing item
-                cart_item.quantity += quantity
-                cart_item.updated_at = db.func.now()
-            else:
-                # Create new cart item
-                cart_item = Cart(
-                    id=str(uuid.uuid4()),
-                    user_id=user_id,
-                    product_id=product_id,
-                    quantity=quantity,
-                )
-                db.session.add(cart_item)
-            
-            db.session.commit()
-            return {"success": True, "message": "Product added to cart", "cart_item": cart_item.to_dict()}
-            
+                return {"success": False, "message": "Product not found", "missing": [product_id]}
+
+            now = datetime.now()
+            cart = self._upsert_cart(
+                user_id,
+                {
+                    "$inc": {f"{path}.quantity": quantity},
+                    # $min only sets a missing field, so this records when the line was added
+                    "$min": {f"{path}.created_at": now},
+                    "$set": {f"{path}.updated_at": now, "updated_at": now},
+                    "$setOnInsert": {"created_at": now},
+                },
+                {"_id": 0, path: 1},
+                ReturnDocument.AFTER,
+            )
+            line = cart["items"][product_id]
+
+            if line["quantity"] == quantity:
+                taste_service.record_cart(user_id, product_id, in_cart=True)
+            session_interest.record(session_id, [product], "cart", user_id)
+
+            cart_item = _cart_item(user_id, product_id, line)
+            cart_item["product"] = product_document_to_dict(product)
+            return {"success": True, "message": "Product added to cart", "cart_item": cart_item}
+
+        except ValueError:
+            raise
         except Exception as e:
-            db.session.rollback()
+            logger.error(f"Error adding to cart: {str(e)}")
             return {"success": False, "message": f"Error adding to cart: {str(e)}"}
 
-    def get_cart(self, user_id: str):
+    def bulk_update(self, user_id: str, lines: List[Dict[str, Any]], session_id: str = None):
+        """Add or set many cart lines with one product query and one atomic cart write.
+
+        Each line has ``product_id``, ``quantity`` and an optional ``mode``:
+        "add" (default) increments the line, "set" replaces its quantity and
+        removes it at 0 or below. Nothing is written if any product is unknown.
+        """
+        try:
+            changes = merge_bulk_lines(lines)
+            paths = {product_id: _item_path(product_id) for product_id in changes}
+            kept = [
+                product_id
+                for product_id, (mode, quantity) in changes.items()
+                if mode == "add" or quantity > 0
+            ]
+            products = {
+                doc["id"]: doc
+                for doc in self.products.find({"id": {"$in": kept}}, PRODUCT_EMBEDDING_PROJECTION)
+            }
+            missing = [product_id for product_id in kept if product_id not in products]
+            if missing:
+                return {"success": False, "message": "Products not found", "missing": missing}
+
+            now = datetime.now()
+            update = {"$set": {"updated_at": now}, "$setOnInsert": {"created_at": now}}
+            for product_id, (mode, quantity) in changes.items():
+                path = paths[product_id]
+                if product_id not in products:
+                    update.setdefault("$unset", {})[path] = ""
+                    continue
+                if mode == "add":
+                    update.setdefault("$inc", {})[f"{path}.quantity"] = quantity
+                else:
+                    update["$set"][f"{path}.quantity"] = quantity
+                update.setdefault("$min", {})[f"{path}.created_at"] = now
+                update["$set"][f"{path}.updated_at"] = now
+
+            before = self._upsert_cart(
+                user_id,
+                update,
+                {"_id": 0, **{path: 1 for path in paths.values()}},
+                ReturnDocument.BEFORE,
+            )
+            previous = (before or {}).get("items", {})
+
+            cart_items, removed, taste_changes = [], [], {}
+            for product_id, (mode, quantity) in changes.items():
+                line = previous.get(product_id)
+                if product_id not in products:
+                    if line:
+                        removed.append(product_id)
+                        taste_changes[product_id] = False
+                    continue
+                if not line:
+                    taste_changes[product_id] = True
+                cart_item = _cart_item(
+                    user_id,
+                    product_id,
+                    {
+                        "quantity": line["quantity"] + quantity if line and mode == "add" else quantity,
+                        "created_at": line["created_at"] if line else now,
+                        "updated_at": now,
+                    },
+                )
+                cart_item["product"] = product_document_to_dict(products[product_id])
+                cart_items.append(cart_item)
+            if taste_changes:
+                taste_service.record_cart_many(user_id, taste_changes)
+            session_interest.record(session_id, list(products.values()), "cart", user_id)
+
+            return {
+                "success": True,
+                "message": "Cart updated",
+                "cart_items": cart_items,
+                "removed": removed,
+            }
+
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error updating cart in bulk: {str(e)}")
+            return {"success": False, "message": f"Error updating cart: {str(e)}"}
+
+    def _upsert_cart(self, user_id: str, update, projection, return_document):
+        try:
+            return self._write_cart(user_id, update, projection, return_document)
+        except DuplicateKeyError:
+            # A concurrent first write created the cart; this one now updates it
+            return self._write_cart(user_id, update, projection, return_document)
+
+    def _write_cart(self, user_id: str, update, projection, return_document):
+        return self.carts.find_one_and_update(
+            {"user_id": user_id},
+            update,
+            projection=projection,
+            upsert=True,
+            return_document=return_document,
+        )
+
+    def get_cart_summary(self, user_id: str) -> Dict[str, Any]:
+        """Get the user's cart lines with product cards and totals in one aggregation"""
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$project": {"_id": 0, "line": {"$objectToArray": "$items"}}},
+            {"$unwind": "$line"},
+            {
+                "$lookup": {
+                    "from": "products",
+                    "localField": "line.k",
+                    "foreignField": "id",
+                    "as": "product",
+                }
+            },
+            # Lines whose product has been deleted are skipped
+            {"$unwind": "$product"},
+            {"$sort": {"line.v.created_at": 1}},
+            {
+                "$group": {
+                    "_id": None,
+                    "lines": {
+                        "$push": {
+                            "product_id": "$line.k",
+                            "line": "$line.v",
+                            "product": {field: f"$product.{field}" for field in PRODUCT_FIELDS},
+                        }
+                    },
+                    "total": {"$sum": {"$multiply": ["$product.price", "$line.v.quantity"]}},
+                    "item_count": {"$sum": "$line.v.quantity"},
+                }
+            },
+        ]
+        result = next(self.carts.aggregate(pipeline), None)
+        if not result:
+            return {"items": [], "total": 0, "item_count": 0}
+
+        items = []
+        for entry in result["lines"]:
+            cart_item = _cart_item(user_id, entry["product_id"], entry["line"])
+            cart_item["product"] = product_document_to_dict(entry["product"])
+            items.append(cart_item)
+        return {"items": items, "total": result["total"], "item_count": result["item_count"]}
+
+    def get_cart(self, user_id: str) -> List[Dict[str, Any]]:
         """Get all items in the user's cart"""
         try:
-            cart_items = Cart.query.filter_by(user_id=user_id).all()
-            
-            cart_data = []
-            for item in cart_items:
-                product = Product.query.get(item.product_id)
-                if product:
-                    cart_data.append({
-                        **item.to_dict(),
-                        "product": product.to_dict()
-                    })
-            
-            return cart_data
-            
+            return self.get_cart_summary(user_id)["items"]
         except Exception as e:
+            logger.error(f"Error getting cart: {str(e)}")
             return []
 
     def remove_from_cart(self, user_id: str, item_id: str):
         """Remove an item from the user's cart"""
-        from models import db
-        
         try:
-            cart_item = Cart.query.filter_by(id=item_id, user_id=user_id).first()
-            if cart_item:
-                db.session.delete(cart_item)
-                db.session.commit()
+            path = _item_path(item_id)
+            result = self.carts.update_one(
+                {"user_id": user_id, path: {"$exists": True}},
+                {"$unset": {path: ""}, "$set": {"updated_at": datetime.now()}},
+            )
+            if result.matched_count:
+                taste_service.record_cart(user_id, item_id, in_cart=False)
                 return {"success": True, "message": "Item removed from cart"}
             return {"success": False, "message": "Item not found in cart"}
         except Exception as e:
-            db.session.rollback()
+            logger.error(f"Error removing from cart: {str(e)}")
             return {"success": False, "message": f"Error removing item: {str(e)}"}
 
     def update_cart_quantity(self, user_id: str, item_id: str, quantity: int):
         """Update the quantity of a cart item"""
-        from models import db
-        
         try:
             if quantity <= 0:
                 return self.remove_from_cart(user_id, item_id)
-            
-            cart_item = Cart.query.filter_by(id=item_id, user_id=user_id).first()
-            if cart_item:
-                cart_item.quantity = quantity
-                cart_item.updated_at = db.func.now()
-                db.session.commit()
-                return {"success": True, "message": "Cart updated", "cart_item": cart_item.to_dict()}
+
+            path = _item_path(item_id)
+            now = datetime.now()
+            cart = self.carts.find_one_and_update(
+                {"user_id": user_id, path: {"$exists": True}},
+                {"$set": {f"{path}.quantity": quantity, f"{path}.updated_at": now, "updated_at": now}},
+                projection={"_id": 0, path: 1},
+                return_document=ReturnDocument.AFTER,
+            )
+            if cart:
+                return {
+                    "success": True,
+                    "message": "Cart updated",
+                    "cart_item": _cart_item(user_id, item_id, cart["items"][item_id]),
+                }
             return {"success": False, "message": "Item not found in cart"}
         except Exception as e:
-            db.session.rollback()
+            logger.error(f"Error updating cart: {str(e)}")
             return {"success": False, "message": f"Error updating cart: {str(e)}"}
 
     def clear_cart(self, user_id: str):
         """Clear all items from the user's cart"""
-        from models import db
-        
         try:
-            Cart.query.filter_by(user_id=user_id).delete()
-            db.session.commit()
+            self.carts.update_one(
+                {"user_id": user_id}, {"$set": {"items": {}, "updated_at": datetime.now()}}
+            )
+            taste_service.clear_cart(user_id)
             return {"success": True, "message": "Cart cleared"}
         except Exception as e:
-            db.session.rollback()
+            logger.error(f"Error clearing cart: {str(e)}")
             return {"success": False, "message": f"Error clearing cart: {str(e)}"}
 
     def get_cart_total(self, user_id: str):
         """Calculate the total price of items in the cart"""
         try:
-            cart_items = Cart.query.filter_by(user_id=user_id).all()
-            total = 0
-            item_count = 0
-            
-            for item in cart_items:
-                product = Product.query.get(item.product_id)
-                if product:
-                    total += product.price * item.quantity
-                    item_count += item.quantity
-            
+            summary = self.get_cart_summary(user_id)
             return {
                 "success": True,
-                "total": total,
-                "item_count": item_count,
-                "formatted_total": f"${total:.2f}"
+                "total": summary["total"],
+                "item_count": summary["item_count"],
+                "formatted_total": f"${summary['total']:.2f}"
             }
         except Exception as e:
             return {"success": False, "message": f"Error calculating total: {str(e)}"}
@@ -0,0 +1,256 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config as AppConfig
+from models.product import (
+    NORMALIZED_FIELDS,
+    PRODUCT_PROJECTION,
+    Product,
+    normalize_filter_value,
+    product_document_to_dict,
+)
+from utils.pagination import SORT_OPTIONS
+
+from .catalog_version import catalog_version
+from .facet_engine import FacetEngine
+
+logger = logging.getLogger(__name__)
+
+# Incremental refreshes re-read products updated slightly before the last
+# watermark so writers with skewed clocks aren't missed.
+WATERMARK_SKEW = timedelta(seconds=5)
+
+
+def _dictionary_encode(values: List[str]) -> Tuple[List[str], np.ndarray]:
+    """Encode values as int32 codes into a vocabulary list"""
+    vocab: Dict[str, int] = {}
+    codes = np.fromiter(
+        (vocab.setdefault(value, len(vocab)) for value in values),
+        dtype=np.int32,
+        count=len(values),
+    )
+    return list(vocab), codes
+
+
+class CatalogSnapshot:
+    """Immutable columnar view of the active catalog for vectorised filter queries"""
+
+    def __init__(self, products: List[Product], version: int):
+        self.version = version
+        self.products = products
+        # API dicts serialised once per snapshot, shared by every listing response
+        self.rows = [product_document_to_dict(product.__dict__) for product in products]
+        self.ids = np.array([product.id for product in products], dtype=object)
+        self.price = np.array([product.price for product in products], dtype=np.float64)
+        self.rating = np.array([product.rating for product in products], dtype=np.float64)
+        self.stock = np.array([product.stock for product in products], dtype=np.int64)
+        self.created_at = np.array(
+            [product.created_at.timestamp() for product in products], dtype=np.float64
+        )
+
+        self.vocab: Dict[str, List[str]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        self.normalized_vocab: Dict[str, List[str]] = {}
+        for column in NORMALIZED_FIELDS:
+            self.vocab[column], self.codes[column] = _dictionary_encode(
+                [getattr(product, column) for product in products]
+            )
+            self.normalized_vocab[column] = [
+                normalize_filter_value(entry) for entry in self.vocab[column]
+            ]
+
+        # Row order for every sort option, ties broken by id like the Mongo sort
+        id_rank = np.argsort(np.argsort(self.ids, kind="stable"), kind="stable")
+        self.orders: Dict[str, np.ndarray] = {}
+        for sort, (field, direction) in SORT_OPTIONS.items():
+            order = np.lexsort((id_rank, self._sort_column(field)))
+            self.orders[sort] = order if direction == 1 else order[::-1]
+        self._facet_engine = None
+
+    def __len__(self):
+        return len(self.products)
+
+    def _sort_column(self, field: str) -> np.ndarray:
+        return self.created_at if field == "created_at" else getattr(self, field)
+
+    def get_facet_engine(self) -> FacetEngine:
+        """Get the facet bitmaps for this snapshot, building them on first use"""
+        if self._facet_engine is None:
+            self._facet_engine = FacetEngine(self)
+        return self._facet_engine
+
+    def match_codes(self, column: str, value: str, match: str = "exact") -> np.ndarray:
+        """Codes of vocabulary entries matching value, compared normalised"""
+        value = normalize_filter_value(value)
+        if match == "prefix":
+            matches = lambda entry: entry.startswith(value)
+        elif match == "contains":
+            matches = lambda entry: value in entry
+        else:
+            matches = lambda entry: entry == value
+        return np.array(
+            [
+                code
+                for code, entry in enumerate(self.normalized_vocab[column])
+                if matches(entry)
+            ],
+            dtype=np.int32,
+        )
+
+    def filter_mask(
+        self,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+        brand: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        in_stock_only: bool = False,
+        match: str = "exact",
+    ) -> np.ndarray:
+        """Boolean mask of products passing the filters"""
+        mask = np.ones(len(self.products), dtype=bool)
+
+        for column, value in (
+            ("category", category),
+            ("subcategory", subcategory),
+            ("brand", brand),
+        ):
+            if value:
+                mask &= np.isin(self.codes[column], self.match_codes(column, value, match))
+
+        if min_price is not None:
+            mask &= self.price >= min_price
+
+        if max_price is not None:
+            mask &= self.price <= max_price
+
+        if min_rating is not None:
+            mask &= self.rating >= min_rating
+
+        if in_stock_only:
+            mask &= self.stock > 0
+
+        return mask
+
+    def query(self, limit: int = 50, **filters) -> List[Product]:
+        """Filter, sort by rating (descending) and limit"""
+        return self.select(self.filter_mask(**filters), limit)
+
+    def select(
+        self,
+        mask: np.ndarray,
+        limit: int = 50,
+        sort: str = "rating",
+        after: Optional[Tuple[Any, str]] = None,
+    ) -> List[Product]:
+        """Products in mask, in sort order, starting after the (key, id) keyset position"""
+        return [self.products[i] for i in self.select_indices(mask, limit, sort, after)]
+
+    def select_indices(
+        self,
+        mask: np.ndarray,
+        limit: int = 50,
+        sort: str = "rating",
+        after: Optional[Tuple[Any, str]] = None,
+    ) -> np.ndarray:
+        """Row indices for select, for callers that want rows instead of products"""
+        if after is not None:
+            mask = mask & self._after_mask(sort, *after)
+        order = self.orders[sort]
+        return order[mask[order]][:limit]
+
+    def _after_mask(self, sort: str, key: Any, product_id: str) -> np.ndarray:
+        """Rows that come strictly after (key, id) in the given sort"""
+        field, direction = SORT_OPTIONS[sort]
+        column = self._sort_column(field)
+        if isinstance(key, datetime):
+            key = key.timestamp()
+
+        ties = column == key
+        if direction == 1:
+            after = column > key
+            after[ties] = self.ids[ties] > product_id
+        else:
+            after = column < key
+            after[ties] = self.ids[ties] < product_id
+        return after
+
+
+class CatalogSnapshotStore:
+    """Holds the current snapshot and refreshes it incrementally on catalog version changes"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._rows: Dict[str, Product] = {}
+        self._watermark: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> CatalogSnapshot:
+        """Get a snapshot that is current as of the latest catalog version check"""
+        version = catalog_version.current()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != version:
+                self._refresh(version)
+            return self._snapshot
+
+    def _refresh(self, version: int):
+        if self._snapshot is None:
+            docs = self.collection.find({"is_active": True}, PRODUCT_PROJECTION)
+            self._rows = {}
+        else:
+            # Only re-read products written since the last refresh
+            docs = self.collection.find(
+                {"updated_at": {"$gte": self._watermark - WATERMARK_SKEW}},
+                PRODUCT_PROJECTION,
+            )
+
+        changed = 0
+        for doc in docs:
+            changed += 1
+            if doc.get("is_active", True):
+                self._rows[doc["id"]] = Product(**doc)
+            else:
+                self._rows.pop(doc["id"], None)
+            updated_at = doc.get("updated_at")
+            if updated_at and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+
+        if self._snapshot is not None:
+            # Hard deletes leave no trace to query by, so diff the live id set.
+            # This also picks up products written with an old updated_at.
+            live_ids = {
+                doc["id"]
+                for doc in self.collection.find({"is_active": True}, {"_id": 0, "id": 1})
+            }
+            for product_id in set(self._rows) - live_ids:
+                del self._rows[product_id]
+
+            missing_ids = list(live_ids - set(self._rows))
+            if missing_ids:
+                for doc in self.collection.find(
+                    {"id": {"$in": missing_ids}}, PRODUCT_PROJECTION
+                ):
+                    changed += 1
+                    self._rows[doc["id"]] = Product(**doc)
+
+        if self._watermark is None:
+            self._watermark = datetime.now()
+
+        self._snapshot = CatalogSnapshot(list(self._rows.values()), version)
+        logger.info(
+            f"Catalog snapshot refreshed to version {version}: "
+            f"{len(self._snapshot)} products ({changed} re-read)"
+        )
+
+
+catalog_snapshots = CatalogSnapshotStore(AppConfig.db["products"])
@@ -0,0 +1,55 @@
+import logging
+import threading
+import time
+
+from pymongo import ReturnDocument
+
+from config import Config as AppConfig
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogVersion:
+    """Catalog-wide version counter stored in MongoDB, bumped on every catalog write.
+
+    In-process caches derived from the catalog (lexical index, snapshots, ...)
+    remember the version they were built from and refresh when it moves. Reads
+    hit MongoDB at most once per ``check_interval`` seconds.
+    """
+
+    def __init__(self, db, check_interval: float = 1.0):
+        self.collection = db["catalog_meta"]
+        self.check_interval = check_interval
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> int:
+        """Get the current catalog version"""
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.check_interval:
+            return self._version
+
+        with self._lock:
+            if self._version is None or now - self._checked_at >= self.check_interval:
+                doc = self.collection.find_one({"_id": "catalog"}, {"version": 1})
+                self._version = doc["version"] if doc else 0
+                self._checked_at = time.monotonic()
+            return self._version
+
+    def bump(self) -> int:
+        """Record a catalog write and return the new version"""
+        doc = self.collection.find_one_and_update(
+            {"_id": "catalog"},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        with self._lock:
+            self._version = doc["version"]
+            self._checked_at = time.monotonic()
+        logger.debug(f"Catalog version bumped to {self._version}")
+        return doc["version"]
+
+
+catalog_version = CatalogVersion(AppConfig.db, AppConfig.CATALOG_VERSION_CHECK_INTERVAL)
@@ -1,5 +1,6 @@
 import json
 import logging
+import re
 import uuid
 from datetime import datetime
 from typing import Any, Dict, List, Optional
@@ -12,10 +13,11 @@ from langchain.tools import Tool
 from langchain_google_genai import ChatGoogleGenerativeAI
 from models.chat_session import ChatSession
 from models.message import Message
-from models.product import Product
+from models.product import PRODUCT_EMBEDDING_PROJECTION, Product, product_document_to_dict
 
-from .cart_service import CartService
+from .cart_service import CartService, merge_bulk_lines, validate_bulk_line, validate_bulk_lines
 from .product_service import ProductService
+from .session_interest import session_interest
 from .vector_service import VectorService
 
 logger = logging.getLogger(__name__)
@@ -56,7 +58,7 @@ class ChatService:
             )
         return self.memory_sessions[session_id]
 
-    def create_tools(self) -> List[Tool]:
+    def create_tools(self, session_id: str = None, user_id: str = None) -> List[Tool]:
         """Create tools for the LangChain agent"""
         tools = [
             Tool(
@@ -66,7 +68,7 @@ class ChatService:
             ),
             Tool(
                 name="filter_products",
-                description="Filter products. Input: JSON string with keys: category, subcategory, brand, min_price, max_price, min_rating, in_stock_only, features (list), search_query, limit.",
+                description="Filter products. Input: JSON string with keys: category, subcategory, brand, match (exact, prefix or contains; default exact), min_price, max_price, min_rating, in_stock_only, features (list), search_query, limit.",
                 func=self._filter_products_tool,
             ),
             Tool(
@@ -82,7 +84,12 @@ class ChatService:
             Tool(
                 name="add_to_cart",
                 description="Add a product to the user's cart. Input: JSON string with keys: product_id (str or product name), quantity (int, optional, default 1).",
-                func=self._add_to_cart_tool,
+                func=lambda input_json: self._add_to_cart_tool(input_json, session_id, user_id),
+            ),
+            Tool(
+                name="add_items_to_cart",
+                description="Add several products to the user's cart in one step. Input: JSON list of objects with keys: product_id (str or product name), quantity (int, optional, default 1).",
+                func=lambda input_json: self._add_items_to_cart_tool(input_json, session_id, user_id),
             ),
         ]
         return tools
@@ -115,15 +122,18 @@ class ChatService:
         """Tool function for filtering products"""
         try:
             filters = json.loads(filter_json)
-            query = {}
-            if "category" in filters:
-                query["category"] = filters["category"]
-            if "min_price" in filters and filters["min_price"]:
-                query["price"] = {"$gte": float(filters["min_price"])}
-            if "max_price" in filters and filters["max_price"]:
-                query["price"] = query.get("price", {}) | {"$lte": float(filters["max_price"])}
-
-            products = [Product(**doc) for doc in AppConfig.db["products"].find(query)] if query else [Product(**doc) for doc in AppConfig.db["products"].find()]
+            products = self.product_service.search_by_filters(
+                category=filters.get("category"),
+                subcategory=filters.get("subcategory"),
+                brand=filters.get("brand"),
+                min_price=float(filters["min_price"]) if filters.get("min_price") else None,
+                max_price=float(filters["max_price"]) if filters.get("max_price") else None,
+                min_rating=float(filters["min_rating"]) if filters.get("min_rating") else None,
+                in_stock_only=bool(filters.get("in_stock_only", False)),
+                search_query=filters.get("search_query"),
+                limit=int(filters.get("limit") or 50),
+                match=filters.get("match", "exact"),
+            )
             if not products:
                 return json.dumps({"message": "No products found matching the specified filters.", "product_ids": []})
 
@@ -160,16 +170,13 @@ class ChatService:
     def _get_recommendations_tool(self, input_text: str) -> str:
         """Tool function for getting product recommendations"""
         try:
-            product_data = AppConfig.db["products"].find_one({"id": input_text.strip()})
-            if product_data:
-                product = Product(**product_data)
-                similar_products = self.vector_service.search_similar_products(product.get_search_text(), top_k=4)
-                similar_ids = [p["id"] for p in similar_products if p["id"] != product.id]
+            product_id = input_text.strip()
+            if AppConfig.db["products"].count_documents({"id": product_id}, limit=1):
+                recommendations = self.product_service.get_recommendations(product_id=product_id, limit=3)
             else:
                 similar_products = self.vector_service.search_similar_products(input_text, top_k=4)
                 similar_ids = [p["id"] for p in similar_products]
-
-            recommendations = [Product(**doc) for doc in AppConfig.db["products"].find({"id": {"$in": similar_ids}})]
+                recommendations = [Product(**doc) for doc in AppConfig.db["products"].find({"id": {"$in": similar_ids}})]
             if not recommendations:
                 return "No recommendations found."
             result = "Here are some recommendations:\n"
@@ -180,44 +187,48 @@ class ChatService:
             logger.error(f"Error in get_recommendations_tool: {str(e)}")
             return "Error occurred while getting recommendations."
 
-    def _add_to_cart_tool(self, input_json: str) -> str:
+    def _add_to_cart_tool(self, input_json: str, session_id: str = None, user_id: str = None) -> str:
         """Tool function to add a product to the user's cart"""
         try:
             logger.info(f"add_to_cart_tool input: {input_json}")
             data = json.loads(input_json)
             product_id = data.get("product_id")
             quantity = data.get("quantity", 1)
-            user_id = data.get("user_id", "guest_user")
+            # The cart owner comes from the chat session, never from the model's input
+            user_id = user_id or "guest_user"
             logger.info(f"Parsed data: product_id={product_id}, quantity={quantity}, user_id={user_id}")
 
             if not product_id:
                 return json.dumps({"message": "Missing product_id for add to cart.", "success": False})
 
-            if len(product_id) < 32 or " " in product_id:
-                logger.info(f"Searching for product by name: {product_id}")
-                product = next((p for p in [Product(**doc) for doc in AppConfig.db["products"].find()] if product_id.lower() in p.name.lower()), None)
-                if product:
-                    logger.info(f"Found product: {product.name} with ID: {product.id}")
-                    product_id = product.id
-                else:
-                    logger.warning(f"Product not found: {product_id}")
-                    return json.dumps({"message": f"Product '{product_id}' not found.", "success": False})
+            error = validate_bulk_line({"product_id": product_id, "quantity": quantity})
+            if error:
+                return json.dumps(
+                    {
+                        "message": error,
+                        "success": False,
+                        "rejected": [{"product_id": product_id, "quantity": quantity, "error": error}],
+                    }
+                )
+
+            resolved = self._resolve_product_refs([product_id]).get(product_id)
+            if not resolved:
+                logger.warning(f"Product not found: {product_id}")
+                return json.dumps({"message": f"Product '{product_id}' not found.", "success": False})
+            product_id = resolved
 
             logger.info(f"Adding to cart: user_id={user_id}, product_id={product_id}, quantity={quantity}")
-            result = self.cart_service.add_to_cart(user_id, product_id, quantity)
+            result = self.cart_service.add_to_cart(user_id, product_id, quantity, session_id)
             logger.info(f"Cart service result: {result}")
 
             if not result.get("success", True):
                 return json.dumps(result)
 
-            product = Product(**AppConfig.db["products"].find_one({"id": product_id}))
-            if not product:
-                return json.dumps({"message": f"Product with ID {product_id} not found.", "success": False})
-
+            product = result["cart_item"]["product"]
             success_response = {
-                "message": f"Added {quantity} x {product.name} to your cart.",
+                "message": f"Added {quantity} x {product['name']} to your cart.",
                 "success": True,
-                "product": {"id": product.id, "name": product.name, "price": product.price},
+                "product": {"id": product["id"], "name": product["name"], "price": product["price"]},
                 "quantity": quantity,
             }
             logger.info(f"Returning success response: {success_response}")
@@ -230,6 +241,87 @@ class ChatService:
             logger.error(f"Error in add_to_cart_tool: {str(e)}")
             return json.dumps({"message": "Error occurred while adding to cart.", "success": False})
 
+    def _add_items_to_cart_tool(self, input_json: str, session_id: str = None, user_id: str = None) -> str:
+        """Tool function to add several products to the user's cart in one write"""
+        try:
+            logger.info(f"add_items_to_cart_tool input: {input_json}")
+            data = json.loads(input_json)
+            if isinstance(data, dict):
+                data = data.get("items")
+            # The cart owner comes from the chat session, never from the model's input
+            user_id = user_id or "guest_user"
+            if not isinstance(data, list):
+                return json.dumps({"message": "Input must be a JSON list of items.", "success": False})
+
+            # Lines are checked as the REST bulk endpoint checks them; all rejected
+            # lines go back to the model and nothing is added until they are fixed
+            items = [item if isinstance(item, dict) else {"product_id": item} for item in data]
+            lines = [{"product_id": item.get("product_id"), "quantity": item.get("quantity", 1)} for item in items]
+            rejected = []
+            for line in lines:
+                error = validate_bulk_line(line)
+                if error:
+                    rejected.append({**line, "error": error})
+            if rejected:
+                return json.dumps(
+                    {"message": "Some items were rejected; nothing was added.", "success": False, "rejected": rejected}
+                )
+            error = validate_bulk_lines(lines)
+            if error:
+                return json.dumps({"message": error, "success": False})
+
+            refs = [line["product_id"] for line in lines]
+            resolved = self._resolve_product_refs(refs)
+            not_found = [ref for ref in refs if not resolved.get(ref)]
+            if not_found:
+                names = ", ".join(f"'{ref}'" for ref in not_found)
+                return json.dumps({"message": f"Products not found: {names}.", "success": False})
+            for line in lines:
+                line["product_id"] = resolved[line["product_id"]]
+
+            result = self.cart_service.bulk_update(user_id, lines, session_id)
+            logger.info(f"Cart service bulk result: {result}")
+            if not result["success"]:
+                return json.dumps({"message": result["message"], "success": False})
+
+            added_quantities = merge_bulk_lines(lines)
+            added = [
+                {
+                    "id": item["product"]["id"],
+                    "name": item["product"]["name"],
+                    "price": item["product"]["price"],
+                    "quantity": added_quantities[item["product_id"]][1],
+                    "cart_quantity": item["quantity"],
+                }
+                for item in result["cart_items"]
+            ]
+            summary = ", ".join(f"{item['quantity']} x {item['name']}" for item in added)
+            return json.dumps({"message": f"Added to your cart: {summary}.", "success": True, "products": added})
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON decode error in add_items_to_cart_tool: {str(e)}")
+            return json.dumps({"message": "Invalid JSON format in request.", "success": False})
+        except Exception as e:
+            logger.error(f"Error in add_items_to_cart_tool: {str(e)}")
+            return json.dumps({"message": "Error occurred while adding to cart.", "success": False})
+
+    def _resolve_product_refs(self, refs: List[str]) -> Dict[str, Optional[str]]:
+        """Map product ids or (partial) product names to product ids in one query"""
+        ids = [ref for ref in refs if len(ref) >= 32 and " " not in ref]
+        names = [ref for ref in refs if ref not in ids]
+        clauses = [{"id": {"$in": ids}}] if ids else []
+        clauses += [{"name": {"$regex": re.escape(name), "$options": "i"}} for name in names]
+        if not clauses:
+            return {}
+
+        docs = list(AppConfig.db["products"].find({"$or": clauses}, {"_id": 0, "id": 1, "name": 1}))
+        found = {doc["id"] for doc in docs}
+        resolved = {ref: ref if ref in found else None for ref in ids}
+        for name in names:
+            resolved[name] = next(
+                (doc["id"] for doc in docs if name.lower() in doc["name"].lower()), None
+            )
+        return resolved
+
     def _extract_product_names_from_text(self, text: str) -> list:
         """Extract product names from the message text by matching against all product names in the database."""
         product_names = []
@@ -275,7 +367,7 @@ class ChatService:
                     elif isinstance(msg, str):
                         chat_history.append(msg)
 
-            tools = self.create_tools()
+            tools = self.create_tools(session_id, user_id or chat_session.user_id)
             agent = initialize_agent(
                 tools=tools,
                 llm=self.llm,
@@ -296,14 +388,16 @@ class ChatService:
             - Ask clarifying questions if the user's request is unclear
             - Focus on electronics categories: smartphones, laptops, headphones, gaming equipment, smart home devices
             - When a user wants to add a product to cart, use the add_to_cart tool with the product name or ID
+            - When a user wants to add several products at once, use add_items_to_cart once with all of them instead of calling add_to_cart per item
             - If the user says "add this to cart" or similar, use the product name from your recent message
 
             Available tools:
             - search_products: Find products using semantic search. Input: search query (str).
-            - filter_products: Filter products. Input: JSON string with keys: category, subcategory, brand, min_price, max_price, min_rating, in_stock_only, features (list), search_query, limit.
+            - filter_products: Filter products. Input: JSON string with keys: category, subcategory, brand, match (exact, prefix or contains; default exact), min_price, max_price, min_rating, in_stock_only, features (list), search_query, limit.
             - get_product_details: Get product details. Input: product ID (str).
             - get_recommendations: Get recommendations. Input: product ID (str) or preference description (str).
             - add_to_cart: Add a product to the user's cart. Input: JSON string with keys: product_id (str or product name), quantity (int, optional, default 1).
+            - add_items_to_cart: Add several products to the user's cart in one step. Input: JSON list of objects with keys: product_id (str or product name), quantity (int, optional, default 1).
             """
 
             agent_input = {"input": f"{system_prompt}\n\nUser: {user_message}"}
@@ -354,7 +448,13 @@ class ChatService:
 
             products = []
             if product_ids:
-                products = [Product(**AppConfig.db["products"].find_one({"id": pid})).to_dict() for pid in product_ids if AppConfig.db["products"].find_one({"id": pid})]
+                docs_by_id = {
+                    doc["id"]: doc
+                    for doc in AppConfig.db["products"].find({"id": {"$in": product_ids}}, PRODUCT_EMBEDDING_PROJECTION)
+                }
+                shown = [docs_by_id[pid] for pid in product_ids if pid in docs_by_id]
+                products = [product_document_to_dict(doc) for doc in shown]
+                session_interest.record(session_id, shown, "shown", chat_session.user_id)
 
             return {
                 "id": ai_msg.id,
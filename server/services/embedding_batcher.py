@@ -0,0 +1,89 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class EmbeddingBatcher:
+    """Micro-batcher that encodes concurrent embedding requests together"""
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._batch_sizes = metrics.histogram("embedding.batch_size", BATCH_SIZE_BUCKETS)
+        self._queue_wait = metrics.histogram("embedding.queue_wait_ms", QUEUE_WAIT_MS_BUCKETS)
+
+    def encode(self, text: str) -> List[float]:
+        """Queue text for the next batch and wait for its embedding"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, time.perf_counter(), future))
+        return future.result()
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+
+            # Threads don't survive fork: a batcher created in the gunicorn
+            # master starts a fresh queue and worker thread in each worker.
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="embedding-batcher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch):
+        dispatched = time.perf_counter()
+        for _, enqueued, _ in batch:
+            self._queue_wait.observe((dispatched - enqueued) * 1000)
+        self._batch_sizes.observe(len(batch))
+
+        try:
+            embeddings = self.model.encode(
+                [text for text, _, _ in batch], batch_size=len(batch)
+            )
+        except Exception as e:
+            logger.error(f"Failed to encode embedding batch: {str(e)}")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, _, future), embedding in zip(batch, embeddings):
+            future.set_result(embedding.tolist())
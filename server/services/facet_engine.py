@@ -0,0 +1,146 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# (label, min inclusive, max exclusive)
+PRICE_BANDS = [
+    ("0-50", 0, 50),
+    ("50-100", 50, 100),
+    ("100-250", 100, 250),
+    ("250-500", 250, 500),
+    ("500-1000", 500, 1000),
+    ("1000-2000", 1000, 2000),
+    ("2000+", 2000, None),
+]
+RATING_THRESHOLDS = (4.5, 4.0, 3.0, 2.0, 1.0)
+VALUE_FACETS = ("category", "subcategory", "brand")
+
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(bitmaps: np.ndarray) -> np.ndarray:
+    """Count set bits along the last axis of packed bitmaps"""
+    return POPCOUNT_TABLE[bitmaps].sum(axis=-1, dtype=np.int64)
+
+
+class FacetEngine:
+    """Packed per-value bitmaps over a catalog snapshot.
+
+    Any filter combination is answered by intersecting bitmaps, and counts for
+    every facet value come out of the same pass. Counts are disjunctive: a
+    facet's counts apply every selected filter except the facet's own, so the
+    UI can show what choosing another value would return.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.size = len(snapshot)
+        self.all = np.packbits(np.ones(self.size, dtype=bool))
+
+        self.value_bitmaps: Dict[str, np.ndarray] = {}
+        for column in VALUE_FACETS:
+            codes = snapshot.codes[column]
+            vocab_size = len(snapshot.vocab[column])
+            self.value_bitmaps[column] = np.packbits(
+                codes[np.newaxis, :] == np.arange(vocab_size, dtype=np.int32)[:, np.newaxis],
+                axis=1,
+            )
+
+        price = snapshot.price
+        self.price_bitmaps = np.packbits(
+            np.array(
+                [
+                    (price >= low) & (price < high if high is not None else True)
+                    for _, low, high in PRICE_BANDS
+                ],
+                dtype=bool,
+            ).reshape(len(PRICE_BANDS), self.size),
+            axis=1,
+        )
+        self.rating_bitmaps = np.packbits(
+            snapshot.rating[np.newaxis, :]
+            >= np.array(RATING_THRESHOLDS)[:, np.newaxis],
+            axis=1,
+        )
+        self.in_stock_bitmap = np.packbits(snapshot.stock > 0)
+
+    def _value_selection(self, column: str, value: str, match: str) -> np.ndarray:
+        codes = self.snapshot.match_codes(column, value, match)
+        if not len(codes):
+            return np.zeros_like(self.all)
+        return np.bitwise_or.reduce(self.value_bitmaps[column][codes], axis=0)
+
+    def search(
+        self,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+        brand: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        in_stock_only: bool = False,
+        match: str = "exact",
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Return the boolean match mask and the facet counts for a selection"""
+        selections = {}
+        for column, value in (
+            ("category", category),
+            ("subcategory", subcategory),
+            ("brand", brand),
+        ):
+            if value:
+                selections[column] = self._value_selection(column, value, match)
+
+        if min_price is not None or max_price is not None:
+            price_mask = np.ones(self.size, dtype=bool)
+            if min_price is not None:
+                price_mask &= self.snapshot.price >= min_price
+            if max_price is not None:
+                price_mask &= self.snapshot.price <= max_price
+            selections["price"] = np.packbits(price_mask)
+
+        if min_rating is not None:
+            selections["rating"] = np.packbits(self.snapshot.rating >= min_rating)
+
+        if in_stock_only:
+            selections["inStock"] = self.in_stock_bitmap
+
+        def excluding(facet: Optional[str]) -> np.ndarray:
+            bitmap = self.all
+            for name, selection in selections.items():
+                if name != facet:
+                    bitmap = bitmap & selection
+            return bitmap
+
+        facets = {}
+        for column in VALUE_FACETS:
+            counts = _popcount(self.value_bitmaps[column] & excluding(column))
+            facets[column] = self._value_counts(column, counts)
+
+        price_counts = _popcount(self.price_bitmaps & excluding("price"))
+        facets["price"] = [
+            {"value": label, "min": low, "max": high, "count": int(count)}
+            for (label, low, high), count in zip(PRICE_BANDS, price_counts)
+        ]
+
+        rating_counts = _popcount(self.rating_bitmaps & excluding("rating"))
+        facets["rating"] = [
+            {"value": f"{threshold:g}+", "min": threshold, "count": int(count)}
+            for threshold, count in zip(RATING_THRESHOLDS, rating_counts)
+        ]
+
+        facets["inStock"] = {
+            "count": int(_popcount(self.in_stock_bitmap & excluding("inStock")))
+        }
+
+        matched = excluding(None)
+        mask = np.unpackbits(matched, count=self.size).astype(bool)
+        return mask, facets
+
+    def _value_counts(self, column: str, counts: np.ndarray) -> List[Dict[str, Any]]:
+        values = [
+            {"value": value, "count": int(count)}
+            for value, count in zip(self.snapshot.vocab[column], counts)
+        ]
+        values.sort(key=lambda item: (-item["count"], item["value"]))
+        return values
@@ -0,0 +1,96 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from operator import itemgetter
+from typing import Dict, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[-./]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms.
+
+    Compound tokens such as model numbers ("WH-1000XM5", "M2.Pro") yield their
+    parts plus the joined form, so "wh1000xm5" and "WH-1000XM5" both match.
+    """
+    terms = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        parts = TOKEN_SEPARATORS.split(match.group())
+        terms.extend(parts)
+        if len(parts) > 1:
+            terms.append("".join(parts))
+    return terms
+
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.version = None
+        # Latest updated_at of the documents read into the index
+        self.watermark = None
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._doc_terms: Dict[str, List[str]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def doc_ids(self) -> set:
+        """Ids of the indexed documents"""
+        with self._lock:
+            return set(self._doc_lengths)
+
+    def add(self, doc_id: str, text: str):
+        """Index a document, replacing any previous version of it"""
+        term_counts = Counter(tokenize(text))
+        with self._lock:
+            self.remove(doc_id)
+            for term, count in term_counts.items():
+                self._postings.setdefault(term, {})[doc_id] = count
+            length = sum(term_counts.values())
+            self._doc_terms[doc_id] = list(term_counts)
+            self._doc_lengths[doc_id] = length
+            self._total_length += length
+
+    def remove(self, doc_id: str):
+        """Remove a document from the index"""
+        with self._lock:
+            length = self._doc_lengths.pop(doc_id, None)
+            if length is None:
+                return
+            self._total_length -= length
+            for term in self._doc_terms.pop(doc_id):
+                postings = self._postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Return up to ``limit`` (doc_id, score) pairs, best first"""
+        terms = set(tokenize(query))
+        with self._lock:
+            doc_count = len(self._doc_lengths)
+            if not terms or not doc_count:
+                return []
+            avg_length = self._total_length / doc_count
+
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(limit, scores.items(), key=itemgetter(1))
@@ -1,80 +1,195 @@
+import logging
 import uuid
+from datetime import datetime
+from typing import Dict, List
 
-from models import Product, UserLike
+from pymongo import DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from config import Config as AppConfig
+from models.product import PRODUCT_PROJECTION, product_document_to_dict
+
+from .taste_service import taste_service
+from .vector_sync import ILLEGAL_OPERATION
+
+logger = logging.getLogger(__name__)
+
+# Most product ids accepted by one batch like lookup
+MAX_BATCH_PRODUCT_IDS = 200
 
 
 class LikeService:
+    """User likes, one document per (user, product) pair.
+
+    A toggle flips the pair's ``liked`` flag in one atomic upsert, and each
+    product keeps a ``like_count`` counter maintained with ``$inc`` so counts
+    and the popular list are indexed reads. Both writes share a transaction
+    when the deployment supports one; otherwise the counter is eventually
+    consistent and ``scripts.recount_likes`` repairs any drift.
+    """
+
+    def __init__(self):
+        self.likes = AppConfig.db["likes"]
+        self.products = AppConfig.db["products"]
+        self._transactions_supported = None
+
     def toggle_like(self, user_id: str, product_id: str):
-        """Toggle like status for a product"""
-        from models import db
-        
-        existing_like = UserLike.query.filter_by(
-            user_id=user_id, product_id=product_id
-        ).first()
-        
-        if existing_like:
-            # Unlike the product
-            db.session.delete(existing_like)
-            db.session.commit()
-            return False, "Product unliked"
-        else:
-            # Like the product
-            new_like = UserLike(
-                id=str(uuid.uuid4()),
-                user_id=user_id,
-                product_id=product_id,
-            )
-            db.session.add(new_like)
-            db.session.commit()
-            return True, "Product liked"
+        """Toggle like status for a product; liked is None if the product does not exist"""
+        if not self.products.count_documents({"id": product_id}, limit=1):
+            return None, "Product not found"
+
+        now = datetime.now()
+        toggle = [
+            {
+                "$set": {
+                    "id": {"$ifNull": ["$id", str(uuid.uuid4())]},
+                    "created_at": {"$ifNull": ["$created_at", now]},
+                    "liked": {"$cond": [{"$eq": ["$liked", True]}, False, True]},
+                    "updated_at": now,
+                }
+            }
+        ]
+        try:
+            liked = self._toggle_and_count(user_id, product_id, toggle)
+        except DuplicateKeyError:
+            # A concurrent first toggle inserted the pair; this one now flips it
+            liked = self._toggle_and_count(user_id, product_id, toggle)
+
+        taste_service.record_like(user_id, product_id, liked=liked)
+        return liked, "Product liked" if liked else "Product unliked"
+
+    def _toggle_and_count(self, user_id: str, product_id: str, toggle) -> bool:
+        """Flip the pair and move the product's like_count, in one transaction when available"""
+        if self._transactions_supported is not False:
+            try:
+                with self.likes.database.client.start_session() as session:
+                    liked = session.with_transaction(
+                        lambda s: self._toggle(user_id, product_id, toggle, s)
+                    )
+                self._transactions_supported = True
+                return liked
+            except DuplicateKeyError:
+                raise
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                logger.warning("MongoDB transactions unavailable, updating like counts without one")
+                self._transactions_supported = False
+
+        return self._toggle(user_id, product_id, toggle)
+
+    def _toggle(self, user_id: str, product_id: str, toggle, session=None) -> bool:
+        like = self.likes.find_one_and_update(
+            {"user_id": user_id, "product_id": product_id},
+            toggle,
+            projection={"_id": 0, "liked": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        liked = like["liked"]
+        self.products.update_one(
+            {"id": product_id}, {"$inc": {"like_count": 1 if liked else -1}}, session=session
+        )
+        return liked
 
     def get_user_likes(self, user_id: str):
         """Get all products liked by a user"""
-        likes = UserLike.query.filter_by(user_id=user_id).all()
-        
+        likes = list(
+            self.likes.find(
+                {"user_id": user_id, "liked": True},
+                {"_id": 0, "id": 1, "user_id": 1, "product_id": 1, "created_at": 1},
+            )
+        )
+        products = {
+            doc["id"]: product_document_to_dict(doc)
+            for doc in self.products.find(
+                {"id": {"$in": [like["product_id"] for like in likes]}}, PRODUCT_PROJECTION
+            )
+        }
+
         return [
             {
-                **like.to_dict(),
-                "product": Product.query.get(like.product_id).to_dict()
-                if Product.query.get(like.product_id)
-                else None,
+                "id": like["id"],
+                "user_id": like["user_id"],
+                "product_id": like["product_id"],
+                "created_at": like["created_at"].isoformat() if like.get("created_at") else None,
+                "product": products.get(like["product_id"]),
             }
             for like in likes
         ]
 
     def is_liked_by_user(self, user_id: str, product_id: str):
         """Check if a product is liked by a user"""
-        like = UserLike.query.filter_by(
-            user_id=user_id, product_id=product_id
-        ).first()
-        return like is not None
+        return bool(
+            self.likes.count_documents(
+                {"user_id": user_id, "product_id": product_id, "liked": True}, limit=1
+            )
+        )
 
     def get_product_likes_count(self, product_id: str):
         """Get the number of likes for a product"""
-        return UserLike.query.filter_by(product_id=product_id).count()
+        doc = self.products.find_one({"id": product_id}, {"_id": 0, "like_count": 1})
+        return doc.get("like_count", 0) if doc else 0
+
+    def get_likes_counts(self, product_ids: List[str]) -> Dict[str, int]:
+        """Like counts for many products in one query; unknown ids count 0"""
+        counts = dict.fromkeys(product_ids, 0)
+        for doc in self.products.find(
+            {"id": {"$in": product_ids}}, {"_id": 0, "id": 1, "like_count": 1}
+        ):
+            counts[doc["id"]] = doc.get("like_count", 0)
+        return counts
+
+    def get_liked_ids(self, user_id: str, product_ids: List[str]) -> List[str]:
+        """Which of the given products a user likes, in their order, in one indexed query"""
+        liked = {
+            doc["product_id"]
+            for doc in self.likes.find(
+                {"user_id": user_id, "product_id": {"$in": product_ids}, "liked": True},
+                {"_id": 0, "product_id": 1},
+            )
+        }
+        return [product_id for product_id in product_ids if product_id in liked]
 
     def get_popular_products(self, limit: int = 10):
         """Get most liked products"""
-        from sqlalchemy import func
-        from models import db
-        
-        popular_products = (
-            db.session.query(
-                UserLike.product_id,
-                func.count(UserLike.id).label('likes_count')
+        docs = (
+            self.products.find(
+                {"is_active": True, "like_count": {"$gt": 0}},
+                {**PRODUCT_PROJECTION, "like_count": 1},
             )
-            .group_by(UserLike.product_id)
-            .order_by(func.count(UserLike.id).desc())
+            .sort([("like_count", DESCENDING), ("id", DESCENDING)])
             .limit(limit)
-            .all()
         )
-        
+
         result = []
-        for product_id, likes_count in popular_products:
-            product = Product.query.get(product_id)
-            if product:
-                product_dict = product.to_dict()
-                product_dict['likes_count'] = likes_count
-                result.append(product_dict)
-        
+        for doc in docs:
+            product_dict = product_document_to_dict(doc)
+            product_dict["likes_count"] = doc["like_count"]
+            result.append(product_dict)
         return result
+
+    def recount_like_counts(self) -> int:
+        """Recompute every product's like_count from the likes; returns products changed"""
+        counts = {
+            doc["_id"]: doc["count"]
+            for doc in self.likes.aggregate(
+                [
+                    {"$match": {"liked": True}},
+                    {"$group": {"_id": "$product_id", "count": {"$sum": 1}}},
+                ]
+            )
+        }
+        requests = [
+            UpdateOne(
+                {"id": doc["id"]},
+                {"$set": {"like_count": counts.get(doc["id"], 0)}},
+            )
+            for doc in self.products.find({}, {"_id": 0, "id": 1, "like_count": 1})
+            if doc.get("like_count", 0) != counts.get(doc["id"], 0)
+        ]
+        if requests:
+            self.products.bulk_write(requests, ordered=False)
+        logger.info(f"Recounted likes: {len(requests)} products corrected")
+        return len(requests)
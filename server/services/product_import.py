@@ -0,0 +1,251 @@
+import codecs
+import csv
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from config import Config as AppConfig
+from models.product import Product
+from utils.metrics import metrics
+
+from .catalog_version import catalog_version
+from .vector_sync import vector_sync
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv")
+IMPORT_MODES = ("insert", "upsert")
+# Per-row errors (and superseded rows) included in the summary; later ones are only counted
+MAX_REPORTED_ERRORS = 100
+DUPLICATE_KEY = 11000
+# CSV cells for list fields hold a JSON array or "|"-separated values
+CSV_LIST_FIELDS = ("features",)
+
+# (row number, parsed row, error message)
+ImportRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def iter_ndjson_rows(lines: Iterable[str]) -> Iterator[ImportRow]:
+    """Parse NDJSON lazily, one product object per non-blank line"""
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"invalid JSON: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "row must be a JSON object"
+            continue
+        yield line_number, row, None
+
+
+def iter_csv_rows(lines: Iterable[str]) -> Iterator[ImportRow]:
+    """Parse CSV lazily; the header row names the product fields"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        if None in row:
+            yield reader.line_num, None, "row has more cells than the header"
+            continue
+
+        # Empty cells fall back to the model defaults
+        record = {key: value for key, value in row.items() if value not in (None, "")}
+        try:
+            for field in CSV_LIST_FIELDS:
+                value = record.get(field)
+                if value is None:
+                    continue
+                if value.lstrip().startswith("["):
+                    record[field] = json.loads(value)
+                else:
+                    record[field] = [part.strip() for part in value.split("|") if part.strip()]
+        except json.JSONDecodeError as e:
+            yield reader.line_num, None, f"invalid JSON list: {e.msg}"
+            continue
+        yield reader.line_num, record, None
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+class ProductImportService:
+    """Bulk product import from streamed NDJSON or CSV.
+
+    Rows are validated one at a time and written in chunks, so memory stays
+    bounded by the chunk size whatever the feed size. Each chunk is embedded
+    in batches right after it is written; chunks whose embedding fails are
+    left to the vector sync outbox worker.
+    """
+
+    def __init__(self):
+        self.collection = AppConfig.db["products"]
+
+    def import_stream(
+        self,
+        stream: BinaryIO,
+        fmt: str = "ndjson",
+        mode: str = "insert",
+        chunk_size: int = None,
+        embed: bool = True,
+    ) -> Dict[str, Any]:
+        """Import products from a binary stream of UTF-8 NDJSON or CSV"""
+        lines = codecs.iterdecode(stream, "utf-8-sig")
+        rows = iter_csv_rows(lines) if fmt == "csv" else iter_ndjson_rows(lines)
+        return self.import_rows(rows, mode, chunk_size, embed)
+
+    def import_rows(
+        self,
+        rows: Iterable[ImportRow],
+        mode: str = "insert",
+        chunk_size: int = None,
+        embed: bool = True,
+    ) -> Dict[str, Any]:
+        """Validate and write parsed rows in chunks and return the import summary"""
+        chunk_size = chunk_size or AppConfig.PRODUCT_IMPORT_CHUNK_SIZE
+        summary = {
+            "rows": 0,
+            "written": 0,
+            "failed": 0,
+            "embedded": 0,
+            "embedding_deferred": 0,
+            "superseded": 0,
+            "errors": [],
+            "superseded_rows": [],
+        }
+        started = time.perf_counter()
+
+        chunk: List[Tuple[int, Product]] = []
+        for row_number, row, error in rows:
+            summary["rows"] += 1
+            if error is None:
+                try:
+                    chunk.append((row_number, Product(**row)))
+                except ValidationError as e:
+                    error = _validation_message(e)
+            if error is not None:
+                self._record_error(summary, row_number, error)
+                continue
+
+            if len(chunk) >= chunk_size:
+                self._write_chunk(chunk, mode, embed, summary)
+                chunk = []
+
+        if chunk:
+            self._write_chunk(chunk, mode, embed, summary)
+
+        if summary["written"]:
+            catalog_version.bump()
+
+        elapsed = time.perf_counter() - started
+        summary["seconds"] = round(elapsed, 3)
+        summary["rows_per_second"] = round(summary["rows"] / elapsed, 1) if elapsed else 0.0
+        metrics.counter("product_import.rows").inc(summary["rows"])
+        metrics.counter("product_import.failed").inc(summary["failed"])
+        logger.info(
+            f"Product import: {summary['written']} written, {summary['failed']} failed, "
+            f"{summary['superseded']} superseded of {summary['rows']} rows in {elapsed:.1f}s"
+        )
+        return summary
+
+    def _write_chunk(
+        self,
+        chunk: List[Tuple[int, Product]],
+        mode: str,
+        embed: bool,
+        summary: Dict[str, Any],
+    ):
+        now = datetime.now()
+        # Later rows for the same id win within a chunk; the earlier ones are reported
+        rows: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        for row_number, product in chunk:
+            product.updated_at = now
+            if product.id in rows:
+                summary["superseded"] += 1
+                if len(summary["superseded_rows"]) < MAX_REPORTED_ERRORS:
+                    summary["superseded_rows"].append(
+                        {"row": rows[product.id][0], "by": row_number, "id": product.id}
+                    )
+            rows[product.id] = (row_number, product.to_document())
+        row_numbers = [row_number for row_number, _ in rows.values()]
+        docs = [doc for _, doc in rows.values()]
+
+        # Prepared outbox entries cover a crash between the write and the embedding
+        entry_ids = vector_sync.prepare(list(rows))
+        try:
+            failed = self._write_docs(docs, mode)
+        except PyMongoError as e:
+            vector_sync.release(entry_ids)
+            for row_number in row_numbers:
+                self._record_error(summary, row_number, f"write failed: {str(e)}")
+            return
+
+        written = []
+        for index, doc in enumerate(docs):
+            if index in failed:
+                self._record_error(summary, row_numbers[index], failed[index])
+            else:
+                written.append(doc)
+        summary["written"] += len(written)
+
+        if not embed or not written:
+            vector_sync.release(entry_ids)
+            summary["embedding_deferred"] += len(written)
+            return
+
+        try:
+            vector_sync.upsert_vectors(written)
+            vector_sync.complete(entry_ids)
+            summary["embedded"] += len(written)
+        except Exception as e:
+            logger.error(f"Embedding import chunk failed, deferring to outbox: {str(e)}")
+            vector_sync.release(entry_ids)
+            summary["embedding_deferred"] += len(written)
+
+    def _write_docs(self, docs: List[Dict[str, Any]], mode: str) -> Dict[int, str]:
+        """Write one chunk unordered; returns the error message per failed doc index"""
+        try:
+            if mode == "upsert":
+                self.collection.bulk_write(
+                    [
+                        UpdateOne(
+                            {"id": doc["id"]},
+                            {
+                                "$set": {k: v for k, v in doc.items() if k != "created_at"},
+                                "$setOnInsert": {"created_at": doc["created_at"]},
+                            },
+                            upsert=True,
+                        )
+                        for doc in docs
+                    ],
+                    ordered=False,
+                )
+            else:
+                self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            return {
+                error["index"]: (
+                    "a product with this id already exists"
+                    if error["code"] == DUPLICATE_KEY
+                    else error["errmsg"]
+                )
+                for error in e.details.get("writeErrors", [])
+            }
+        return {}
+
+    @staticmethod
+    def _record_error(summary: Dict[str, Any], row_number: int, message: str):
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"row": row_number, "error": message})
@@ -1,48 +1,144 @@
 import logging
-from typing import List, Dict, Any, Optional
-from models.product import Product
+import re
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from models.product import (
+    NORMALIZED_FIELDS,
+    PRODUCT_EMBEDDING_PROJECTION,
+    PRODUCT_PROJECTION,
+    Product,
+    normalize_filter_value,
+    product_document_to_dict,
+)
+from .catalog_snapshot import WATERMARK_SKEW, catalog_snapshots
+from .catalog_version import catalog_version
+from .lexical_index import BM25Index
+from .session_interest import document_embeddings, session_interest
+from .similarity_service import similarity_service
 from .vector_service import VectorService
+from .vector_sync import vector_sync
 from config import Config as AppConfig  # For db
 from datetime import datetime
-from pymongo import DESCENDING
+from pydantic import TypeAdapter, ValidationError
+from pymongo import DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
+from utils.metrics import metrics
+from utils.pagination import (
+    SORT_OPTIONS,
+    check_page_size,
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+)
 
 logger = logging.getLogger(__name__)
 
+# Reciprocal rank fusion constant (score = sum of 1 / (RRF_K + rank))
+RRF_K = 60
+SEARCH_MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+# "text index required for $text query"
+INDEX_NOT_FOUND = 27
+TEXT_SCORE = {"$meta": "textScore"}
+# Listing totals above this are reported as estimates
+LISTING_COUNT_LIMIT = 10000
+PRODUCT_STATS_PIPELINE = [
+    {"$match": {"is_active": True}},
+    {
+        "$facet": {
+            "summary": [
+                {
+                    "$group": {
+                        "_id": None,
+                        "total_products": {"$sum": 1},
+                        "price_min": {"$min": "$price"},
+                        "price_max": {"$max": "$price"},
+                        "average_rating": {"$avg": "$rating"},
+                        "in_stock_count": {
+                            "$sum": {"$cond": [{"$gt": ["$stock", 0]}, 1, 0]}
+                        },
+                    }
+                }
+            ],
+            "categories": [{"$group": {"_id": "$category"}}, {"$count": "count"}],
+            "brands": [{"$group": {"_id": "$brand"}}, {"$count": "count"}],
+        }
+    },
+]
+# Fields whose changes re-embed a product, and those that only rewrite its vector metadata
+CONTENT_FIELDS = ("name", "description", "features", "category", "subcategory", "brand")
+VECTOR_METADATA_FIELDS = ("price", "rating", "stock")
+BULK_UPDATE_FIELDS = ("price", "original_price", "stock")
+IMMUTABLE_FIELDS = ("id", "created_at", "updated_at", "embedding_id")
+FIELD_ADAPTERS = {
+    name: TypeAdapter(field.annotation) for name, field in Product.model_fields.items()
+}
+LEXICAL_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "name": 1,
+    "description": 1,
+    "brand": 1,
+    "category": 1,
+    "subcategory": 1,
+    "features": 1,
+    "is_active": 1,
+    "updated_at": 1,
+}
+
+
+def build_preference_text(preferences: Dict[str, Any]) -> str:
+    """Build search text from user preferences"""
+    text_parts = []
+
+    if preferences.get("favoriteCategories"):
+        text_parts.extend(preferences["favoriteCategories"])
+
+    if preferences.get("favoriteBrands"):
+        text_parts.extend(preferences["favoriteBrands"])
+
+    if preferences.get("priceRange"):
+        min_price, max_price = preferences["priceRange"]
+        if max_price < 500:
+            text_parts.append("budget affordable cheap")
+        elif max_price > 1500:
+            text_parts.append("premium high-end expensive")
+        else:
+            text_parts.append("mid-range")
+
+    return " ".join(text_parts) if text_parts else "popular electronics"
+
+
 class ProductService:
     """Service for product-related operations"""
 
+    # BM25 index shared by every ProductService in the process
+    _lexical_index: Optional[BM25Index] = None
+    _lexical_lock = threading.Lock()
+    # (catalog version, stats) served from memory until the catalog changes
+    _stats_cache: Optional[Tuple[int, Dict[str, Any]]] = None
+
     def __init__(self):
         self.vector_service = VectorService()
         self.db = AppConfig.db
         self.collection = self.db["products"]
 
     def create_product(self, product_data: Dict[str, Any]) -> Product:
-        """Create a new product and generate its embedding"""
+        """Create a new product and queue its embedding"""
         try:
             product = Product(**product_data)
             product.created_at = datetime.now()
             product.updated_at = datetime.now()
 
-            self.collection.insert_one(product.dict())
-
-            search_text = product.get_search_text()
-            metadata = {
-                "category": product.category,
-                "subcategory": product.subcategory,
-                "brand": product.brand,
-                "price": product.price,
-                "rating": product.rating,
-                "in_stock": product.is_in_stock(),
-            }
-
-            self.vector_service.upsert_product_embedding(
-                product.id, search_text, metadata
+            vector_sync.write_with_outbox(
+                lambda session: self.collection.insert_one(
+                    product.to_document(), session=session
+                ),
+                [product.id],
             )
 
-            self.collection.update_one(
-                {"id": product.id},
-                {"$set": {"embedding_id": product.id}}
-            )
+            self._on_catalog_write(product.id, product)
 
             logger.info(f"Created product: {product.name}")
             return product
@@ -54,43 +150,36 @@ class ProductService:
     def update_product(
         self, product_id: str, update_data: Dict[str, Any]
     ) -> Optional[Product]:
-        """Update a product and refresh its embedding"""
+        """Apply a partial update with $set and queue the matching vector refresh"""
         try:
-            existing_doc = self.collection.find_one({"id": product_id})
-            if not existing_doc:
-                return None
-
-            product = Product(**existing_doc)
-            for key, value in update_data.items():
-                if hasattr(product, key):
-                    setattr(product, key, value)
+            changes = self._validate_changes(update_data)
+            changes["updated_at"] = datetime.now()
 
-            product.updated_at = datetime.now()
-
-            content_fields = [
-                "name",
-                "description",
-                "features",
-                "category",
-                "subcategory",
-                "brand",
-            ]
-            if any(field in update_data for field in content_fields):
-                search_text = product.get_search_text()
-                metadata = {
-                    "category": product.category,
-                    "subcategory": product.subcategory,
-                    "brand": product.brand,
-                    "price": product.price,
-                    "rating": product.rating,
-                    "in_stock": product.is_in_stock(),
-                }
-
-                self.vector_service.upsert_product_embedding(
-                    product.id, search_text, metadata
+            if any(field in changes for field in CONTENT_FIELDS):
+                kind = "upsert"
+            elif any(field in changes for field in VECTOR_METADATA_FIELDS):
+                kind = "metadata"
+            else:
+                kind = None
+
+            def write(session):
+                return self.collection.find_one_and_update(
+                    {"id": product_id},
+                    {"$set": changes},
+                    projection=PRODUCT_PROJECTION,
+                    return_document=ReturnDocument.AFTER,
+                    session=session,
                 )
 
-            self.collection.replace_one({"id": product_id}, product.dict())
+            if kind:
+                doc = vector_sync.write_with_outbox(write, [product_id], kind=kind)
+            else:
+                doc = write(None)
+            if not doc:
+                return None
+
+            product = Product(**doc)
+            self._on_catalog_write(product_id, product)
 
             logger.info(f"Updated product: {product.name}")
             return product
@@ -99,16 +188,90 @@ class ProductService:
             logger.error(f"Error updating product: {str(e)}")
             raise
 
+    def bulk_update_price_stock(self, updates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Apply many price/stock updates in one bulk write with metadata-only vector refreshes"""
+        requests = []
+        product_ids = []
+        errors = []
+        now = datetime.now()
+        for position, update in enumerate(updates):
+            product_id = update.get("id") if isinstance(update, dict) else None
+            if not product_id:
+                errors.append({"index": position, "error": "id is required"})
+                continue
+
+            fields = {key: value for key, value in update.items() if key != "id"}
+            unknown = set(fields) - set(BULK_UPDATE_FIELDS)
+            if unknown or not fields:
+                errors.append(
+                    {
+                        "index": position,
+                        "id": product_id,
+                        "error": f"only {', '.join(BULK_UPDATE_FIELDS)} can be bulk updated",
+                    }
+                )
+                continue
+
+            try:
+                changes = self._validate_changes(fields)
+            except ValueError as e:
+                errors.append({"index": position, "id": product_id, "error": str(e)})
+                continue
+
+            changes["updated_at"] = now
+            requests.append(UpdateOne({"id": product_id}, {"$set": changes}))
+            if any(field in changes for field in VECTOR_METADATA_FIELDS):
+                product_ids.append(product_id)
+
+        matched = modified = 0
+        if requests:
+            result = vector_sync.write_with_outbox(
+                lambda session: self.collection.bulk_write(
+                    requests, ordered=False, session=session
+                ),
+                list(dict.fromkeys(product_ids)),
+                kind="metadata",
+            )
+            matched, modified = result.matched_count, result.modified_count
+            self._on_catalog_metadata_write()
+
+        logger.info(f"Bulk updated {modified} products ({len(errors)} rejected)")
+        return {"matched": matched, "modified": modified, "errors": errors}
+
+    @staticmethod
+    def _validate_changes(update_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate each updatable field against its Product annotation; raises ValueError"""
+        changes = {}
+        for field, value in update_data.items():
+            adapter = FIELD_ADAPTERS.get(field)
+            if adapter is None or field in IMMUTABLE_FIELDS:
+                continue
+            try:
+                changes[field] = adapter.validate_python(value)
+            except ValidationError as e:
+                raise ValueError(f"{field}: {e.errors()[0]['msg']}")
+
+        for field in NORMALIZED_FIELDS:
+            if field in changes:
+                changes[f"{field}_norm"] = normalize_filter_value(changes[field])
+        return changes
+
     def delete_product(self, product_id: str) -> bool:
-        """Delete a product and its embedding"""
+        """Delete a product and queue removal of its embedding"""
         try:
             existing_doc = self.collection.find_one({"id": product_id})
             if not existing_doc:
                 return False
 
-            self.vector_service.delete_product_embedding(product_id)
+            vector_sync.write_with_outbox(
+                lambda session: self.collection.delete_one(
+                    {"id": product_id}, session=session
+                ),
+                [product_id],
+                kind="delete",
+            )
 
-            self.collection.delete_one({"id": product_id})
+            self._on_catalog_write(product_id)
 
             logger.info(f"Deleted product: {existing_doc['name']}")
             return True
@@ -118,160 +281,415 @@ class ProductService:
             raise
 
     def search_products(
-        self, query: str, filters: Dict[str, Any] = None, limit: int = 20
+        self,
+        query: str,
+        filters: Dict[str, Any] = None,
+        limit: int = 20,
+        session_vector: Optional[np.ndarray] = None,
     ) -> List[Product]:
-        """Search products using both vector similarity and traditional filters"""
+        """Search products with hybrid lexical + semantic retrieval fused by rank; raises ValueError for a bad limit"""
+        check_page_size(limit)
         try:
-            vector_results = self.vector_service.search_similar_products(
-                query,
-                top_k=limit * 2,
-            )
+            filters = filters or {}
+            # Re-ranking by session interest needs the stored embeddings and a deeper pool
+            rerank = session_vector is not None
+            projection = PRODUCT_EMBEDDING_PROJECTION if rerank else PRODUCT_PROJECTION
+            vector_filter = self._build_vector_filter(filters)
+            mongo_filter = self._build_mongo_filter(filters)
+            timings = {}
+
+            stage_started = time.perf_counter()
+            try:
+                query_embedding = self.vector_service.generate_embedding(query)
+            except Exception:
+                query_embedding = None
+            timings["embed"] = time.perf_counter() - stage_started
+
+            # Filters are pushed down into the vector query; over-fetch grows
+            # top_k until enough products also pass the Mongo re-check (vector
+            # metadata can lag behind the catalog) or the cap is reached.
+            stage_started = time.perf_counter()
+            top_k = limit * 2
+            max_top_k = max(top_k, AppConfig.VECTOR_SEARCH_MAX_TOP_K)
+            vector_results = []
+            docs = []
+            while query_embedding is not None:
+                vector_results = self.vector_service.search_by_vector(
+                    query_embedding, top_k=top_k, filter_dict=vector_filter
+                )
+                if not vector_results:
+                    break
+
+                product_ids = [result["id"] for result in vector_results]
+                docs = list(
+                    self.collection.find(
+                        {**mongo_filter, "id": {"$in": product_ids}}, projection
+                    )
+                )
 
-            if not vector_results:
-                return self.search_by_filters(search_query=query, limit=limit)
+                if (
+                    len(docs) >= limit
+                    or len(vector_results) < top_k
+                    or top_k >= max_top_k
+                ):
+                    break
+                top_k = min(top_k * 2, max_top_k)
+            timings["vector"] = time.perf_counter() - stage_started
+
+            stage_started = time.perf_counter()
+            lexical_results = self._get_lexical_index().search(
+                query, limit=max(limit * 2, AppConfig.LEXICAL_SEARCH_TOP_K)
+            )
+            timings["lexical"] = time.perf_counter() - stage_started
 
-            product_ids = [result["id"] for result in vector_results]
+            if not vector_results and not lexical_results:
+                return self.search_by_text(query, filters, limit)
 
-            mongo_filter = {"id": {"$in": product_ids}}
+            stage_started = time.perf_counter()
+            docs_by_id = {doc["id"]: doc for doc in docs}
+            missing_ids = [
+                doc_id for doc_id, _ in lexical_results if doc_id not in docs_by_id
+            ]
+            if missing_ids:
+                for doc in self.collection.find(
+                    {**mongo_filter, "id": {"$in": missing_ids}}, projection
+                ):
+                    docs_by_id[doc["id"]] = doc
+            timings["hydrate"] = time.perf_counter() - stage_started
+
+            stage_started = time.perf_counter()
+            fused_scores = self._fuse_rankings(
+                [
+                    [result["id"] for result in vector_results],
+                    [doc_id for doc_id, _ in lexical_results],
+                ],
+                allowed_ids=docs_by_id,
+            )
+            ranked_ids = sorted(fused_scores, key=fused_scores.get, reverse=True)
+            if rerank:
+                ranked_ids = session_interest.rerank(
+                    ranked_ids[: limit * AppConfig.SESSION_RERANK_POOL],
+                    document_embeddings(docs_by_id.values()),
+                    session_vector,
+                )
+            products = [Product(**docs_by_id[product_id]) for product_id in ranked_ids[:limit]]
+            timings["fusion"] = time.perf_counter() - stage_started
 
-            if filters:
-                if filters.get("category"):
-                    mongo_filter["category"] = filters["category"]
+            self._record_search_timings(query, timings)
+            return products
 
-                if filters.get("subcategory"):
-                    mongo_filter["subcategory"] = filters["subcategory"]
+        except Exception as e:
+            logger.error(f"Error searching products: {str(e)}")
+            return []
 
-                if filters.get("brand"):
-                    mongo_filter["brand"] = filters["brand"]
+    def search_by_text(
+        self, query: str, filters: Dict[str, Any] = None, limit: int = 20
+    ) -> List[Product]:
+        """Search products with the weighted MongoDB text index, best match first"""
+        mongo_filter = {
+            **self._build_mongo_filter(filters or {}),
+            "$text": {"$search": query},
+        }
+        try:
+            docs = list(
+                self.collection.find(mongo_filter, {**PRODUCT_PROJECTION, "score": TEXT_SCORE})
+                .sort([("score", TEXT_SCORE)])
+                .limit(limit)
+            )
+        except OperationFailure as e:
+            if e.code != INDEX_NOT_FOUND:
+                raise
+            logger.warning("Product text index missing, falling back to regex search")
+            filters = filters or {}
+            return self.search_by_filters(
+                category=filters.get("category"),
+                subcategory=filters.get("subcategory"),
+                brand=filters.get("brand"),
+                min_price=filters.get("min_price"),
+                max_price=filters.get("max_price"),
+                min_rating=filters.get("min_rating"),
+                in_stock_only=bool(filters.get("in_stock_only")),
+                search_query=query,
+                limit=limit,
+                match=filters.get("match", "exact"),
+            )
 
-                if filters.get("min_price") is not None:
-                    mongo_filter["price"] = {"$gte": filters["min_price"]}
+        metrics.counter("search.text_fallback").inc()
+        return [Product(**doc) for doc in docs]
+
+    @staticmethod
+    def _fuse_rankings(
+        rankings: List[List[str]], allowed_ids=None
+    ) -> Dict[str, float]:
+        """Combine ranked id lists with reciprocal rank fusion"""
+        fused_scores = {}
+        for ranking in rankings:
+            if allowed_ids is not None:
+                ranking = [doc_id for doc_id in ranking if doc_id in allowed_ids]
+            for rank, doc_id in enumerate(ranking, start=1):
+                fused_scores[doc_id] = fused_scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank)
+        return fused_scores
+
+    @staticmethod
+    def _record_search_timings(query: str, timings: Dict[str, float]):
+        """Record per-stage search timings (seconds) as millisecond histograms"""
+        for stage, seconds in timings.items():
+            metrics.histogram(f"search.{stage}_ms", SEARCH_MS_BUCKETS).observe(seconds * 1000)
+        logger.info(
+            f"Search timings for '{query}': "
+            + ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in timings.items())
+        )
+
+    def _get_lexical_index(self) -> BM25Index:
+        """Get the shared BM25 index, refreshed incrementally when the catalog version moved on"""
+        version = catalog_version.current()
+        index = ProductService._lexical_index
+        if index is not None and index.version == version:
+            return index
+
+        if index is not None:
+            # Another request is already refreshing: search the current index meanwhile
+            if not ProductService._lexical_lock.acquire(blocking=False):
+                return index
+        else:
+            ProductService._lexical_lock.acquire()
+        try:
+            index = ProductService._lexical_index
+            if index is None:
+                index = BM25Index()
+                self._apply_lexical_docs(
+                    index, self.collection.find({"is_active": True}, LEXICAL_PROJECTION)
+                )
+                index.version = version
+                ProductService._lexical_index = index
+                logger.info(
+                    f"Built lexical index over {len(index)} products (catalog version {version})"
+                )
+            elif index.version != version:
+                self._refresh_lexical_index(index, version)
+            return index
+        finally:
+            ProductService._lexical_lock.release()
+
+    def _refresh_lexical_index(self, index: BM25Index, version: int):
+        """Apply products written since the index's watermark, as the catalog snapshot does"""
+        changed = self._apply_lexical_docs(
+            index,
+            self.collection.find(
+                {"updated_at": {"$gte": index.watermark - WATERMARK_SKEW}}, LEXICAL_PROJECTION
+            )
+            if index.watermark is not None
+            else [],
+        )
+
+        # Hard deletes leave no trace to query by, so diff the live id set
+        live_ids = {
+            doc["id"] for doc in self.collection.find({"is_active": True}, {"_id": 0, "id": 1})
+        }
+        indexed_ids = index.doc_ids()
+        for product_id in indexed_ids - live_ids:
+            index.remove(product_id)
+        missing_ids = list(live_ids - indexed_ids)
+        if missing_ids:
+            changed += self._apply_lexical_docs(
+                index, self.collection.find({"id": {"$in": missing_ids}}, LEXICAL_PROJECTION)
+            )
 
-                if filters.get("max_price") is not None:
-                    if "price" not in mongo_filter:
-                        mongo_filter["price"] = {}
-                    mongo_filter["price"]["$lte"] = filters["max_price"]
+        index.version = version
+        logger.info(
+            f"Refreshed lexical index to catalog version {version}: "
+            f"{len(index)} products ({changed} re-read)"
+        )
+
+    @staticmethod
+    def _apply_lexical_docs(index: BM25Index, docs) -> int:
+        """Add or remove product documents in the lexical index and advance its watermark"""
+        count = 0
+        for doc in docs:
+            count += 1
+            if doc.get("is_active", True):
+                index.add(doc["id"], Product.construct(**doc).get_search_text())
+            else:
+                index.remove(doc["id"])
+            updated_at = doc.get("updated_at")
+            if updated_at and (index.watermark is None or updated_at > index.watermark):
+                index.watermark = updated_at
+        if index.watermark is None:
+            index.watermark = datetime.now()
+        return count
+
+    def _on_catalog_write(self, product_id: str, product: Optional[Product] = None):
+        """Bump the catalog version and apply a write to in-process catalog indexes"""
+        version = catalog_version.bump()
+
+        with ProductService._lexical_lock:
+            index = ProductService._lexical_index
+            if index is not None:
+                if product is not None and product.is_active:
+                    index.add(product_id, product.get_search_text())
+                else:
+                    index.remove(product_id)
+                # Writes from other processes in between are picked up by the next refresh
+                if index.version == version - 1:
+                    index.version = version
+
+    def _on_catalog_metadata_write(self):
+        """Bump the catalog version for writes that don't change any product's search text"""
+        version = catalog_version.bump()
+
+        with ProductService._lexical_lock:
+            index = ProductService._lexical_index
+            if index is not None and index.version == version - 1:
+                index.version = version
+
+    @staticmethod
+    def _build_vector_filter(filters: Dict[str, Any]) -> Dict[str, Any]:
+        """Translate search filters into the vector index metadata filter language"""
+        vector_filter = {}
+
+        # Only exact matches can be pushed down, and only once the backfill has
+        # given every vector the normalised metadata; otherwise (and for
+        # prefix/contains) the Mongo re-check applies them to the candidates
+        if filters.get("match", "exact") == "exact" and vector_sync.normalized_metadata_ready():
+            for field in NORMALIZED_FIELDS:
+                if filters.get(field):
+                    vector_filter[f"{field}_norm"] = {
+                        "$eq": normalize_filter_value(filters[field])
+                    }
+
+        price_filter = {}
+        if filters.get("min_price") is not None:
+            price_filter["$gte"] = float(filters["min_price"])
+        if filters.get("max_price") is not None:
+            price_filter["$lte"] = float(filters["max_price"])
+        if price_filter:
+            vector_filter["price"] = price_filter
+
+        if filters.get("min_rating") is not None:
+            vector_filter["rating"] = {"$gte": float(filters["min_rating"])}
+
+        if filters.get("in_stock_only"):
+            vector_filter["in_stock"] = {"$eq": True}
+
+        return vector_filter
+
+    @staticmethod
+    def _build_mongo_filter(filters: Dict[str, Any]) -> Dict[str, Any]:
+        """Translate search filters into a MongoDB query"""
+        mongo_filter = {"is_active": True}
 
-                if filters.get("min_rating") is not None:
-                    mongo_filter["rating"] = {"$gte": filters["min_rating"]}
+        for field in NORMALIZED_FIELDS:
+            if filters.get(field):
+                mongo_filter.update(
+                    ProductService._match_filter(
+                        field, filters[field], filters.get("match", "exact")
+                    )
+                )
 
-                if filters.get("in_stock_only"):
-                    mongo_filter["stock"] = {"$gt": 0}
+        if filters.get("min_price") is not None:
+            mongo_filter["price"] = {"$gte": filters["min_price"]}
 
-            docs = list(self.collection.find(mongo_filter))
+        if filters.get("max_price") is not None:
+            if "price" not in mongo_filter:
+                mongo_filter["price"] = {}
+            mongo_filter["price"]["$lte"] = filters["max_price"]
 
-            products = [Product(**doc) for doc in docs]
+        if filters.get("min_rating") is not None:
+            mongo_filter["rating"] = {"$gte": filters["min_rating"]}
 
-            product_score_map = {
-                result["id"]: result["score"] for result in vector_results
-            }
-            products.sort(key=lambda p: product_score_map.get(p.id, 0), reverse=True)
+        if filters.get("in_stock_only"):
+            mongo_filter["stock"] = {"$gt": 0}
 
-            return products[:limit]
+        return mongo_filter
 
-        except Exception as e:
-            logger.error(f"Error searching products: {str(e)}")
-            return []
+    @staticmethod
+    def _match_filter(field: str, value: str, match: str = "exact") -> Dict[str, Any]:
+        """Build an index-backed condition on a normalised field"""
+        value = normalize_filter_value(value)
+        if match == "prefix":
+            condition = {"$regex": f"^{re.escape(value)}"}
+        elif match == "contains":
+            condition = {"$regex": re.escape(value)}
+        else:
+            condition = value
+        return {f"{field}_norm": condition}
 
     def get_recommendations(
         self,
         product_id: str = None,
         user_preferences: Dict[str, Any] = None,
         limit: int = 6,
+        taste_vector: List[float] = None,
+        session_vector: Optional[np.ndarray] = None,
     ) -> List[Product]:
         """Get product recommendations"""
         try:
-            if product_id:
-                doc = self.collection.find_one({"id": product_id})
-                if not doc:
-                    return []
+            # Re-ranking by session interest needs the stored embeddings and a deeper pool
+            rerank = session_vector is not None
+            pool = limit * AppConfig.SESSION_RERANK_POOL if rerank else limit
+            projection = PRODUCT_EMBEDDING_PROJECTION if rerank else PRODUCT_PROJECTION
 
-                product = Product(**doc)
-                search_text = product.get_search_text()
-                similar_results = self.vector_service.search_similar_products(
-                    search_text,
-                    top_k=limit + 1,
-                )
+            if product_id:
+                # Precomputed neighbours first; products not yet in the table query the index
+                similar_results = similarity_service.get_neighbors(product_id, pool)
+                if not similar_results:
+                    doc = self.collection.find_one({"id": product_id})
+                    if not doc:
+                        return []
+
+                    product = Product(**doc)
+                    search_text = product.get_search_text()
+                    similar_results = self.vector_service.search_similar_products(
+                        search_text,
+                        top_k=pool + 1,
+                    )
 
                 similar_ids = [
                     r["id"] for r in similar_results if r["id"] != product_id
                 ]
 
+            elif taste_vector:
+                similar_results = self.vector_service.search_by_vector(
+                    taste_vector, top_k=pool
+                )
+                similar_ids = [r["id"] for r in similar_results]
+
             elif user_preferences:
-                pref_text = self._build_preference_text(user_preferences)
+                pref_text = build_preference_text(user_preferences)
                 similar_results = self.vector_service.search_similar_products(
-                    pref_text, top_k=limit
+                    pref_text, top_k=pool
                 )
                 similar_ids = [r["id"] for r in similar_results]
 
             else:
-                docs = list(self.collection.find({"is_active": True}).sort("rating", DESCENDING).limit(limit))
-                return [Product(**doc) for doc in docs]
-
-            docs = list(self.collection.find({"id": {"$in": similar_ids}}))
-
-            products = [Product(**doc) for doc in docs]
+                similar_results = []
+                docs = list(self.collection.find({"is_active": True}, projection).sort("rating", DESCENDING).limit(pool))
 
             if similar_results:
+                docs = list(self.collection.find({"id": {"$in": similar_ids}}, projection))
                 score_map = {r["id"]: r["score"] for r in similar_results}
-                products.sort(key=lambda p: score_map.get(p.id, 0), reverse=True)
+                docs.sort(key=lambda doc: score_map.get(doc["id"], 0), reverse=True)
+            elif product_id or taste_vector or user_preferences:
+                return []
+
+            if rerank:
+                docs_by_id = {doc["id"]: doc for doc in docs}
+                ranked_ids = session_interest.rerank(
+                    list(docs_by_id), document_embeddings(docs), session_vector
+                )
+                docs = [docs_by_id[doc_id] for doc_id in ranked_ids]
 
-            return products[:limit]
+            return [Product(**doc) for doc in docs[:limit]]
 
         except Exception as e:
             logger.error(f"Error getting recommendations: {str(e)}")
             return []
 
-    def _build_preference_text(self, preferences: Dict[str, Any]) -> str:
-        """Build search text from user preferences"""
-        text_parts = []
-
-        if preferences.get("favoriteCategories"):
-            text_parts.extend(preferences["favoriteCategories"])
-
-        if preferences.get("favoriteBrands"):
-            text_parts.extend(preferences["favoriteBrands"])
-
-        if preferences.get("priceRange"):
-            min_price, max_price = preferences["priceRange"]
-            if max_price < 500:
-                text_parts.append("budget affordable cheap")
-            elif max_price > 1500:
-                text_parts.append("premium high-end expensive")
-            else:
-                text_parts.append("mid-range")
-
-        return " ".join(text_parts) if text_parts else "popular electronics"
-
     def bulk_generate_embeddings(self):
         """Generate embeddings for all products (useful for initial setup)"""
         try:
-            docs = list(self.collection.find({"is_active": True}))
-
-            batch_data = []
-            for doc in docs:
-                product = Product(**doc)
-                search_text = product.get_search_text()
-                metadata = {
-                    "category": product.category,
-                    "subcategory": product.subcategory,
-                    "brand": product.brand,
-                    "price": product.price,
-                    "rating": product.rating,
-                    "in_stock": product.is_in_stock(),
-                }
-
-                batch_data.append(
-                    {"id": product.id, "text": search_text, "metadata": metadata}
-                )
-
-            self.vector_service.batch_upsert_products(batch_data)
-
-            for doc in docs:
-                self.collection.update_one(
-                    {"id": doc["id"]},
-                    {"$set": {"embedding_id": doc["id"]}}
-                )
+            docs = list(self.collection.find({"is_active": True}, PRODUCT_PROJECTION))
+            vector_sync.upsert_vectors(docs)
 
             logger.info(f"Generated embeddings for {len(docs)} products")
             return len(docs)
@@ -280,6 +698,130 @@ class ProductService:
             logger.error(f"Error generating bulk embeddings: {str(e)}")
             raise
 
+    def get_categories(self) -> List[Dict[str, Any]]:
+        """Get active categories with their subcategories"""
+        pipeline = [
+            {"$match": {"is_active": True}},
+            {"$group": {"_id": "$category", "subcategories": {"$addToSet": "$subcategory"}}},
+            {"$sort": {"_id": 1}},
+        ]
+        return [
+            {"category": cat["_id"], "subcategories": sorted(cat["subcategories"])}
+            for cat in self.collection.aggregate(pipeline)
+        ]
+
+    def get_brands(self) -> List[str]:
+        """Get active brands in alphabetical order"""
+        return sorted(self.collection.distinct("brand", {"is_active": True}))
+
+    def get_product_stats(self) -> Dict[str, Any]:
+        """Get catalog statistics, recomputed at most once per catalog version"""
+        version = catalog_version.current()
+        cached = ProductService._stats_cache
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        # The materialised stats document is shared by all worker processes
+        stats_doc = self.db["catalog_meta"].find_one({"_id": "product_stats"})
+        if stats_doc and stats_doc.get("version") == version:
+            stats = stats_doc["stats"]
+        else:
+            stats = self._compute_product_stats()
+            self.db["catalog_meta"].replace_one(
+                {"_id": "product_stats"},
+                {"version": version, "stats": stats, "computed_at": datetime.now()},
+                upsert=True,
+            )
+
+        ProductService._stats_cache = (version, stats)
+        return stats
+
+    def _compute_product_stats(self) -> Dict[str, Any]:
+        """Compute catalog statistics in a single $facet aggregation"""
+        result = next(self.collection.aggregate(PRODUCT_STATS_PIPELINE))
+        summary = result["summary"][0] if result["summary"] else {}
+        categories = result["categories"][0]["count"] if result["categories"] else 0
+        brands = result["brands"][0]["count"] if result["brands"] else 0
+
+        return {
+            "total_products": summary.get("total_products", 0),
+            "total_categories": categories,
+            "total_brands": brands,
+            "price_range": {
+                "min": summary.get("price_min", 0),
+                "max": summary.get("price_max", 0),
+            },
+            "average_rating": round(summary.get("average_rating") or 0, 2),
+            "in_stock_count": summary.get("in_stock_count", 0),
+        }
+
+    def list_products(
+        self,
+        sort: str = "rating",
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        include_facets: bool = False,
+        **filters,
+    ) -> Dict[str, Any]:
+        """List serialised products with keyset pagination; raises ValueError for a bad cursor or limit"""
+        check_page_size(limit)
+        after = decode_cursor(cursor, sort)
+        field = SORT_OPTIONS[sort][0]
+
+        facets = None
+        if include_facets or AppConfig.CATALOG_SNAPSHOT_ENABLED:
+            snapshot = catalog_snapshots.get()
+            if include_facets:
+                mask, facets = snapshot.get_facet_engine().search(**filters)
+            else:
+                mask = snapshot.filter_mask(**filters)
+            indices = snapshot.select_indices(mask, limit + 1, sort, after)
+            products = [snapshot.rows[i] for i in indices]
+            keys = [getattr(snapshot.products[i], field) for i in indices]
+            total, total_is_estimate = int(mask.sum()), False
+        else:
+            docs, total, total_is_estimate = self._list_products_from_db(
+                sort, after, limit, filters
+            )
+            products = [product_document_to_dict(doc) for doc in docs]
+            keys = [doc[field] for doc in docs]
+
+        next_cursor = None
+        if len(products) > limit:
+            products = products[:limit]
+            next_cursor = encode_cursor(sort, keys[limit - 1], products[-1]["id"])
+
+        result = {
+            "products": products,
+            "next_cursor": next_cursor,
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+        }
+        if facets is not None:
+            result["facets"] = facets
+        return result
+
+    def _list_products_from_db(
+        self, sort: str, after: Optional[Tuple[Any, str]], limit: int, filters: Dict[str, Any]
+    ) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """One page of documents plus a capped count, seeking on (sort key, id)"""
+        field, direction = SORT_OPTIONS[sort]
+        mongo_filter = self._build_mongo_filter(filters)
+
+        page_filter = mongo_filter
+        if after is not None:
+            page_filter = {**mongo_filter, **keyset_filter(sort, after)}
+
+        docs = list(
+            self.collection.find(page_filter, PRODUCT_PROJECTION)
+            .sort([(field, direction), ("id", direction)])
+            .limit(limit + 1)
+        )
+
+        # Counting stops at the cap so deep catalogs don't turn into full scans
+        total = self.collection.count_documents(mongo_filter, limit=LISTING_COUNT_LIMIT)
+        return docs, total, total >= LISTING_COUNT_LIMIT
+
     # Added from model: search_by_filters
     def search_by_filters(
         self,
@@ -292,18 +834,32 @@ class ProductService:
         in_stock_only: bool = False,
         search_query: Optional[str] = None,
         limit: int = 50,
+        match: str = "exact",
     ) -> List[Product]:
         """Search products with filters"""
-        mongo_filter = {"is_active": True}
-
-        if category:
-            mongo_filter["category"] = {"$regex": category, "$options": "i"}
+        if not search_query and AppConfig.CATALOG_SNAPSHOT_ENABLED:
+            # Browse queries are answered from the in-memory columnar snapshot
+            return catalog_snapshots.get().query(
+                category=category,
+                subcategory=subcategory,
+                brand=brand,
+                min_price=min_price,
+                max_price=max_price,
+                min_rating=min_rating,
+                in_stock_only=in_stock_only,
+                match=match,
+                limit=limit,
+            )
 
-        if subcategory:
-            mongo_filter["subcategory"] = {"$regex": subcategory, "$options": "i"}
+        mongo_filter = {"is_active": True}
 
-        if brand:
-            mongo_filter["brand"] = {"$regex": brand, "$options": "i"}
+        for field, value in (
+            ("category", category),
+            ("subcategory", subcategory),
+            ("brand", brand),
+        ):
+            if value:
+                mongo_filter.update(self._match_filter(field, value, match))
 
         if min_price is not None:
             mongo_filter["price"] = {"$gte": min_price}
@@ -327,5 +883,9 @@ class ProductService:
                 {"features": {"$regex": search_query, "$options": "i"}},
             ]
 
-        docs = list(self.collection.find(mongo_filter).sort("rating", DESCENDING).limit(limit))
+        docs = list(
+            self.collection.find(mongo_filter, PRODUCT_PROJECTION)
+            .sort("rating", DESCENDING)
+            .limit(limit)
+        )
         return [Product(**doc) for doc in docs]
\ No newline at end of file
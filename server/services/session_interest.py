@@ -0,0 +1,175 @@
+import logging
+import secrets
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config import Config as AppConfig
+from models.chat_session import ChatSession
+
+from .vector_sync import unpack_embedding
+
+logger = logging.getLogger(__name__)
+
+# Weight of each interaction; an event moves the vector by 1 - decay ** weight
+EVENT_WEIGHTS = {"view": 1.0, "shown": 0.5, "cart": 2.0}
+# Rank discount for the base score of re-ranked results, as in reciprocal rank fusion
+RANK_K = 60
+# Prefix of server-issued anonymous browse session ids
+BROWSE_SESSION_PREFIX = "browse_"
+
+
+def _unit(vector: np.ndarray) -> Optional[np.ndarray]:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else None
+
+
+def update_interest(
+    vector: Optional[np.ndarray], embedding: np.ndarray, weight: float = 1.0
+) -> Optional[np.ndarray]:
+    """Fold one product embedding into a decayed running average in O(d)"""
+    unit = _unit(embedding)
+    if unit is None:
+        return vector
+    if vector is None or vector.shape != unit.shape:
+        return unit
+    rate = 1 - AppConfig.SESSION_INTEREST_DECAY ** weight
+    return vector + rate * (unit - vector)
+
+
+def document_embeddings(docs: Iterable[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Stored embeddings of product documents read with the embedding projection"""
+    return {doc["id"]: unpack_embedding(doc["embedding"]) for doc in docs if doc.get("embedding")}
+
+
+class SessionInterestService:
+    """Real-time interest vector for a chat or browse session.
+
+    Each session keeps a decayed running average of the embeddings of the
+    products it viewed, was shown in chat, or added to cart. Chat sessions
+    keep it in ``ChatSession.session_data["interest"]`` and are only updated
+    when they exist and are anonymous or owned by the caller. Anonymous
+    browsing uses ids issued by ``issue_browse_session`` and documents in
+    ``browse_sessions``, which expire ``BROWSE_SESSION_TTL`` seconds after
+    their last event. Nothing is created from a client-supplied id.
+    Embeddings come from the copy stored on product documents, which callers
+    read in the same query they already make, so recording and re-ranking add
+    no encoder or vector index calls.
+    """
+
+    def __init__(self, db):
+        self.sessions = db["chat_sessions"]
+        self.browse_sessions = db["browse_sessions"]
+
+    def issue_browse_session(self) -> str:
+        """Create an anonymous browse session and return its id"""
+        session_id = BROWSE_SESSION_PREFIX + secrets.token_urlsafe(24)
+        now = datetime.now()
+        self.browse_sessions.insert_one(
+            {"id": session_id, "interest": None, "created_at": now, "updated_at": now}
+        )
+        return session_id
+
+    def _find(self, session_id: str, user_id: Optional[str]):
+        """Load a session the caller may use as (query, interest, chat session or None)"""
+        if session_id.startswith(BROWSE_SESSION_PREFIX):
+            query = {"id": session_id}
+            doc = self.browse_sessions.find_one(query, {"_id": 0, "interest": 1})
+            return (query, doc.get("interest") or {}, None) if doc else None
+
+        query = {"id": session_id, "user_id": {"$in": list({None, user_id})}}
+        doc = self.sessions.find_one(query, {"_id": 0, "session_data": 1})
+        if not doc:
+            return None
+        chat_session = ChatSession(id=session_id, **doc)
+        return query, chat_session.get_session_data().get("interest") or {}, chat_session
+
+    def get_vector(
+        self, session_id: Optional[str], user_id: Optional[str] = None
+    ) -> Optional[np.ndarray]:
+        """Get a session's interest vector, or None before its first event"""
+        if not session_id:
+            return None
+        try:
+            found = self._find(session_id, user_id)
+            if not found or not found[1].get("vector"):
+                return None
+            return np.asarray(found[1]["vector"], dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Error loading session interest: {str(e)}")
+            return None
+
+    def record(
+        self,
+        session_id: Optional[str],
+        docs: List[Dict[str, Any]],
+        event: str,
+        user_id: Optional[str] = None,
+    ):
+        """Fold the stored embeddings of product documents into a session's interest"""
+        embeddings = list(document_embeddings(docs).values())
+        if not session_id or not embeddings:
+            return
+        try:
+            found = self._find(session_id, user_id)
+            if not found:
+                return
+            query, interest, chat_session = found
+
+            vector = interest.get("vector")
+            vector = np.asarray(vector, dtype=np.float32) if vector else None
+            for embedding in embeddings:
+                vector = update_interest(vector, embedding, EVENT_WEIGHTS[event])
+            if vector is None:
+                return
+
+            interest = {
+                "vector": [round(float(value), 5) for value in vector],
+                "events": interest.get("events", 0) + len(embeddings),
+            }
+            if chat_session is None:
+                self.browse_sessions.update_one(
+                    query, {"$set": {"interest": interest, "updated_at": datetime.now()}}
+                )
+                return
+            data = chat_session.get_session_data()
+            data["interest"] = interest
+            chat_session.set_session_data(data)
+            self.sessions.update_one(
+                query,
+                {
+                    "$set": {
+                        "session_data": chat_session.session_data,
+                        "updated_at": chat_session.updated_at,
+                    }
+                },
+            )
+        except Exception as e:
+            logger.error(f"Error recording session interest: {str(e)}")
+
+    def rerank(
+        self,
+        ranked_ids: List[str],
+        embeddings: Dict[str, np.ndarray],
+        vector: np.ndarray,
+    ) -> List[str]:
+        """Re-order ranked ids, boosting those similar to the session interest"""
+        unit = _unit(vector)
+        if unit is None:
+            return list(ranked_ids)
+
+        def score(item):
+            rank, product_id = item
+            similarity = 0.0
+            embedding = embeddings.get(product_id)
+            if embedding is not None and embedding.shape == unit.shape:
+                product_unit = _unit(embedding)
+                if product_unit is not None:
+                    similarity = float(product_unit @ unit)
+            return (1 + AppConfig.SESSION_INTEREST_WEIGHT * similarity) / (RANK_K + rank)
+
+        return [product_id for _, product_id in sorted(enumerate(ranked_ids), key=score, reverse=True)]
+
+
+session_interest = SessionInterestService(AppConfig.db)
@@ -0,0 +1,322 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pymongo import DeleteMany, ReplaceOne, UpdateMany
+
+from config import Config as AppConfig
+
+from .catalog_snapshot import WATERMARK_SKEW
+from .catalog_version import catalog_version
+from .vector_service import VectorService
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class EmbeddingMatrix:
+    """Unit rows of the active products' stored embeddings, kept in process.
+
+    Loaded once, then refreshed incrementally: products re-embedded since the
+    ``embedded_at`` watermark are re-read on every refresh, and the active id
+    set is re-diffed only when the catalog version moved, as the catalog
+    snapshot does. Rows live in a preallocated array that grows by doubling.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self.version = None
+        self.watermark: Optional[datetime] = None
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self._data: Optional[np.ndarray] = None
+        self.lock = threading.Lock()
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._data is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._data[: len(self.ids)]
+
+    def set(self, product_id: str, embedding):
+        """Insert or replace a product's row"""
+        vector = _unit(embedding)
+        if self._data is None:
+            self._data = np.empty((1024, len(vector)), dtype=np.float32)
+        row = self.rows.get(product_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self._data):
+                self._data = np.concatenate([self._data, np.empty_like(self._data)])
+            self.ids.append(product_id)
+            self.rows[product_id] = row
+        self._data[row] = vector
+
+    def remove(self, product_id: str):
+        """Drop a product's row, moving the last row into its place"""
+        row = self.rows.pop(product_id, None)
+        if row is None:
+            return
+        last_id = self.ids.pop()
+        if last_id != product_id:
+            self._data[row] = self._data[len(self.ids)]
+            self.ids[row] = last_id
+            self.rows[last_id] = row
+
+    def refresh(self) -> int:
+        """Catch up with embeddings and deactivations from any process; returns rows re-read"""
+        version = catalog_version.current()
+        projection = {"_id": 0, "id": 1, "embedding": 1, "is_active": 1, "embedded_at": 1}
+        if self._data is None:
+            changed = self._apply(
+                self.products.find({"is_active": True, "embedding": {"$exists": True}}, projection)
+            )
+        else:
+            changed = self._apply(
+                self.products.find(
+                    {"embedded_at": {"$gte": self.watermark - WATERMARK_SKEW}}, projection
+                )
+            )
+            if version != self.version:
+                live_ids = {
+                    doc["id"]
+                    for doc in self.products.find(
+                        {"is_active": True, "embedding": {"$exists": True}}, {"_id": 0, "id": 1}
+                    )
+                }
+                for product_id in set(self.rows) - live_ids:
+                    self.remove(product_id)
+                missing_ids = list(live_ids - set(self.rows))
+                if missing_ids:
+                    changed += self._apply(
+                        self.products.find({"id": {"$in": missing_ids}}, projection)
+                    )
+        if self.watermark is None:
+            self.watermark = datetime.now()
+        self.version = version
+        return changed
+
+    def _apply(self, docs) -> int:
+        count = 0
+        for doc in docs:
+            count += 1
+            if doc.get("is_active", True) and doc.get("embedding"):
+                # float32 bytes, as written by vector_sync.pack_embedding
+                self.set(doc["id"], np.frombuffer(doc["embedding"], dtype=np.float32))
+            else:
+                self.remove(doc["id"])
+            embedded_at = doc.get("embedded_at")
+            if embedded_at and (self.watermark is None or embedded_at > self.watermark):
+                self.watermark = embedded_at
+        return count
+
+
+class SimilarityService:
+    """Precomputed item-to-item similar products.
+
+    The neighbour lists live in the ``product_neighbors`` collection, one
+    document per product with its top-N most similar products, so a product
+    page's recommendations are one indexed lookup. ``rebuild`` recomputes
+    every list from the vector index with blocked matrix multiplies;
+    ``update_products`` keeps the lists current as embeddings change, using
+    an in-process matrix of the embedding copies stored on product documents.
+    Each list also stores its ``size`` and ``last_score``, so the lists a new
+    embedding can enter are found with an indexed query.
+    """
+
+    def __init__(self, db):
+        self.collection = db["product_neighbors"]
+        self.products = db["products"]
+        self.vector_service = VectorService()
+        self.embeddings = EmbeddingMatrix(self.products)
+
+    def get_neighbors(self, product_id: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Get the precomputed neighbours of a product, best first, or None if absent"""
+        doc = self.collection.find_one(
+            {"product_id": product_id}, {"_id": 0, "neighbors": {"$slice": limit}}
+        )
+        return doc["neighbors"] if doc else None
+
+    def rebuild(self, top_n: int = None, block_size: int = None) -> int:
+        """Recompute every active product's neighbour list in one batched pass"""
+        top_n = top_n or AppConfig.SIMILAR_PRODUCTS_TOP_N
+
+        product_ids = [
+            doc["id"] for doc in self.products.find({"is_active": True}, {"_id": 0, "id": 1})
+        ]
+        embeddings = self.vector_service.fetch_embeddings(product_ids)
+        ids = [product_id for product_id in product_ids if product_id in embeddings]
+        if not ids:
+            self.collection.delete_many({})
+            return 0
+
+        matrix = _normalize_rows(
+            np.array([embeddings[product_id] for product_id in ids], dtype=np.float32)
+        )
+        count = len(ids)
+        self._write_lists(ids, matrix, np.arange(count), top_n, block_size)
+
+        self.collection.delete_many({"product_id": {"$nin": ids}})
+        logger.info(f"Rebuilt similar products for {count} products (top {min(top_n, count - 1)})")
+        return count
+
+    def update_products(
+        self, embeddings: Dict[str, Any], top_n: int = None, block_size: int = None
+    ) -> int:
+        """Refresh neighbour lists after products were (re-)embedded.
+
+        The batch is scored against the catalog in one matrix multiply over the
+        in-process embedding matrix. Lists are recomputed for the batch and for
+        every existing list the batch can change: those that held a batch
+        product, are short, or now have a batch product beating their last
+        entry. Returns the number of lists written.
+        """
+        top_n = top_n or AppConfig.SIMILAR_PRODUCTS_TOP_N
+        with self.embeddings.lock:
+            self.embeddings.refresh()
+            for product_id, embedding in embeddings.items():
+                if product_id in self.embeddings.rows:
+                    self.embeddings.set(product_id, embedding)
+            ids = list(self.embeddings.ids)
+            matrix = self.embeddings.matrix.copy()
+
+        index = {product_id: row for row, product_id in enumerate(ids)}
+        batch_ids = [product_id for product_id in embeddings if product_id in index]
+        if not batch_ids:
+            return 0
+
+        batch_rows = np.array([index[product_id] for product_id in batch_ids])
+        scores = matrix[batch_rows] @ matrix.T
+        scores[np.arange(len(batch_rows)), batch_rows] = -np.inf
+        # Best score any batch product reaches against each catalog product
+        best = scores.max(axis=0)
+        full_size = min(top_n, len(ids) - 1)
+
+        affected = set(batch_rows.tolist())
+        for doc in self.collection.find(
+            {"neighbors.id": {"$in": batch_ids}}, {"_id": 0, "product_id": 1}
+        ):
+            if doc["product_id"] in index:
+                affected.add(index[doc["product_id"]])
+
+        # A list can only take a batch product that beats its last entry, so
+        # only products scoring above the lowest stored last_score are looked up
+        lowest = self.collection.find_one(
+            {"last_score": {"$ne": None}}, {"_id": 0, "last_score": 1}, sort=[("last_score", 1)]
+        )
+        floor = lowest["last_score"] if lowest else -np.inf
+        candidates = [ids[row] for row in np.flatnonzero(best > floor) if row not in affected]
+        for doc in self.collection.find(
+            {
+                "$or": [
+                    {"size": {"$lt": full_size}},
+                    # Lists written before size and last_score were stored
+                    {"last_score": None},
+                    {"product_id": {"$in": candidates}, "last_score": {"$lt": float(best.max())}},
+                ]
+            },
+            {"_id": 0, "product_id": 1, "size": 1, "last_score": 1},
+        ):
+            row = index.get(doc["product_id"])
+            if row is None:
+                continue
+            last_score = doc.get("last_score")
+            if last_score is None or doc.get("size", 0) < full_size or best[row] > last_score:
+                affected.add(row)
+
+        rows = np.array(sorted(affected))
+        self._write_lists(ids, matrix, rows, top_n, block_size)
+        return len(rows)
+
+    def _write_lists(self, ids: List[str], matrix: np.ndarray, rows: np.ndarray, top_n: int, block_size: int = None):
+        """Compute and store the top-N lists of the given matrix rows"""
+        block_size = block_size or AppConfig.SIMILAR_PRODUCTS_BLOCK_SIZE
+        top_n = min(top_n, len(ids) - 1)
+        now = datetime.now()
+
+        for start in range(0, len(rows), block_size):
+            block = rows[start : start + block_size]
+            # One (block x catalog) similarity matrix at a time bounds memory
+            scores = matrix[block] @ matrix.T
+            scores[np.arange(len(block)), block] = -np.inf
+
+            if top_n > 0:
+                top = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+                top_scores = np.take_along_axis(scores, top, axis=1)
+                order = np.argsort(-top_scores, axis=1)
+                top = np.take_along_axis(top, order, axis=1)
+                top_scores = np.take_along_axis(top_scores, order, axis=1)
+            else:
+                top = np.empty((len(block), 0), dtype=np.int64)
+                top_scores = np.empty((len(block), 0), dtype=np.float32)
+
+            self.collection.bulk_write(
+                [
+                    ReplaceOne(
+                        {"product_id": ids[row]},
+                        {
+                            "product_id": ids[row],
+                            "neighbors": [
+                                {"id": ids[column], "score": round(float(score), 6)}
+                                for column, score in zip(top[position], top_scores[position])
+                            ],
+                            "size": len(top[position]),
+                            "last_score": (
+                                round(float(top_scores[position][-1]), 6) if top_n > 0 else None
+                            ),
+                            "updated_at": now,
+                        },
+                        upsert=True,
+                    )
+                    for position, row in enumerate(block)
+                ],
+                ordered=False,
+            )
+
+    def remove_products(self, product_ids: List[str]):
+        """Drop deleted products' lists and remove them from everyone else's"""
+        if not product_ids:
+            return
+        self.collection.bulk_write(
+            [
+                DeleteMany({"product_id": {"$in": product_ids}}),
+                UpdateMany(
+                    {"neighbors.id": {"$in": product_ids}},
+                    [
+                        {
+                            "$set": {
+                                "neighbors": {
+                                    "$filter": {
+                                        "input": "$neighbors",
+                                        "cond": {"$not": [{"$in": ["$$this.id", product_ids]}]},
+                                    }
+                                }
+                            }
+                        },
+                        {
+                            "$set": {
+                                "size": {"$size": "$neighbors"},
+                                "last_score": {"$arrayElemAt": ["$neighbors.score", -1]},
+                            }
+                        },
+                    ],
+                ),
+            ],
+            ordered=True,
+        )
+
+
+similarity_service = SimilarityService(AppConfig.db)
@@ -0,0 +1,248 @@
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from config import Config as AppConfig
+from utils.ttl_cache import TTLCache
+
+from .product_service import build_preference_text
+from .session_interest import document_embeddings
+from .vector_service import VectorService
+
+logger = logging.getLogger(__name__)
+
+# Optimistic-concurrency attempts per incremental update before the doc is rebuilt
+MAX_UPDATE_ATTEMPTS = 3
+# Cached for users with no preferences or interactions, so they are not rebuilt per request
+_NO_TASTE = object()
+
+
+def _unit(vector: np.ndarray) -> Optional[np.ndarray]:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else None
+
+
+def blend_taste(preference: Optional[List[float]], item_sum: Optional[List[float]]) -> Optional[List[float]]:
+    """Weighted blend of the unit preference embedding and the unit item sum"""
+    weight = AppConfig.TASTE_PREFERENCE_WEIGHT
+    parts = []
+    if preference:
+        unit = _unit(np.asarray(preference, dtype=np.float32))
+        if unit is not None:
+            parts.append(weight * unit)
+    if item_sum:
+        unit = _unit(np.asarray(item_sum, dtype=np.float32))
+        if unit is not None:
+            parts.append((1 - weight) * unit)
+    if not parts:
+        return None
+    taste = _unit(np.sum(parts, axis=0))
+    return taste.tolist() if taste is not None else None
+
+
+class TasteService:
+    """Per-user taste vectors for personalised recommendations.
+
+    A user's taste blends the embedding of their stated preferences with the
+    (weighted) embeddings of the products they like and have in their cart.
+    The running item sum is kept in the ``user_taste`` collection and updated
+    incrementally on like and cart events, so reading a taste vector never
+    encodes text; the blended vector is also cached in-process. Product
+    embeddings come from the copy stored on product documents, so like and
+    cart writes make no vector index calls.
+    """
+
+    def __init__(self, db):
+        self.collection = db["user_taste"]
+        self.users = db["users"]
+        self.likes = db["likes"]
+        self.carts = db["carts"]
+        self.products = db["products"]
+        self.vector_service = VectorService()
+        self.cache = TTLCache("taste", AppConfig.TASTE_CACHE_SIZE, AppConfig.TASTE_CACHE_TTL)
+
+    def get_taste_vector(self, user_id: str) -> Optional[List[float]]:
+        """Get a user's taste vector, building it on first use; None if nothing is known"""
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            return None if cached is _NO_TASTE else cached
+
+        try:
+            doc = self.collection.find_one({"user_id": user_id}, {"_id": 0, "vector": 1})
+            vector = doc["vector"] if doc else self.rebuild(user_id)
+        except Exception as e:
+            logger.error(f"Error loading taste vector: {str(e)}")
+            return None
+
+        self.cache.set(user_id, _NO_TASTE if vector is None else vector)
+        return vector
+
+    def rebuild(self, user_id: str) -> Optional[List[float]]:
+        """Recompute a user's taste from their preferences, likes and cart"""
+        user = self.users.find_one({"id": user_id}, {"_id": 0, "preferences": 1})
+        preference = self._embed_preferences(self._parse_preferences(user))
+
+        likes = [doc["product_id"] for doc in self.likes.find({"user_id": user_id, "liked": True}, {"product_id": 1})]
+        cart_doc = self.carts.find_one({"user_id": user_id}, {"_id": 0, "items": 1})
+        cart = list(cart_doc.get("items", {})) if cart_doc else []
+        embeddings = self._stored_embeddings(list(set(likes) | set(cart)))
+
+        dimension = len(next(iter(embeddings.values()))) if embeddings else 0
+        item_sum = np.zeros(dimension, dtype=np.float32)
+        for product_ids, weight in ((likes, AppConfig.TASTE_LIKE_WEIGHT), (cart, AppConfig.TASTE_CART_WEIGHT)):
+            for product_id in product_ids:
+                if product_id in embeddings:
+                    item_sum += weight * self._unit_embedding(embeddings[product_id])
+
+        vector = blend_taste(preference, item_sum.tolist())
+        self.collection.replace_one(
+            {"user_id": user_id},
+            {
+                "user_id": user_id,
+                "preference": preference,
+                "item_sum": item_sum.tolist(),
+                "likes": likes,
+                "cart": cart,
+                "vector": vector,
+                "version": 0,
+                "updated_at": datetime.now(),
+            },
+            upsert=True,
+        )
+        return vector
+
+    def record_preferences(self, user_id: str, preferences: Dict[str, Any]):
+        """Re-embed a user's preferences after they changed"""
+        try:
+            preference = self._embed_preferences(preferences)
+            self._update(user_id, lambda doc: {"preference": preference})
+        except Exception as e:
+            logger.error(f"Error updating taste preferences: {str(e)}")
+
+    def record_like(self, user_id: str, product_id: str, liked: bool):
+        """Add or remove a product from a user's liked items"""
+        self._record_items(user_id, "likes", AppConfig.TASTE_LIKE_WEIGHT, {product_id: liked})
+
+    def record_cart(self, user_id: str, product_id: str, in_cart: bool):
+        """Add or remove a product from a user's carted items"""
+        self.record_cart_many(user_id, {product_id: in_cart})
+
+    def record_cart_many(self, user_id: str, changes: Dict[str, bool]):
+        """Add or remove many products from a user's carted items in one update"""
+        self._record_items(user_id, "cart", AppConfig.TASTE_CART_WEIGHT, changes)
+
+    def clear_cart(self, user_id: str):
+        """Remove every carted item from a user's taste"""
+        try:
+            doc = self.collection.find_one({"user_id": user_id}, {"_id": 0, "cart": 1})
+            if not doc or not doc["cart"]:
+                return
+            embeddings = self._stored_embeddings(doc["cart"])
+
+            def change(doc):
+                item_sum = np.asarray(doc["item_sum"], dtype=np.float32)
+                for product_id in doc["cart"]:
+                    if product_id in embeddings:
+                        item_sum -= AppConfig.TASTE_CART_WEIGHT * self._unit_embedding(embeddings[product_id])
+                return {"item_sum": item_sum.tolist(), "cart": []}
+
+            self._update(user_id, change)
+        except Exception as e:
+            logger.error(f"Error clearing taste cart: {str(e)}")
+
+    def _record_items(self, user_id: str, field: str, weight: float, changes: Dict[str, bool]):
+        """Apply {product_id: present} changes to one item list with one embedding read"""
+        try:
+            doc = self.collection.find_one({"user_id": user_id}, {"_id": 0, field: 1})
+            if not doc:
+                # Built lazily, from the already-written like/cart state, on the next read
+                return
+            pending = {
+                product_id: present
+                for product_id, present in changes.items()
+                if (product_id in doc[field]) != present
+            }
+            if not pending:
+                return
+            embeddings = self._stored_embeddings(list(pending))
+
+            def change(doc):
+                items = list(doc[field])
+                item_sum = np.asarray(doc["item_sum"], dtype=np.float32)
+                for product_id, present in pending.items():
+                    if (product_id in items) == present:
+                        continue
+                    if present:
+                        items.append(product_id)
+                    else:
+                        items.remove(product_id)
+                    embedding = embeddings.get(product_id)
+                    if embedding is not None:
+                        delta = weight * self._unit_embedding(embedding)
+                        if not item_sum.size:
+                            item_sum = np.zeros_like(delta)
+                        item_sum = item_sum + delta if present else item_sum - delta
+                return {field: items, "item_sum": item_sum.tolist()}
+
+            self._update(user_id, change)
+        except Exception as e:
+            logger.error(f"Error updating taste vector: {str(e)}")
+
+    def _stored_embeddings(self, product_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Embeddings stored on product documents, read in one query"""
+        if not product_ids:
+            return {}
+        return document_embeddings(
+            self.products.find({"id": {"$in": product_ids}}, {"_id": 0, "id": 1, "embedding": 1})
+        )
+
+    def _update(self, user_id: str, change: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        """Apply a change to the taste doc with optimistic concurrency on its version"""
+        for _ in range(MAX_UPDATE_ATTEMPTS):
+            doc = self.collection.find_one({"user_id": user_id}, {"_id": 0})
+            if not doc:
+                self.cache.invalidate(user_id)
+                return
+
+            update = change(doc)
+            merged = {**doc, **update}
+            update["vector"] = blend_taste(merged["preference"], merged["item_sum"])
+            update["updated_at"] = datetime.now()
+            result = self.collection.update_one(
+                {"user_id": user_id, "version": doc["version"]},
+                {"$set": update, "$inc": {"version": 1}},
+            )
+            if result.matched_count:
+                self.cache.set(user_id, _NO_TASTE if update["vector"] is None else update["vector"])
+                return
+
+        # Persistently contended; start over from the source collections
+        self.collection.delete_one({"user_id": user_id})
+        self.cache.invalidate(user_id)
+
+    def _embed_preferences(self, preferences: Dict[str, Any]) -> Optional[List[float]]:
+        if not any(preferences.get(key) for key in ("favoriteCategories", "favoriteBrands")):
+            return None
+        return self.vector_service.generate_embedding(build_preference_text(preferences))
+
+    @staticmethod
+    def _parse_preferences(user: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        preferences = (user or {}).get("preferences") or {}
+        if isinstance(preferences, str):
+            try:
+                preferences = json.loads(preferences)
+            except json.JSONDecodeError:
+                return {}
+        return preferences
+
+    @staticmethod
+    def _unit_embedding(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        unit = _unit(vector)
+        return unit if unit is not None else vector
+
+
+taste_service = TasteService(AppConfig.db)
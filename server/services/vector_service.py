@@ -1,12 +1,48 @@
 import logging
+import threading
+import time
 from typing import Any, Dict, List
 
 from flask import current_app
 from pinecone.grpc import PineconeGRPC as Pinecone
 from sentence_transformers import SentenceTransformer
 
+from .embedding_batcher import EmbeddingBatcher
+
 logger = logging.getLogger(__name__)
 
+WARMUP_TEXT = "wireless noise cancelling headphones with long battery life"
+
+# The embedding model is shared by every VectorService in the process. When the
+# app is preloaded by gunicorn it is loaded in the master, so forked workers
+# share the weights copy-on-write instead of each loading a private copy.
+_models: Dict[str, SentenceTransformer] = {}
+_batchers: Dict[str, EmbeddingBatcher] = {}
+_model_lock = threading.Lock()
+_warmup_timings: Dict[str, float] = {}
+_ready = threading.Event()
+
+
+def _load_model(model_name: str) -> SentenceTransformer:
+    """Load an embedding model once per process"""
+    with _model_lock:
+        model = _models.get(model_name)
+        if model is None:
+            model = SentenceTransformer(model_name)
+            _models[model_name] = model
+        return model
+
+
+def _get_batcher(model_name: str, max_batch_size: int, max_wait_ms: float) -> EmbeddingBatcher:
+    """Get the process-wide micro-batcher for an embedding model"""
+    model = _load_model(model_name)
+    with _model_lock:
+        batcher = _batchers.get(model_name)
+        if batcher is None:
+            batcher = EmbeddingBatcher(model, max_batch_size, max_wait_ms)
+            _batchers[model_name] = batcher
+        return batcher
+
 
 class VectorService:
     """Service for managing vector embeddings and similarity search with Pinecone"""
@@ -14,6 +50,7 @@ class VectorService:
     def __init__(self):
         self.model = None
         self.index = None
+        self.batcher = None
         self.initialized = False
 
     def initialize(self):
@@ -24,7 +61,17 @@ class VectorService:
 
             self.index = self.pc.Index(index_name)
 
-            self.model = SentenceTransformer(current_app.config["EMBEDDING_MODEL"])
+            model_name = current_app.config["EMBEDDING_MODEL"]
+            if not _ready.is_set():
+                self.warm_up(model_name)
+            self.model = _load_model(model_name)
+
+            if current_app.config["EMBEDDING_BATCHING"]:
+                self.batcher = _get_batcher(
+                    model_name,
+                    current_app.config["EMBEDDING_BATCH_MAX_SIZE"],
+                    current_app.config["EMBEDDING_BATCH_MAX_WAIT_MS"],
+                )
 
             self.initialized = True
             logger.info("Vector service initialized successfully")
@@ -33,18 +80,63 @@ class VectorService:
             logger.error(f"Failed to initialize vector service: {str(e)}")
             raise
 
+    @staticmethod
+    def warm_up(model_name: str) -> Dict[str, float]:
+        """Load the shared embedding model and run a warm-up encode"""
+        timings = {}
+
+        start = time.perf_counter()
+        model = _load_model(model_name)
+        timings["load_model_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        logger.info(f"Loaded embedding model {model_name} in {timings['load_model_ms']}ms")
+
+        start = time.perf_counter()
+        model.encode(WARMUP_TEXT)
+        timings["warmup_encode_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        logger.info(f"Embedding warm-up encode took {timings['warmup_encode_ms']}ms")
+
+        _warmup_timings.update(timings)
+        _ready.set()
+        return timings
+
+    @staticmethod
+    def is_ready() -> bool:
+        """Whether the embedding model has been loaded and warmed up"""
+        return _ready.is_set()
+
+    @staticmethod
+    def get_warmup_timings() -> Dict[str, float]:
+        """Get the per-phase timings recorded during warm-up"""
+        return dict(_warmup_timings)
+
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for given text"""
         if not self.initialized:
             self.initialize()
 
         try:
+            if self.batcher:
+                return self.batcher.encode(text)
             embedding = self.model.encode(text)
             return embedding.tolist()
         except Exception as e:
             logger.error(f"Failed to generate embedding: {str(e)}")
             raise
 
+    def generate_embeddings(
+        self, texts: List[str], batch_size: int = 64
+    ) -> List[List[float]]:
+        """Generate embeddings for many texts in batched model calls"""
+        if not self.initialized:
+            self.initialize()
+
+        try:
+            embeddings = self.model.encode(texts, batch_size=batch_size)
+            return embeddings.tolist()
+        except Exception as e:
+            logger.error(f"Failed to generate embeddings: {str(e)}")
+            raise
+
     def upsert_product_embedding(
         self, product_id: str, text: str, metadata: Dict[str, Any] = None
     ):
@@ -77,7 +169,27 @@ class VectorService:
 
         try:
             query_embedding = self.generate_embedding(query_text)
+        except Exception as e:
+            logger.error(f"Failed to search similar products: {str(e)}")
+            return []
 
+        similar_products = self.search_by_vector(query_embedding, top_k, filter_dict)
+        logger.info(
+            f"Found {len(similar_products)} similar products for query: {query_text}"
+        )
+        return similar_products
+
+    def search_by_vector(
+        self,
+        query_embedding: List[float],
+        top_k: int = 10,
+        filter_dict: Dict[str, Any] = None,
+    ) -> List[Dict[str, Any]]:
+        """Search for similar products given an already computed query embedding"""
+        if not self.initialized:
+            self.initialize()
+
+        try:
             search_kwargs = {
                 "vector": query_embedding,
                 "top_k": top_k,
@@ -100,9 +212,6 @@ class VectorService:
                     }
                 )
 
-            logger.info(
-                f"Found {len(similar_products)} similar products for query: {query_text}"
-            )
             return similar_products
 
         except Exception as e:
@@ -122,6 +231,53 @@ class VectorService:
             logger.error(f"Failed to delete product embedding: {str(e)}")
             raise
 
+    def delete_product_embeddings(self, product_ids: List[str]):
+        """Delete many product embeddings from Pinecone in one call"""
+        if not self.initialized:
+            self.initialize()
+
+        try:
+            self.index.delete(ids=product_ids)
+            logger.info(f"Deleted {len(product_ids)} product embeddings")
+
+        except Exception as e:
+            logger.error(f"Failed to delete product embeddings: {str(e)}")
+            raise
+
+    def fetch_embeddings(
+        self, product_ids: List[str], batch_size: int = 1000
+    ) -> Dict[str, List[float]]:
+        """Fetch stored product embeddings by id; ids without a vector are left out"""
+        if not self.initialized:
+            self.initialize()
+
+        try:
+            embeddings = {}
+            for start in range(0, len(product_ids), batch_size):
+                response = self.index.fetch(ids=product_ids[start : start + batch_size])
+                for product_id, vector in response["vectors"].items():
+                    embeddings[product_id] = vector["values"]
+            return embeddings
+
+        except Exception as e:
+            logger.error(f"Failed to fetch product embeddings: {str(e)}")
+            raise
+
+    def update_product_metadata(self, updates: List[Dict[str, Any]]):
+        """Overwrite metadata of existing product vectors without re-embedding"""
+        if not self.initialized:
+            self.initialize()
+
+        try:
+            # Pinecone updates one vector per call
+            for update in updates:
+                self.index.update(id=update["id"], set_metadata=update["metadata"])
+            logger.info(f"Updated metadata for {len(updates)} product embeddings")
+
+        except Exception as e:
+            logger.error(f"Failed to update product metadata: {str(e)}")
+            raise
+
     def get_index_stats(self) -> Dict[str, Any]:
         """Get Pinecone index statistics"""
         if not self.initialized:
@@ -136,32 +292,31 @@ class VectorService:
 
     def batch_upsert_products(
         self, products: List[Dict[str, Any]], batch_size: int = 100
-    ):
-        """Batch upsert multiple product embeddings"""
+    ) -> Dict[str, List[float]]:
+        """Batch upsert multiple product embeddings and return them by product id"""
         if not self.initialized:
             self.initialize()
 
         try:
-            vectors = []
-
-            for product in products:
-                embedding = self.generate_embedding(product["text"])
-                vectors.append(
+            upserted = {}
+            for start in range(0, len(products), batch_size):
+                batch = products[start : start + batch_size]
+                embeddings = self.generate_embeddings(
+                    [product["text"] for product in batch]
+                )
+                vectors = [
                     {
                         "id": product["id"],
                         "values": embedding,
                         "metadata": product.get("metadata", {}),
                     }
-                )
-
-                if len(vectors) >= batch_size:
-                    self.index.upsert(vectors)
-                    vectors = []
-
-            if vectors:
+                    for product, embedding in zip(batch, embeddings)
+                ]
                 self.index.upsert(vectors)
+                upserted.update((vector["id"], vector["values"]) for vector in vectors)
 
             logger.info(f"Batch upserted {len(products)} product embeddings")
+            return upserted
 
         except Exception as e:
             logger.error(f"Failed to batch upsert products: {str(e)}")
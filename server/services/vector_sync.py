@@ -0,0 +1,462 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from pymongo import ASCENDING, UpdateOne
+from pymongo.client_session import ClientSession
+from pymongo.errors import OperationFailure
+
+from config import Config as AppConfig
+from models.product import NORMALIZED_FIELDS, Product, normalize_filter_value
+from utils.metrics import metrics
+
+from .similarity_service import similarity_service
+from .vector_service import VectorService
+
+logger = logging.getLogger(__name__)
+
+# "Transaction numbers are only allowed on a replica set member or mongos"
+ILLEGAL_OPERATION = 20
+# Entries written outside a transaction only become due after this grace
+# period unless the product write completes first and releases them.
+PREPARE_GRACE = timedelta(seconds=30)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500)
+# catalog_meta document recording that every vector carries <field>_norm metadata
+NORMALIZED_METADATA_FLAG = "vector_normalized_metadata"
+
+
+def build_vector_metadata(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the vector index metadata for a product document"""
+    metadata = {
+        "category": doc["category"],
+        "subcategory": doc["subcategory"],
+        "brand": doc["brand"],
+        "price": doc["price"],
+        "rating": doc.get("rating", 0.0),
+        "in_stock": doc.get("stock", 0) > 0,
+    }
+    for field in NORMALIZED_FIELDS:
+        metadata[f"{field}_norm"] = normalize_filter_value(doc[field])
+    return metadata
+
+
+def pack_embedding(values: List[float]) -> bytes:
+    """Pack an embedding as float32 bytes for the product document"""
+    return np.asarray(values, dtype=np.float32).tobytes()
+
+
+def unpack_embedding(data: bytes) -> np.ndarray:
+    """Unpack an embedding stored by pack_embedding"""
+    return np.frombuffer(data, dtype=np.float32)
+
+
+class VectorSyncService:
+    """Transactional outbox that keeps the vector index in sync with the catalog.
+
+    Catalog writes record an outbox entry ("product X changed") in MongoDB
+    together with the product write. A background worker drains the outbox:
+    it coalesces entries per product, reads the product's current state, and
+    batch-upserts or batch-deletes vectors, retrying failures with backoff.
+    Products whose entries are all "metadata" (price, rating or stock changes)
+    only get their vector metadata rewritten, without re-embedding.
+    Because the worker always syncs the current state, entries are idempotent
+    and their order doesn't matter.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.outbox = db["vector_outbox"]
+        self.failed = db["vector_outbox_failed"]
+        self.products = db["products"]
+        self.meta = db["catalog_meta"]
+        self.vector_service = VectorService()
+        self._transactions_supported = None
+        self._normalized_metadata = False
+        self._normalized_checked_at = 0.0
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def write_with_outbox(
+        self,
+        write: Callable[[Optional[ClientSession]], Any],
+        product_ids: List[str],
+        kind: str = "upsert",
+    ):
+        """Run a catalog write together with its outbox entries"""
+        if self._transactions_supported is not False:
+            try:
+                with self.db.client.start_session() as session:
+                    result = session.with_transaction(
+                        lambda s: self._write_and_enqueue(write, product_ids, kind, s)
+                    )
+                self._transactions_supported = True
+                self._wake.set()
+                return result
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                logger.warning(
+                    "MongoDB transactions unavailable, writing vector outbox entries without one"
+                )
+                self._transactions_supported = False
+
+        # Without transactions the entry goes first but isn't due until the
+        # write has succeeded (or the grace period has passed), so a crash in
+        # between costs a redundant sync instead of a missed one.
+        entry_ids = self.prepare(product_ids, kind)
+        result = write(None)
+        self.release(entry_ids)
+        return result
+
+    def _write_and_enqueue(self, write, product_ids, kind, session):
+        result = write(session)
+        self.enqueue(product_ids, kind, session=session)
+        return result
+
+    def enqueue(
+        self,
+        product_ids: List[str],
+        kind: str = "upsert",
+        session: Optional[ClientSession] = None,
+        delay: timedelta = timedelta(0),
+    ) -> List[Any]:
+        """Record that products changed and need their vectors synced"""
+        now = datetime.now()
+        entries = [
+            {
+                "product_id": product_id,
+                "kind": kind,
+                "created_at": now,
+                "next_attempt_at": now + delay,
+                "attempts": 0,
+                "lease_owner": None,
+                "lease_until": None,
+                "last_error": None,
+            }
+            for product_id in product_ids
+        ]
+        if not entries:
+            return []
+        result = self.outbox.insert_many(entries, session=session)
+        return result.inserted_ids
+
+    def prepare(self, product_ids: List[str], kind: str = "upsert") -> List[Any]:
+        """Record entries that only become due after the grace period.
+
+        Callers that sync vectors themselves prepare entries before writing,
+        then complete them on success or release them to the worker on failure.
+        """
+        return self.enqueue(product_ids, kind, delay=PREPARE_GRACE)
+
+    def release(self, entry_ids: List[Any]):
+        """Make prepared entries due now and wake the worker"""
+        if entry_ids:
+            self.outbox.update_many(
+                {"_id": {"$in": entry_ids}}, {"$set": {"next_attempt_at": datetime.now()}}
+            )
+        self._wake.set()
+
+    def complete(self, entry_ids: List[Any]):
+        """Drop prepared entries whose products were synced by the caller"""
+        if entry_ids:
+            self.outbox.delete_many({"_id": {"$in": entry_ids}})
+
+    def drain_once(self, batch_size: int = None) -> int:
+        """Claim, coalesce and sync one batch of due outbox entries"""
+        batch_size = batch_size or AppConfig.VECTOR_SYNC_BATCH_SIZE
+        now = datetime.now()
+        lease_free = {"$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]}
+
+        candidate_ids = [
+            entry["_id"]
+            for entry in self.outbox.find(
+                {"next_attempt_at": {"$lte": now}, **lease_free}, {"_id": 1}
+            )
+            .sort("created_at", ASCENDING)
+            .limit(batch_size)
+        ]
+        if not candidate_ids:
+            return 0
+
+        # Lease the entries so concurrent workers (one per gunicorn worker)
+        # don't sync the same batch.
+        lease_owner = str(uuid.uuid4())
+        self.outbox.update_many(
+            {"_id": {"$in": candidate_ids}, **lease_free},
+            {
+                "$set": {
+                    "lease_owner": lease_owner,
+                    "lease_until": now + timedelta(seconds=AppConfig.VECTOR_SYNC_LEASE_SECONDS),
+                }
+            },
+        )
+        entries = list(self.outbox.find({"lease_owner": lease_owner}))
+        if not entries:
+            return 0
+
+        kinds: Dict[str, set] = {}
+        for entry in entries:
+            kinds.setdefault(entry["product_id"], set()).add(entry.get("kind", "upsert"))
+        product_ids = list(kinds)
+        docs = {
+            doc["id"]: doc
+            for doc in self.products.find({"id": {"$in": product_ids}}, {"_id": 0})
+        }
+
+        # Coalesce per product: gone -> delete; only metadata changes on an
+        # already embedded product -> metadata update; anything else -> re-embed
+        upserts, metadata_updates, deletes = [], [], []
+        for product_id in product_ids:
+            doc = docs.get(product_id)
+            if doc is None:
+                deletes.append(product_id)
+            elif kinds[product_id] == {"metadata"} and doc.get("embedding_id"):
+                metadata_updates.append(doc)
+            else:
+                upserts.append(doc)
+
+        try:
+            self._sync(upserts, deletes, metadata_updates)
+            errors = {}
+        except Exception as e:
+            if len(product_ids) == 1:
+                errors = {product_ids[0]: e}
+            else:
+                logger.warning(f"Vector sync batch failed, retrying products one by one: {str(e)}")
+                errors = self._sync_each(upserts, deletes, metadata_updates)
+
+        failed = [entry for entry in entries if entry["product_id"] in errors]
+        if failed:
+            self._schedule_retry(failed, errors)
+        entries = [entry for entry in entries if entry["product_id"] not in errors]
+        if not entries:
+            return 0
+
+        self.outbox.delete_many({"_id": {"$in": [entry["_id"] for entry in entries]}})
+        metrics.counter("vector_sync.entries_synced").inc(len(entries))
+        metrics.counter("vector_sync.products_synced").inc(len(product_ids))
+        metrics.histogram("vector_sync.batch_size", BATCH_SIZE_BUCKETS).observe(len(product_ids))
+        logger.info(
+            f"Vector sync: {len(entries)} outbox entries -> {len(upserts)} upserts, "
+            f"{len(metadata_updates)} metadata updates, {len(deletes)} deletes"
+        )
+        return len(entries)
+
+    def _sync(
+        self,
+        upserts: List[Dict[str, Any]],
+        deletes: List[str],
+        metadata_updates: List[Dict[str, Any]] = (),
+    ):
+        if upserts:
+            self.upsert_vectors(upserts)
+
+        if metadata_updates:
+            self.vector_service.update_product_metadata(
+                [
+                    {"id": doc["id"], "metadata": build_vector_metadata(doc)}
+                    for doc in metadata_updates
+                ]
+            )
+
+        if deletes:
+            self.vector_service.delete_product_embeddings(deletes)
+            try:
+                similarity_service.remove_products(deletes)
+            except Exception as e:
+                logger.error(f"Failed to remove similar products: {str(e)}")
+
+    def _sync_each(
+        self,
+        upserts: List[Dict[str, Any]],
+        deletes: List[str],
+        metadata_updates: List[Dict[str, Any]],
+    ) -> Dict[str, Exception]:
+        """Sync products one at a time so one bad product can't fail its whole batch"""
+        errors = {}
+        work = (
+            [(doc["id"], ([doc], [], [])) for doc in upserts]
+            + [(doc["id"], ([], [], [doc])) for doc in metadata_updates]
+            + [(product_id, ([], [product_id], [])) for product_id in deletes]
+        )
+        for product_id, args in work:
+            try:
+                self._sync(*args)
+            except Exception as e:
+                errors[product_id] = e
+        return errors
+
+    def upsert_vectors(self, docs: List[Dict[str, Any]]):
+        """Embed and upsert product documents in batches, then record their embeddings"""
+        embeddings = self.vector_service.batch_upsert_products(
+            [
+                {
+                    "id": doc["id"],
+                    "text": Product(**doc).get_search_text(),
+                    "metadata": build_vector_metadata(doc),
+                }
+                for doc in docs
+            ]
+        )
+        now = datetime.now()
+        self.products.bulk_write(
+            [
+                UpdateOne(
+                    {"id": doc["id"]},
+                    {
+                        "$set": {
+                            "embedding_id": doc["id"],
+                            # Local copy so request paths can use it without a vector index call
+                            "embedding": pack_embedding(embeddings[doc["id"]]),
+                            # Watermark for other processes' in-memory embedding matrices
+                            "embedded_at": now,
+                        }
+                    },
+                )
+                for doc in docs
+            ],
+            ordered=False,
+        )
+
+        # Best-effort: a failed refresh leaves lists stale until scripts.build_similar_products runs
+        try:
+            similarity_service.update_products(embeddings)
+        except Exception as e:
+            logger.error(f"Failed to update similar products: {str(e)}")
+
+    def _schedule_retry(self, entries: List[Dict[str, Any]], errors: Dict[str, Exception]):
+        """Back off failed entries; those out of attempts move to the failed collection"""
+        metrics.counter("vector_sync.failed_batches").inc()
+        now = datetime.now()
+        requests, exhausted = [], []
+        for entry in entries:
+            attempts = entry["attempts"] + 1
+            error = str(errors[entry["product_id"]])
+            if attempts >= AppConfig.VECTOR_SYNC_MAX_ATTEMPTS:
+                exhausted.append({**entry, "attempts": attempts, "last_error": error, "failed_at": now})
+                continue
+            backoff = min(
+                AppConfig.VECTOR_SYNC_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1),
+                AppConfig.VECTOR_SYNC_BACKOFF_MAX_SECONDS,
+            )
+            requests.append(
+                UpdateOne(
+                    {"_id": entry["_id"]},
+                    {
+                        "$set": {
+                            "attempts": attempts,
+                            "next_attempt_at": now + timedelta(seconds=backoff),
+                            "lease_owner": None,
+                            "lease_until": None,
+                            "last_error": error,
+                        }
+                    },
+                )
+            )
+        if requests:
+            self.outbox.bulk_write(requests, ordered=False)
+
+        if exhausted:
+            # Dead-lettered: out of the due scan until retry_failed() re-queues them
+            for entry in exhausted:
+                entry.pop("lease_owner", None)
+                entry.pop("lease_until", None)
+                entry.pop("next_attempt_at", None)
+            self.failed.insert_many(exhausted)
+            self.outbox.delete_many({"_id": {"$in": [entry["_id"] for entry in exhausted]}})
+            metrics.counter("vector_sync.dead_lettered").inc(len(exhausted))
+            logger.error(
+                f"Vector sync gave up on {len(exhausted)} outbox entries after "
+                f"{AppConfig.VECTOR_SYNC_MAX_ATTEMPTS} attempts: "
+                + ", ".join(sorted({entry["product_id"] for entry in exhausted}))
+            )
+        logger.error(
+            f"Vector sync failed for {len(entries)} outbox entries: "
+            + "; ".join(sorted({str(error) for error in errors.values()}))
+        )
+
+    def retry_failed(self) -> int:
+        """Re-queue every dead-lettered product with fresh attempts"""
+        failed = list(self.failed.find({}, {"_id": 1, "product_id": 1, "kind": 1}))
+        if not failed:
+            return 0
+        kinds: Dict[str, set] = {}
+        for entry in failed:
+            kinds.setdefault(entry.get("kind", "upsert"), set()).add(entry["product_id"])
+        for kind, product_ids in kinds.items():
+            self.enqueue(sorted(product_ids), kind)
+        self.failed.delete_many({"_id": {"$in": [entry["_id"] for entry in failed]}})
+        self._wake.set()
+        return len(failed)
+
+    def normalized_metadata_ready(self) -> bool:
+        """Whether the backfill recorded that every vector has the normalised metadata"""
+        if self._normalized_metadata:
+            return True
+        now = time.monotonic()
+        if now - self._normalized_checked_at >= AppConfig.CATALOG_VERSION_CHECK_INTERVAL:
+            self._normalized_checked_at = now
+            doc = self.meta.find_one({"_id": NORMALIZED_METADATA_FLAG}, {"ready": 1})
+            self._normalized_metadata = bool(doc and doc.get("ready"))
+        return self._normalized_metadata
+
+    def mark_normalized_metadata(self):
+        """Record that every vector has the normalised metadata"""
+        self.meta.update_one(
+            {"_id": NORMALIZED_METADATA_FLAG},
+            {"$set": {"ready": True, "updated_at": datetime.now()}},
+            upsert=True,
+        )
+        self._normalized_metadata = True
+
+    def get_lag(self) -> Dict[str, Any]:
+        """Get outbox backlog size, the age of the oldest pending entry and the dead-letter count"""
+        pending = self.outbox.count_documents({})
+        oldest = self.outbox.find_one({}, {"created_at": 1}, sort=[("created_at", ASCENDING)])
+        lag_seconds = (
+            (datetime.now() - oldest["created_at"]).total_seconds() if oldest else 0.0
+        )
+        failed = self.failed.estimated_document_count()
+        metrics.gauge("vector_sync.pending").set(pending)
+        metrics.gauge("vector_sync.lag_seconds").set(round(lag_seconds, 3))
+        metrics.gauge("vector_sync.failed").set(failed)
+        return {"pending": pending, "lag_seconds": round(lag_seconds, 3), "failed": failed}
+
+    def ensure_worker(self, app):
+        """Start this process's background drain thread if it isn't running"""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+
+            # Threads don't survive fork, so each gunicorn worker starts its own
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, args=(app,), name="vector-sync", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, app):
+        with app.app_context():
+            while True:
+                try:
+                    if self.drain_once():
+                        continue
+                    self.get_lag()
+                except Exception as e:
+                    logger.error(f"Vector sync worker error: {str(e)}")
+
+                self._wake.wait(AppConfig.VECTOR_SYNC_POLL_INTERVAL)
+                self._wake.clear()
+
+
+vector_sync = VectorSyncService(AppConfig.db)
@@ -0,0 +1,77 @@
+import pytest
+
+from services.cart_service import (
+    MAX_BULK_CART_LINES,
+    merge_bulk_lines,
+    validate_bulk_line,
+    validate_bulk_lines,
+)
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        {"product_id": "p1", "quantity": 1},
+        {"product_id": "p1", "quantity": 3, "mode": "add"},
+        {"product_id": "p1", "quantity": 0, "mode": "set"},
+        {"product_id": "p1", "quantity": 7, "mode": "set"},
+    ],
+)
+def test_valid_bulk_line(line):
+    assert validate_bulk_line(line) is None
+
+
+@pytest.mark.parametrize(
+    "line,message",
+    [
+        ("p1", "product_id"),
+        ({"quantity": 1}, "product_id"),
+        ({"product_id": "", "quantity": 1}, "product_id"),
+        ({"product_id": 5, "quantity": 1}, "product_id"),
+        ({"product_id": "p1", "quantity": 1, "mode": "remove"}, "mode must be one of"),
+        ({"product_id": "p1"}, "quantity"),
+        ({"product_id": "p1", "quantity": 0}, "quantity"),
+        ({"product_id": "p1", "quantity": -1, "mode": "set"}, "quantity"),
+        ({"product_id": "p1", "quantity": 1.5}, "quantity"),
+        ({"product_id": "p1", "quantity": "2"}, "quantity"),
+        ({"product_id": "p1", "quantity": True}, "quantity"),
+    ],
+)
+def test_invalid_bulk_line(line, message):
+    assert message in validate_bulk_line(line)
+
+
+def test_validate_bulk_lines_checks_shape_and_size():
+    assert validate_bulk_lines([{"product_id": "p1", "quantity": 1}]) is None
+    assert validate_bulk_lines([]) == "items must be a non-empty list"
+    assert validate_bulk_lines({"product_id": "p1"}) == "items must be a non-empty list"
+    too_many = [{"product_id": f"p{i}", "quantity": 1} for i in range(MAX_BULK_CART_LINES + 1)]
+    assert validate_bulk_lines(too_many) == f"At most {MAX_BULK_CART_LINES} items per request"
+
+
+def test_validate_bulk_lines_reports_first_bad_line():
+    lines = [{"product_id": "p1", "quantity": 1}, {"product_id": "p2", "quantity": 0}, "bad"]
+    assert "quantity" in validate_bulk_lines(lines)
+
+
+def test_merge_accumulates_adds_per_product():
+    lines = [
+        {"product_id": "p1", "quantity": 1},
+        {"product_id": "p2", "quantity": 2},
+        {"product_id": "p1", "quantity": 3, "mode": "add"},
+    ]
+    assert merge_bulk_lines(lines) == {"p1": ("add", 4), "p2": ("add", 2)}
+
+
+def test_merge_set_replaces_earlier_lines_and_later_adds_build_on_it():
+    lines = [
+        {"product_id": "p1", "quantity": 5},
+        {"product_id": "p1", "quantity": 2, "mode": "set"},
+        {"product_id": "p1", "quantity": 1},
+    ]
+    assert merge_bulk_lines(lines) == {"p1": ("set", 3)}
+
+
+def test_merge_set_to_zero_after_adds_removes():
+    lines = [{"product_id": "p1", "quantity": 5}, {"product_id": "p1", "quantity": 0, "mode": "set"}]
+    assert merge_bulk_lines(lines) == {"p1": ("set", 0)}
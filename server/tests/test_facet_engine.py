@@ -0,0 +1,123 @@
+import random
+
+import numpy as np
+import pytest
+
+from models.product import Product
+from services.catalog_snapshot import CatalogSnapshot
+from services.facet_engine import PRICE_BANDS, RATING_THRESHOLDS, FacetEngine
+
+CATEGORIES = ["Electronics", "Clothing", "Home"]
+SUBCATEGORIES = ["Audio", "Shoes", "Kitchen", "Laptops"]
+BRANDS = ["Acme", "Globex", "Initech", "Umbrella", "Acme Pro"]
+
+
+def make_product(i, rng):
+    return Product(
+        id=f"p{i:03d}",
+        name=f"Product {i}",
+        description="test product",
+        price=rng.choice([10, 49.99, 50, 99, 100, 250, 600, 1500, 2000, 3500]),
+        category=rng.choice(CATEGORIES),
+        subcategory=rng.choice(SUBCATEGORIES),
+        brand=rng.choice(BRANDS),
+        rating=rng.choice([0.0, 1.0, 2.5, 3.0, 4.0, 4.4, 4.5, 5.0]),
+        stock=rng.choice([0, 0, 3, 10]),
+    )
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    rng = random.Random(7)
+    # 203 rows so the packed bitmaps end in a partial byte
+    return CatalogSnapshot([make_product(i, rng) for i in range(203)], version=1)
+
+
+def matches(product, filters, skip=None):
+    """Reference filter: every selected filter except the facet being counted"""
+    for field in ("category", "subcategory", "brand"):
+        if field != skip and filters.get(field) and getattr(product, field).lower() != filters[field].lower():
+            return False
+    if skip != "price":
+        if filters.get("min_price") is not None and product.price < filters["min_price"]:
+            return False
+        if filters.get("max_price") is not None and product.price > filters["max_price"]:
+            return False
+    if skip != "rating" and filters.get("min_rating") is not None and product.rating < filters["min_rating"]:
+        return False
+    if skip != "inStock" and filters.get("in_stock_only") and product.stock <= 0:
+        return False
+    return True
+
+
+def expected_facets(products, filters):
+    facets = {}
+    for field in ("category", "subcategory", "brand"):
+        counts = {}
+        for product in products:
+            counts.setdefault(getattr(product, field), 0)
+            if matches(product, filters, skip=field):
+                counts[getattr(product, field)] += 1
+        facets[field] = sorted(
+            ({"value": value, "count": count} for value, count in counts.items()),
+            key=lambda item: (-item["count"], item["value"]),
+        )
+    pool = [product for product in products if matches(product, filters, skip="price")]
+    facets["price"] = [
+        {
+            "value": label,
+            "min": low,
+            "max": high,
+            "count": sum(1 for p in pool if p.price >= low and (high is None or p.price < high)),
+        }
+        for label, low, high in PRICE_BANDS
+    ]
+    pool = [product for product in products if matches(product, filters, skip="rating")]
+    facets["rating"] = [
+        {"value": f"{threshold:g}+", "min": threshold, "count": sum(1 for p in pool if p.rating >= threshold)}
+        for threshold in RATING_THRESHOLDS
+    ]
+    facets["inStock"] = {
+        "count": sum(1 for p in products if matches(p, filters, skip="inStock") and p.stock > 0)
+    }
+    return facets
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"category": "electronics"},
+        {"category": "Electronics", "brand": "Acme"},
+        {"brand": "Globex", "min_price": 50, "max_price": 1500},
+        {"subcategory": "Audio", "min_rating": 4.0, "in_stock_only": True},
+        {"category": "Home", "subcategory": "Shoes", "brand": "Initech", "min_price": 100, "min_rating": 3.0, "in_stock_only": True},
+    ],
+)
+def test_facet_counts_are_disjunctive(snapshot, filters):
+    mask, facets = FacetEngine(snapshot).search(**filters)
+
+    assert facets == expected_facets(snapshot.products, filters)
+    assert mask.tolist() == [matches(product, filters) for product in snapshot.products]
+    assert np.array_equal(mask, snapshot.filter_mask(**filters))
+
+
+def test_selected_facet_still_counts_its_other_values(snapshot):
+    _, facets = FacetEngine(snapshot).search(category="Clothing")
+    counts = {item["value"]: item["count"] for item in facets["category"]}
+    assert set(counts) == set(CATEGORIES)
+    assert all(count > 0 for count in counts.values())
+
+
+@pytest.mark.parametrize("match", ["prefix", "contains"])
+def test_partial_value_matches_select_several_values(snapshot, match):
+    mask, facets = FacetEngine(snapshot).search(brand="acme", match=match)
+    assert mask.tolist() == [p.brand in ("Acme", "Acme Pro") for p in snapshot.products]
+    assert sum(item["count"] for item in facets["category"]) == mask.sum()
+
+
+def test_unknown_value_matches_nothing(snapshot):
+    mask, facets = FacetEngine(snapshot).search(brand="Nonexistent")
+    assert not mask.any()
+    assert facets["inStock"]["count"] == 0
+    assert sum(item["count"] for item in facets["brand"]) == len(snapshot)
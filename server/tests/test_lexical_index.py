@@ -0,0 +1,74 @@
+import math
+
+import pytest
+
+from services.lexical_index import BM25Index, tokenize
+
+
+def test_tokenize_lowercases_and_splits_on_punctuation():
+    assert tokenize("Noise-Cancelling, Wireless!") == ["noise", "cancelling", "noisecancelling", "wireless"]
+
+
+def test_tokenize_compound_model_numbers_yield_parts_and_joined_form():
+    assert tokenize("Sony WH-1000XM5") == ["sony", "wh", "1000xm5", "wh1000xm5"]
+    assert tokenize("M2.Pro") == ["m2", "pro", "m2pro"]
+
+
+def test_tokenize_empty_text():
+    assert tokenize("") == []
+    assert tokenize("--- !!") == []
+
+
+def make_index():
+    index = BM25Index()
+    index.add("a", "red running shoes")
+    index.add("b", "blue running shorts")
+    index.add("c", "red red red hat")
+    return index
+
+
+def test_search_scores_match_okapi_bm25():
+    index = make_index()
+    doc_count, avg_length = 3, 10 / 3
+
+    def score(tf, length, df):
+        idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+        norm = index.k1 * (1 - index.b + index.b * length / avg_length)
+        return idf * tf * (index.k1 + 1) / (tf + norm)
+
+    results = dict(index.search("red"))
+    assert results.keys() == {"a", "c"}
+    assert results["a"] == pytest.approx(score(1, 3, 2))
+    assert results["c"] == pytest.approx(score(3, 4, 2))
+
+
+def test_search_ranks_rarer_and_repeated_terms_higher():
+    index = make_index()
+    assert [doc_id for doc_id, _ in index.search("red shoes")] == ["a", "c"]
+    assert index.search("red")[0][0] == "c"
+
+
+def test_search_limit_and_no_match():
+    index = make_index()
+    assert len(index.search("red running", limit=2)) == 2
+    assert index.search("sandals") == []
+    assert index.search("") == []
+    assert BM25Index().search("red") == []
+
+
+def test_add_replaces_previous_version_of_a_document():
+    index = make_index()
+    index.add("a", "green sandals")
+    assert len(index) == 3
+    assert [doc_id for doc_id, _ in index.search("red")] == ["c"]
+    assert index.search("sandals")[0][0] == "a"
+
+
+def test_remove_drops_postings_and_lengths():
+    index = make_index()
+    index.remove("c")
+    index.remove("missing")
+    assert index.doc_ids() == {"a", "b"}
+    assert [doc_id for doc_id, _ in index.search("red")] == ["a"]
+    assert "hat" not in index._postings
+    assert index._total_length == 6
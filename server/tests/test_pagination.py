@@ -0,0 +1,135 @@
+import base64
+import json
+import random
+from datetime import datetime
+
+import pytest
+
+from models.product import Product
+from services.catalog_snapshot import CatalogSnapshot
+from utils.pagination import (
+    MAX_PAGE_SIZE,
+    SORT_OPTIONS,
+    check_page_size,
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+)
+
+
+@pytest.mark.parametrize("sort,key", [("rating", 4.5), ("price_asc", 19), ("price_desc", 0.0)])
+def test_cursor_round_trip(sort, key):
+    token = encode_cursor(sort, key, "p42")
+    assert "=" not in token
+    assert decode_cursor(token, sort) == (key, "p42")
+
+
+def test_cursor_round_trip_datetime_key():
+    created_at = datetime(2024, 5, 17, 8, 30, 15, 123456)
+    token = encode_cursor("newest", created_at, "p1")
+    assert decode_cursor(token, "newest") == (created_at, "p1")
+
+
+def test_missing_cursor_decodes_to_none():
+    assert decode_cursor(None, "rating") is None
+    assert decode_cursor("", "rating") is None
+
+
+def _token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "sort,token",
+    [
+        ("rating", "not a cursor"),
+        ("rating", _token(["list"])),
+        ("rating", _token({"s": "rating", "k": 4.5})),
+        ("rating", _token({"s": "rating", "k": "4.5", "id": "p1"})),
+        ("newest", _token({"s": "newest", "k": "yesterday", "id": "p1"})),
+    ],
+)
+def test_invalid_cursor_raises_value_error(sort, token):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(token, sort)
+
+
+def test_cursor_for_another_sort_is_rejected():
+    token = encode_cursor("price_asc", 10.0, "p1")
+    with pytest.raises(ValueError, match="different sort"):
+        decode_cursor(token, "price_desc")
+
+
+@pytest.mark.parametrize("limit", [1, 50, MAX_PAGE_SIZE])
+def test_check_page_size_accepts_bounds(limit):
+    check_page_size(limit)
+
+
+@pytest.mark.parametrize("limit", [0, -1, MAX_PAGE_SIZE + 1, "10", 10.0, True, None])
+def test_check_page_size_rejects(limit):
+    with pytest.raises(ValueError, match="limit must be between"):
+        check_page_size(limit)
+
+
+def test_keyset_filter_ascending_and_descending():
+    assert keyset_filter("price_asc", (9.5, "p3")) == {
+        "$or": [{"price": {"$gt": 9.5}}, {"price": 9.5, "id": {"$gt": "p3"}}]
+    }
+    assert keyset_filter("rating", (4.0, "p3")) == {
+        "$or": [{"rating": {"$lt": 4.0}}, {"rating": 4.0, "id": {"$lt": "p3"}}]
+    }
+
+
+def _passes_keyset(product, sort, after):
+    """Evaluate the keyset filter the way Mongo would for one product"""
+    (greater_clause, tie_clause) = keyset_filter(sort, after)["$or"]
+    field = SORT_OPTIONS[sort][0]
+    (op, key), = greater_clause[field].items()
+    (_, product_id), = tie_clause["id"].items()
+    value = getattr(product, field)
+    if op == "$gt":
+        return value > key or (value == key and product.id > product_id)
+    return value < key or (value == key and product.id < product_id)
+
+
+@pytest.fixture(scope="module")
+def products():
+    rng = random.Random(3)
+    # Few distinct sort keys, so pages split inside runs of ties
+    return [
+        Product(
+            id=f"p{i:02d}",
+            name=f"Product {i}",
+            description="test product",
+            price=rng.choice([5, 10, 20]),
+            category="Books",
+            subcategory="Fiction",
+            brand="Acme",
+            rating=rng.choice([3.0, 4.0, 5.0]),
+            created_at=datetime(2024, 1, 1 + rng.randrange(3)),
+        )
+        for i in range(37)
+    ]
+
+
+@pytest.mark.parametrize("sort", list(SORT_OPTIONS))
+def test_paging_by_keyset_visits_every_row_once_in_order(products, sort):
+    field, direction = SORT_OPTIONS[sort]
+    expected = sorted(products, key=lambda p: (getattr(p, field), p.id), reverse=direction == -1)
+    snapshot = CatalogSnapshot(products, version=1)
+    mask = snapshot.filter_mask()
+
+    seen, after = [], None
+    while True:
+        page = snapshot.select(mask, limit=5, sort=sort, after=after)
+        if after is not None:
+            # The snapshot seek and the Mongo keyset filter agree on what comes next
+            assert page == [p for p in expected if _passes_keyset(p, sort, after)][:5]
+        if not page:
+            break
+        seen.extend(page)
+        last = page[-1]
+        token = encode_cursor(sort, getattr(last, field), last.id)
+        after = decode_cursor(token, sort)
+
+    assert [p.id for p in seen] == [p.id for p in expected]
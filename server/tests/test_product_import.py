@@ -0,0 +1,107 @@
+import io
+
+import pytest
+
+from services import product_import
+from services.product_import import ProductImportService, iter_csv_rows, iter_ndjson_rows
+
+PRODUCT = '{"id": "%s", "name": "%s", "description": "d", "price": 10, "category": "c", "subcategory": "s", "brand": "b"}'
+
+
+def test_ndjson_rows_skip_blank_lines_and_keep_line_numbers():
+    lines = [PRODUCT % ("p1", "One") + "\n", "\n", "   \n", PRODUCT % ("p2", "Two")]
+    rows = list(iter_ndjson_rows(lines))
+    assert [(number, row["id"], error) for number, row, error in rows] == [(1, "p1", None), (4, "p2", None)]
+
+
+def test_ndjson_rows_report_bad_lines_without_stopping():
+    rows = list(iter_ndjson_rows(['{"id": ', "[1, 2]", PRODUCT % ("p3", "Three")]))
+    assert rows[0][:2] == (1, None) and rows[0][2].startswith("invalid JSON")
+    assert rows[1] == (2, None, "row must be a JSON object")
+    assert rows[2][1]["id"] == "p3"
+
+
+def test_csv_rows_drop_empty_cells_and_split_list_fields():
+    lines = io.StringIO(
+        "id,name,price,features,image_url\n"
+        'p1,One,10,"wireless | bluetooth||",\n'
+        'p2,Two,20,"[""a"", ""b|c""]",http://x/img.png\n'
+    )
+    rows = list(iter_csv_rows(lines))
+    assert rows == [
+        (2, {"id": "p1", "name": "One", "price": "10", "features": ["wireless", "bluetooth"]}, None),
+        (3, {"id": "p2", "name": "Two", "price": "20", "features": ["a", "b|c"], "image_url": "http://x/img.png"}, None),
+    ]
+
+
+def test_csv_line_numbers_count_quoted_newlines():
+    lines = io.StringIO('id,description\np1,"two\nlines"\np2,plain\n')
+    assert [number for number, _, _ in iter_csv_rows(lines)] == [3, 4]
+
+
+def test_csv_rows_report_extra_cells_and_bad_json_lists():
+    lines = io.StringIO('id,features\np1,a,extra\np2,"[oops"\np3,ok\n')
+    rows = list(iter_csv_rows(lines))
+    assert rows[0] == (2, None, "row has more cells than the header")
+    assert rows[1][:2] == (3, None) and rows[1][2].startswith("invalid JSON list")
+    assert rows[2] == (4, {"id": "p3", "features": ["ok"]}, None)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Import service whose Mongo writes and outbox calls are recorded in memory"""
+    service = ProductImportService()
+    service.written_chunks = []
+
+    def write_docs(docs, mode):
+        service.written_chunks.append([doc["id"] for doc in docs])
+        return {}
+
+    monkeypatch.setattr(service, "_write_docs", write_docs)
+    monkeypatch.setattr(product_import.vector_sync, "prepare", lambda ids: [])
+    monkeypatch.setattr(product_import.vector_sync, "release", lambda entry_ids: None)
+    monkeypatch.setattr(product_import.catalog_version, "bump", lambda: None)
+    return service
+
+
+def ndjson(*ids):
+    return [PRODUCT % (product_id, f"Row {number}") for number, product_id in enumerate(ids, start=1)]
+
+
+def test_later_rows_supersede_earlier_ones_in_the_same_chunk(service):
+    summary = service.import_rows(iter_ndjson_rows(ndjson("a", "b", "a", "a")), chunk_size=10, embed=False)
+
+    assert service.written_chunks == [["a", "b"]]
+    assert summary["rows"] == 4
+    assert summary["written"] == 2
+    assert summary["superseded"] == 2
+    assert summary["superseded_rows"] == [{"row": 1, "by": 3, "id": "a"}, {"row": 3, "by": 4, "id": "a"}]
+    assert summary["failed"] == 0
+    assert summary["embedding_deferred"] == 2
+
+
+def test_duplicates_in_different_chunks_are_both_written(service):
+    summary = service.import_rows(iter_ndjson_rows(ndjson("a", "b", "a")), chunk_size=2, embed=False)
+
+    assert service.written_chunks == [["a", "b"], ["a"]]
+    assert summary["written"] == 3
+    assert summary["superseded"] == 0
+
+
+def test_invalid_rows_are_counted_and_reported(service):
+    lines = ndjson("a") + ['{"id": "b", "name": "No price"}', "not json"]
+    summary = service.import_rows(iter_ndjson_rows(lines), embed=False)
+
+    assert summary["rows"] == 3
+    assert summary["written"] == 1
+    assert summary["failed"] == 2
+    assert [error["row"] for error in summary["errors"]] == [2, 3]
+    assert "price" in summary["errors"][0]["error"]
+
+
+def test_reported_superseded_rows_are_capped(service, monkeypatch):
+    monkeypatch.setattr(product_import, "MAX_REPORTED_ERRORS", 2)
+    summary = service.import_rows(iter_ndjson_rows(ndjson(*["a"] * 5)), chunk_size=10, embed=False)
+
+    assert summary["superseded"] == 4
+    assert len(summary["superseded_rows"]) == 2
@@ -0,0 +1,30 @@
+import pytest
+
+from services.product_service import RRF_K, ProductService
+
+
+def test_fuse_rankings_sums_reciprocal_ranks():
+    scores = ProductService._fuse_rankings([["a", "b", "c"], ["b", "d"]])
+    assert scores == pytest.approx(
+        {
+            "a": 1 / (RRF_K + 1),
+            "b": 1 / (RRF_K + 2) + 1 / (RRF_K + 1),
+            "c": 1 / (RRF_K + 3),
+            "d": 1 / (RRF_K + 2),
+        }
+    )
+
+
+def test_fuse_rankings_prefers_ids_found_by_both_retrievers():
+    scores = ProductService._fuse_rankings([["a", "b"], ["c", "b"]])
+    assert max(scores, key=scores.get) == "b"
+
+
+def test_fuse_rankings_reranks_after_dropping_disallowed_ids():
+    scores = ProductService._fuse_rankings([["x", "a", "b"], ["b"]], allowed_ids={"a", "b"})
+    assert scores == pytest.approx({"a": 1 / (RRF_K + 1), "b": 1 / (RRF_K + 2) + 1 / (RRF_K + 1)})
+
+
+def test_fuse_rankings_empty():
+    assert ProductService._fuse_rankings([]) == {}
+    assert ProductService._fuse_rankings([[], []]) == {}
@@ -0,0 +1,94 @@
+import pytest
+
+from utils import ttl_cache
+from utils.metrics import metrics
+from utils.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ttl_cache, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache("test_expiry", maxsize=10, ttl=30)
+    cache.set("a", 1)
+    clock.now += 29.9
+    assert cache.get("a") == 1
+    clock.now += 0.1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl_overrides_default(clock):
+    cache = TTLCache("test_entry_ttl", maxsize=10, ttl=30)
+    cache.set("short", 1, ttl=5)
+    cache.set("long", 2)
+    clock.now += 10
+    assert cache.get("short", "missing") == "missing"
+    assert cache.get("long") == 2
+
+
+def test_set_refreshes_expiry(clock):
+    cache = TTLCache("test_refresh", maxsize=10, ttl=30)
+    cache.set("a", 1)
+    clock.now += 20
+    cache.set("a", 2)
+    clock.now += 20
+    assert cache.get("a") == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache("test_lru", maxsize=2, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_falsy_values_are_cached(clock):
+    cache = TTLCache("test_falsy", maxsize=10, ttl=30)
+    cache.set("none", None)
+    cache.set("zero", 0)
+    assert cache.get("none", "missing") is None
+    assert cache.get("zero", "missing") == 0
+
+
+def test_invalidate_and_clear(clock):
+    cache = TTLCache("test_invalidate", maxsize=10, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_hits_and_misses_are_counted(clock):
+    cache = TTLCache("test_metrics", maxsize=10, ttl=30)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    clock.now += 60
+    cache.get("a")
+
+    snapshot = metrics.snapshot()
+    assert snapshot["cache.test_metrics.hits"] == 2
+    assert snapshot["cache.test_metrics.misses"] == 2
+    assert snapshot["cache.test_metrics.hit_rate"] == pytest.approx(0.5)
@@ -1,4 +1,11 @@
-from .database_seeder import DatabaseSeeder
 from .logger_config import setup_logging
 
-__all__ = ['DatabaseSeeder', 'setup_logging']
\ No newline at end of file
+__all__ = ['DatabaseSeeder', 'setup_logging']
+
+
+def __getattr__(name):
+    # The seeder imports services, which import utils helpers; load it on first use
+    if name == 'DatabaseSeeder':
+        from .database_seeder import DatabaseSeeder
+        return DatabaseSeeder
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,7 +4,9 @@ from datetime import datetime
 from werkzeug.security import generate_password_hash
 
 from models.product import Product
+from services.catalog_version import catalog_version
 from services.product_service import ProductService
+from services.vector_sync import vector_sync
 from config import Config as AppConfig  # Import MongoDB db
 
 logger = logging.getLogger(__name__)
@@ -34,29 +36,11 @@ class DatabaseSeeder:
                     product = Product(**product_data)
 
                     # Insert into MongoDB
-                    self.products_collection.insert_one(product.dict())
+                    document = product.to_document()
+                    self.products_collection.insert_one(document)
 
-                    # Compute search text and metadata
-                    search_text = product.get_search_text()
-                    metadata = {
-                        "category": product.category,
-                        "subcategory": product.subcategory,
-                        "brand": product.brand,
-                        "price": product.price,
-                        "rating": product.rating,
-                        "in_stock": product.is_in_stock(),
-                    }
-
-                    # Upsert embedding
-                    self.product_service.vector_service.upsert_product_embedding(
-                        product.id, search_text, metadata
-                    )
-
-                    # Set embedding_id
-                    self.products_collection.update_one(
-                        {"id": product.id},
-                        {"$set": {"embedding_id": product.id}}
-                    )
+                    # Upsert embedding and record it on the product
+                    vector_sync.upsert_vectors([document])
 
                 except Exception as e:
                     logger.error(
@@ -64,6 +48,7 @@ class DatabaseSeeder:
                     )
                     continue
 
+            catalog_version.bump()
             logger.info("Products seeded successfully")
 
         except Exception as e:
@@ -0,0 +1,374 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from config import Config as AppConfig
+
+logger = logging.getLogger(__name__)
+
+# Declarative index registry: every index the services rely on, per collection.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Keyset pagination: one (is_active, sort key, id) index per listing sort;
+        # the price index serves both directions
+        IndexModel(
+            [("is_active", ASCENDING), ("rating", DESCENDING), ("id", DESCENDING)],
+            name="active_rating_id",
+        ),
+        IndexModel(
+            [("is_active", ASCENDING), ("price", ASCENDING), ("id", ASCENDING)],
+            name="active_price_id",
+        ),
+        IndexModel(
+            [("is_active", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="active_created_at_id",
+        ),
+        IndexModel(
+            [
+                ("is_active", ASCENDING),
+                ("category_norm", ASCENDING),
+                ("subcategory_norm", ASCENDING),
+            ],
+            name="active_category_norm",
+        ),
+        IndexModel(
+            [("is_active", ASCENDING), ("subcategory_norm", ASCENDING)],
+            name="active_subcategory_norm",
+        ),
+        IndexModel(
+            [("is_active", ASCENDING), ("brand_norm", ASCENDING)], name="active_brand_norm"
+        ),
+        # Popular products, sorted by the like counter LikeService maintains
+        IndexModel(
+            [("is_active", ASCENDING), ("like_count", DESCENDING), ("id", DESCENDING)],
+            name="active_like_count_id",
+        ),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        # Embeddings written since a similarity matrix's watermark
+        IndexModel([("embedded_at", ASCENDING)], name="embedded_at"),
+        IndexModel([("name", ASCENDING)], name="name"),
+        # Full-text fallback for search when vector/lexical retrieval is empty
+        IndexModel(
+            [
+                ("name", TEXT),
+                ("brand", TEXT),
+                ("features", TEXT),
+                ("description", TEXT),
+            ],
+            name="product_text",
+            weights={"name": 10, "brand": 5, "features": 3, "description": 1},
+            default_language="english",
+        ),
+    ],
+    "messages": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("chat_session_id", ASCENDING), ("created_at", ASCENDING)],
+            name="session_created_at",
+        ),
+    ],
+    "browse_sessions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Anonymous browse sessions expire after their last event
+        IndexModel(
+            [("updated_at", ASCENDING)],
+            name="updated_at_ttl",
+            expireAfterSeconds=AppConfig.BROWSE_SESSION_TTL,
+        ),
+    ],
+    "chat_sessions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("user_id", ASCENDING), ("updated_at", DESCENDING)], name="user_updated_at"
+        ),
+    ],
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "carts": [
+        # One cart document per user, lines in an items map keyed by product id
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "likes": [
+        IndexModel(
+            [("user_id", ASCENDING), ("product_id", ASCENDING)],
+            name="user_product_unique",
+            unique=True,
+        ),
+    ],
+    "vector_outbox": [
+        IndexModel(
+            [("next_attempt_at", ASCENDING), ("created_at", ASCENDING)], name="due"
+        ),
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+        IndexModel([("lease_owner", ASCENDING)], name="lease_owner"),
+    ],
+    # Dead-lettered outbox entries, kept for inspection and retry_failed()
+    "vector_outbox_failed": [
+        IndexModel([("failed_at", ASCENDING)], name="failed_at"),
+    ],
+    "product_neighbors": [
+        IndexModel([("product_id", ASCENDING)], name="product_id_unique", unique=True),
+        IndexModel([("neighbors.id", ASCENDING)], name="neighbors_id"),
+        # Lists a new embedding can enter: short ones, or those it beats the last entry of
+        IndexModel([("size", ASCENDING)], name="size"),
+        IndexModel([("last_score", ASCENDING)], name="last_score"),
+    ],
+    "user_taste": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+}
+
+# Representative queries issued by each service, checked by the audit command.
+AUDIT_QUERIES: List[Dict[str, Any]] = [
+    {
+        "source": "ProductService / product routes: get by id",
+        "collection": "products",
+        "filter": {"id": "audit-product-id"},
+    },
+    {
+        "source": "ProductService.search_by_filters: active products by rating",
+        "collection": "products",
+        "filter": {"is_active": True},
+        "sort": [("rating", DESCENDING)],
+        "limit": 50,
+    },
+    {
+        "source": "ProductService.list_products: price ascending, next page",
+        "collection": "products",
+        "filter": {
+            "is_active": True,
+            "$or": [
+                {"price": {"$gt": 99.0}},
+                {"price": 99.0, "id": {"$gt": "audit-product-id"}},
+            ],
+        },
+        "sort": [("price", ASCENDING), ("id", ASCENDING)],
+        "limit": 51,
+    },
+    {
+        "source": "ProductService.list_products: newest first",
+        "collection": "products",
+        "filter": {"is_active": True},
+        "sort": [("created_at", DESCENDING), ("id", DESCENDING)],
+        "limit": 51,
+    },
+    {
+        "source": "ProductService.search_by_filters: exact category filter",
+        "collection": "products",
+        "filter": {"is_active": True, "category_norm": "electronics"},
+        "sort": [("rating", DESCENDING)],
+        "limit": 50,
+    },
+    {
+        "source": "ProductService.search_by_filters: brand prefix filter",
+        "collection": "products",
+        "filter": {"is_active": True, "brand_norm": {"$regex": "^app"}},
+        "sort": [("rating", DESCENDING)],
+        "limit": 50,
+    },
+    {
+        "source": "ProductService.search_products: vector hit hydration",
+        "collection": "products",
+        "filter": {"is_active": True, "id": {"$in": ["audit-a", "audit-b"]}},
+    },
+    {
+        "source": "ProductService.search_by_text: full-text fallback",
+        "collection": "products",
+        "filter": {"is_active": True, "$text": {"$search": "wireless headphones"}},
+    },
+    {
+        "source": "CatalogSnapshotStore: incremental refresh",
+        "collection": "products",
+        "filter": {"updated_at": {"$gte": datetime(2024, 1, 1)}},
+    },
+    {
+        "source": "ChatService.process_message: products named in the reply",
+        "collection": "products",
+        "filter": {"name": {"$in": ["audit-name"]}},
+    },
+    {
+        # Unanchored case-insensitive match; reported as a collection scan
+        "source": "ChatService._resolve_product_refs: products by id or partial name",
+        "collection": "products",
+        "filter": {
+            "$or": [
+                {"id": {"$in": ["audit-product-id"]}},
+                {"name": {"$regex": "audit\\ name", "$options": "i"}},
+            ]
+        },
+    },
+    {
+        "source": "ChatService.get_chat_history",
+        "collection": "messages",
+        "filter": {"chat_session_id": "audit-session-id"},
+        "sort": [("created_at", ASCENDING)],
+        "limit": 50,
+    },
+    {
+        "source": "SessionInterestService: browse session lookup",
+        "collection": "browse_sessions",
+        "filter": {"id": "browse_audit-session-id"},
+    },
+    {
+        "source": "ChatService.process_message: session lookup",
+        "collection": "chat_sessions",
+        "filter": {"id": "audit-session-id"},
+    },
+    {
+        "source": "Chat routes: user's sessions",
+        "collection": "chat_sessions",
+        "filter": {"user_id": "audit-user-id"},
+        "sort": [("updated_at", DESCENDING)],
+    },
+    {
+        "source": "AuthService: user by id",
+        "collection": "users",
+        "filter": {"id": "audit-user-id"},
+    },
+    {
+        "source": "AuthService: user by email",
+        "collection": "users",
+        "filter": {"email": "audit@example.com"},
+    },
+    {
+        "source": "CartService: user's cart",
+        "collection": "carts",
+        "filter": {"user_id": "audit-user-id"},
+    },
+    {
+        "source": "LikeService: like status",
+        "collection": "likes",
+        "filter": {"user_id": "audit-user-id", "product_id": "audit-product-id"},
+    },
+    {
+        "source": "LikeService: user's likes",
+        "collection": "likes",
+        "filter": {"user_id": "audit-user-id", "liked": True},
+    },
+    {
+        "source": "LikeService: liked status for a product grid",
+        "collection": "likes",
+        "filter": {
+            "user_id": "audit-user-id",
+            "product_id": {"$in": ["audit-product-id"]},
+            "liked": True,
+        },
+    },
+    {
+        "source": "LikeService: popular products",
+        "collection": "products",
+        "filter": {"is_active": True, "like_count": {"$gt": 0}},
+        "sort": [("like_count", DESCENDING), ("id", DESCENDING)],
+        "limit": 10,
+    },
+    {
+        "source": "VectorSyncService: due outbox entries",
+        "collection": "vector_outbox",
+        "filter": {"next_attempt_at": {"$lte": datetime(2024, 1, 1)}},
+        "sort": [("created_at", ASCENDING)],
+        "limit": 100,
+    },
+    {
+        "source": "VectorSyncService: leased entries",
+        "collection": "vector_outbox",
+        "filter": {"lease_owner": "audit-lease-owner"},
+    },
+    {
+        "source": "ProductService.get_recommendations: precomputed neighbours",
+        "collection": "product_neighbors",
+        "filter": {"product_id": "audit-product-id"},
+    },
+    {
+        "source": "SimilarityService.update_products: lists a batch can enter",
+        "collection": "product_neighbors",
+        "filter": {
+            "$or": [
+                {"size": {"$lt": 20}},
+                {"last_score": None},
+                {"product_id": {"$in": ["audit-product-id"]}, "last_score": {"$lt": 0.9}},
+            ]
+        },
+    },
+    {
+        "source": "SimilarityService: embedding matrix refresh",
+        "collection": "products",
+        "filter": {"embedded_at": {"$gte": datetime(2024, 1, 1)}},
+    },
+    {
+        "source": "SimilarityService.remove_products: reverse neighbours",
+        "collection": "product_neighbors",
+        "filter": {"neighbors.id": {"$in": ["audit-product-id"]}},
+    },
+]
+
+
+def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every registered index; existing identical indexes are left as they are"""
+    created = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        created[collection_name] = []
+        for index in indexes:
+            try:
+                created[collection_name].extend(collection.create_indexes([index]))
+            except OperationFailure as e:
+                logger.warning(
+                    f"Could not create index {index.document['name']} "
+                    f"on {collection_name}: {str(e)}"
+                )
+    logger.info(
+        "Ensured indexes: "
+        + ", ".join(f"{name}={len(names)}" for name, names in created.items())
+    )
+    return created
+
+
+def _plan_stages(plan: Any) -> List[str]:
+    """Collect every stage name in an explain plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+def audit_queries(db) -> List[Dict[str, Any]]:
+    """Explain each registered service query and flag collection scans"""
+    report = []
+    for query in AUDIT_QUERIES:
+        command = {"find": query["collection"], "filter": query["filter"]}
+        if query.get("sort"):
+            command["sort"] = dict(query["sort"])
+        if query.get("limit"):
+            command["limit"] = query["limit"]
+
+        try:
+            explain = db.command("explain", command, verbosity="queryPlanner")
+            stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+            error = None
+        except OperationFailure as e:
+            stages = []
+            error = str(e)
+
+        report.append(
+            {
+                "source": query["source"],
+                "collection": query["collection"],
+                "stages": stages,
+                "collection_scan": "COLLSCAN" in stages,
+                "in_memory_sort": "SORT" in stages,
+                "error": error,
+            }
+        )
+    return report
@@ -0,0 +1,32 @@
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+from flask import current_app, jsonify, request
+
+from services.catalog_version import catalog_version
+
+# key -> (catalog version, serialised body, strong ETag)
+_responses: Dict[str, Tuple[int, bytes, str]] = {}
+_lock = threading.Lock()
+
+
+def catalog_cached_response(key: str, build: Callable[[], Dict[str, Any]]):
+    """Serve a JSON response derived from the catalog, built once per catalog version.
+
+    The response carries a strong ETag and Cache-Control headers, and becomes
+    a 304 when the client's If-None-Match already holds the current ETag.
+    """
+    version = catalog_version.current()
+    entry = _responses.get(key)
+    if entry is None or entry[0] != version:
+        body = jsonify(build()).get_data()
+        entry = (version, body, hashlib.sha256(body).hexdigest()[:32])
+        with _lock:
+            _responses[key] = entry
+
+    response = current_app.response_class(entry[1], mimetype="application/json")
+    response.set_etag(entry[2])
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["CATALOG_CACHE_MAX_AGE"]
+    return response.make_conditional(request)
@@ -0,0 +1,68 @@
+import re
+from typing import Any
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+
+def _escape_char(match: re.Match) -> str:
+    code = ord(match.group())
+    if code > 0xFFFF:
+        # Characters outside the BMP become a UTF-16 surrogate pair, like json.dumps
+        code -= 0x10000
+        return "\\u{0:04x}\\u{1:04x}".format(0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+    return "\\u{0:04x}".format(code)
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson.
+
+    Output follows the default provider: sorted keys, compact separators
+    (indent 2 in debug), non-ASCII escaped, datetimes as HTTP dates. UUIDs and
+    NumPy arrays/scalars are encoded natively; anything else goes through the
+    default provider's hook. It is not byte for byte identical for floats:
+    exponents are not zero padded (1.5e-7, not 1.5e-07) and NaN/Infinity are
+    encoded as null rather than the non-standard NaN/Infinity tokens.
+    Integers beyond 64 bits, which orjson rejects, fall back to the stdlib
+    encoder for the whole document.
+    """
+
+    def _encode(self, obj: Any, indent: bool = False) -> bytes:
+        option = (
+            orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_SERIALIZE_NUMPY
+            | orjson.OPT_NON_STR_KEYS
+        )
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+
+        try:
+            data = orjson.dumps(obj, default=self.default, option=option)
+        except orjson.JSONEncodeError as e:
+            if "Integer exceeds 64-bit range" not in str(e):
+                raise
+            separators = None if indent else (",", ":")
+            return super().dumps(obj, indent=2 if indent else None, separators=separators).encode()
+        if self.ensure_ascii and not data.isascii():
+            data = NON_ASCII.sub(_escape_char, data.decode()).encode()
+        return data
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize data as JSON; options orjson can't reproduce use the stdlib encoder"""
+        indent = kwargs.get("indent")
+        compact = indent is None and kwargs.get("separators") == (",", ":")
+        if set(kwargs) - {"indent", "separators"} or not (compact or indent == 2):
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj, indent=indent == 2).decode()
+
+    def response(self, *args: Any, **kwargs: Any):
+        """Serialize the arguments as a JSON response without a str round trip"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(
+            self._encode(obj, indent=indent) + b"\n", mimetype=self.mimetype
+        )
@@ -0,0 +1,110 @@
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, Sequence
+
+
+class Counter:
+    """Monotonically increasing counter"""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """Value that can go up and down"""
+
+    def __init__(self):
+        self._value = 0
+
+    def set(self, value: float):
+        self._value = value
+
+    def snapshot(self) -> float:
+        return self._value
+
+
+class Ratio:
+    """Share of one counter in the total of several, computed when exported"""
+
+    def __init__(self, part: Counter, *rest: Counter):
+        self._part = part
+        self._counters = (part, *rest)
+
+    def snapshot(self) -> float:
+        total = sum(counter.snapshot() for counter in self._counters)
+        return round(self._part.snapshot() / total, 4) if total else 0.0
+
+
+class Histogram:
+    """Bucketed histogram of observed values"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = {f"le_{bound:g}": count for bound, count in zip(self.buckets, self._counts)}
+            buckets["le_inf"] = self._counts[-1]
+            return {
+                "count": self._count,
+                "sum": round(self._sum, 3),
+                "mean": round(self._sum / self._count, 3) if self._count else 0,
+                "max": round(self._max, 3),
+                "buckets": buckets,
+            }
+
+
+class MetricsRegistry:
+    """Process-local registry of named metrics, served by /api/metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = factory()
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str) -> Counter:
+        return self._get_or_create(name, Counter)
+
+    def gauge(self, name: str) -> Gauge:
+        return self._get_or_create(name, Gauge)
+
+    def ratio(self, name: str, part: Counter, *rest: Counter) -> Ratio:
+        return self._get_or_create(name, lambda: Ratio(part, *rest))
+
+    def histogram(self, name: str, buckets: Sequence[float]) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(buckets))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {name: metric.snapshot() for name, metric in sorted(metrics.items())}
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,55 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+# sort option -> (product field, direction); ties are broken by id in the same direction
+SORT_OPTIONS: Dict[str, Tuple[str, int]] = {
+    "rating": ("rating", -1),
+    "price_asc": ("price", 1),
+    "price_desc": ("price", -1),
+    "newest": ("created_at", -1),
+}
+# Largest page a listing request may ask for
+MAX_PAGE_SIZE = 200
+
+
+def check_page_size(limit: Any) -> None:
+    """Raise ValueError unless limit is an int between 1 and MAX_PAGE_SIZE"""
+    if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+
+def encode_cursor(sort: str, key: Any, product_id: str) -> str:
+    """Encode the last row of a page as an opaque cursor token"""
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    payload = json.dumps({"s": sort, "k": key, "id": product_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: Optional[str], sort: str) -> Optional[Tuple[Any, str]]:
+    """Decode a cursor token into (sort key, id); raises ValueError if it is invalid"""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key, product_id = payload["k"], str(payload["id"])
+        if payload["s"] != sort:
+            raise ValueError("cursor was issued for a different sort")
+        if SORT_OPTIONS[sort][0] == "created_at":
+            key = datetime.fromisoformat(key)
+        elif not isinstance(key, (int, float)):
+            raise ValueError("cursor key must be a number")
+        return key, product_id
+    except (KeyError, TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+
+
+def keyset_filter(sort: str, after: Tuple[Any, str]) -> Dict[str, Any]:
+    """Mongo filter for rows strictly after the (sort key, id) position"""
+    field, direction = SORT_OPTIONS[sort]
+    key, product_id = after
+    op = "$gt" if direction == 1 else "$lt"
+    return {"$or": [{field: {op: key}}, {field: key, "id": {op: product_id}}]}